@@ -6,6 +6,7 @@ from .profiles import router as profiles_router
 from .summaries import router as summaries_router
 from .form_types import router as form_types_router
 from .record_templates import router as record_templates_router
+from .sync import router as sync_router
 
 api_router = APIRouter()
 api_router.include_router(records_router, prefix="/records", tags=["records"])
@@ -15,3 +16,4 @@ api_router.include_router(profiles_router, prefix="/profiles", tags=["profiles"]
 api_router.include_router(summaries_router, prefix="/summaries", tags=["summaries"])
 api_router.include_router(form_types_router, prefix="/form-types", tags=["form-types"])
 api_router.include_router(record_templates_router, prefix="/record-templates", tags=["record-templates"])
+api_router.include_router(sync_router, prefix="/sync", tags=["sync"])
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from typing import List, Optional
 import random
-from supabase import create_client
-from app.core.config import settings
 from app.core.auth import get_current_user_id
+from app.core.cache import invalidate_user_caches
+from app.core.http_cache import etag_matches, not_modified, set_cache_headers, user_data_etag
+from app.core.supabase_client import AsyncDataClient, get_data_client
 from app.schemas.form_type import FormTypeCreate, FormTypeResponse, FormTypeUpdate
 
 router = APIRouter()
@@ -20,38 +21,42 @@ EMOJI_POOL = [
     '🎨', '🖌️', '🖊️', '✏️', '📐', '📏', '🖇️', '📎', '🔗', '📌'
 ]
 
-def get_supabase_client():
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-
 @router.get("/form-types", response_model=List[FormTypeResponse])
-async def get_user_form_types(user_id: str = Depends(get_current_user_id)):
+async def get_user_form_types(
+    request: Request,
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
+):
     """Get all form types for the current user (default + custom)"""
+    etag = await user_data_etag(client, user_id, "form_types")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     try:
-        client = get_supabase_client()
+        form_types_response = await client.table('user_form_types').select('*').eq('user_id', user_id).order('display_order', desc=False).order('type_id', desc=False).execute()
         
-        response = client.table('user_form_types').select('*').eq('user_id', user_id).order('display_order', desc=False).order('type_id', desc=False).execute()
-        
-        if not response.data:
+        if not form_types_response.data:
             # If user has no form types, create default ones
-            await create_default_form_types_for_user(user_id)
+            await create_default_form_types_for_user(client, user_id)
             # Retry the query
-            response = client.table('user_form_types').select('*').eq('user_id', user_id).order('display_order', desc=False).order('type_id', desc=False).execute()
+            form_types_response = await client.table('user_form_types').select('*').eq('user_id', user_id).order('display_order', desc=False).order('type_id', desc=False).execute()
         
-        return [FormTypeResponse(**item) for item in response.data]
+        set_cache_headers(response, etag)
+        return [FormTypeResponse(**item) for item in form_types_response.data]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch form types: {str(e)}")
 
 @router.post("/form-types", response_model=FormTypeResponse)
 async def create_form_type(
     form_type: FormTypeCreate,
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """Create a new custom form type"""
     try:
-        client = get_supabase_client()
-        
         # Check if type_code already exists for this user
-        existing = client.table('user_form_types').select('type_id').eq('user_id', user_id).eq('type_code', form_type.type_code).execute()
+        existing = await client.table('user_form_types').select('type_id').eq('user_id', user_id).eq('type_code', form_type.type_code).execute()
         
         if existing.data:
             raise HTTPException(status_code=400, detail="Type code already exists for this user")
@@ -69,11 +74,12 @@ async def create_form_type(
             'display_order': form_type.display_order
         }
         
-        response = client.table('user_form_types').insert(form_type_data).execute()
+        response = await client.table('user_form_types').insert(form_type_data).execute()
         
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to create form type")
         
+        invalidate_user_caches(user_id)
         return FormTypeResponse(**response.data[0])
     
     except HTTPException:
@@ -85,14 +91,13 @@ async def create_form_type(
 async def update_form_type(
     type_id: int,
     form_type_update: FormTypeUpdate,
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """Update a form type (only custom types can be updated)"""
     try:
-        client = get_supabase_client()
-        
         # Check if form type exists and belongs to user
-        existing = client.table('user_form_types').select('*').eq('type_id', type_id).eq('user_id', user_id).execute()
+        existing = await client.table('user_form_types').select('*').eq('type_id', type_id).eq('user_id', user_id).execute()
         
         if not existing.data:
             raise HTTPException(status_code=404, detail="Form type not found")
@@ -114,11 +119,12 @@ async def update_form_type(
             return FormTypeResponse(**form_type)
         
         # Update the form type
-        response = client.table('user_form_types').update(update_data).eq('type_id', type_id).eq('user_id', user_id).execute()
+        response = await client.table('user_form_types').update(update_data).eq('type_id', type_id).eq('user_id', user_id).execute()
         
         if not response.data:
             raise HTTPException(status_code=500, detail="Failed to update form type")
         
+        invalidate_user_caches(user_id)
         return FormTypeResponse(**response.data[0])
     
     except HTTPException:
@@ -129,14 +135,13 @@ async def update_form_type(
 @router.delete("/form-types/{type_id}")
 async def delete_form_type(
     type_id: int,
-    user_id: str = Depends(get_current_user_id)
+    user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """Delete a custom form type (default types cannot be deleted)"""
     try:
-        client = get_supabase_client()
-        
         # Check if form type exists and belongs to user
-        existing = client.table('user_form_types').select('*').eq('type_id', type_id).eq('user_id', user_id).execute()
+        existing = await client.table('user_form_types').select('*').eq('type_id', type_id).eq('user_id', user_id).execute()
         
         if not existing.data:
             raise HTTPException(status_code=404, detail="Form type not found")
@@ -146,14 +151,15 @@ async def delete_form_type(
             raise HTTPException(status_code=400, detail="Cannot delete default form types")
         
         # Check if this form type is being used in any records
-        records = client.table('records').select('record_id').eq('user_id', user_id).eq('form_type', form_type['type_code']).limit(1).execute()
+        records = await client.table('records').select('record_id').eq('user_id', user_id).eq('form_type', form_type['type_code']).limit(1).execute()
         
         if records.data:
             raise HTTPException(status_code=400, detail="Cannot delete form type that is being used in records")
         
         # Delete the form type
-        response = client.table('user_form_types').delete().eq('type_id', type_id).eq('user_id', user_id).execute()
+        response = await client.table('user_form_types').delete().eq('type_id', type_id).eq('user_id', user_id).execute()
         
+        invalidate_user_caches(user_id)
         return {"message": "Form type deleted successfully"}
     
     except HTTPException:
@@ -161,10 +167,8 @@ async def delete_form_type(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to delete form type: {str(e)}")
 
-async def create_default_form_types_for_user(user_id: str):
+async def create_default_form_types_for_user(client, user_id: str):
     """Helper function to create default form types for a user"""
-    client = get_supabase_client()
-    
     default_types = [
         {'type_code': 'video', 'type_name': '视频', 'emoji': '📹', 'display_order': 1},
         {'type_code': 'podcast', 'type_name': '播客', 'emoji': '🎙️', 'display_order': 2},
@@ -185,7 +189,8 @@ async def create_default_form_types_for_user(user_id: str):
         })
     
     try:
-        client.table('user_form_types').insert(default_types).execute()
+        await client.table('user_form_types').insert(default_types).execute()
+        invalidate_user_caches(user_id)
     except Exception as e:
         # Ignore conflicts (user might already have some default types)
         pass
\ No newline at end of file
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-from supabase import create_client
+from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 from app.core.config import settings
-from app.core.auth import get_current_user
+from app.core.auth import get_current_user, get_current_user_checked
+from app.core.cache import invalidate_user_caches
+from app.core.supabase_client import AsyncDataClient, get_data_client, get_supabase
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+import asyncio
 import uuid
 import hashlib
 import os
@@ -12,8 +17,13 @@ from datetime import datetime
 
 router = APIRouter()
 
-# Supabase client
-supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+def _password_check_client() -> Client:
+    """用于校验当前密码的一次性客户端（登录会话不能落在共享的服务端客户端上）"""
+    return create_client(
+        settings.SUPABASE_URL,
+        settings.SUPABASE_ANON_KEY,
+        ClientOptions(persist_session=False, auto_refresh_token=False)
+    )
 
 # Pydantic models
 class ProfileUpdate(BaseModel):
@@ -35,23 +45,27 @@ class ProfileResponse(BaseModel):
     created_at: str
 
 @router.get("/current", response_model=ProfileResponse)
-async def get_current_profile(current_user: dict = Depends(get_current_user)):
+async def get_current_profile(
+    current_user: dict = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    db: AsyncDataClient = Depends(get_data_client)
+):
     """获取当前用户的个人资料"""
     try:
         user_id = current_user.get("sub")
         if not user_id:
             raise HTTPException(status_code=401, detail="无效的用户信息")
         
-        # 从 auth.users 获取基本信息
-        auth_response = supabase.auth.admin.get_user_by_id(user_id)
+        # 并发获取 auth.users 基本信息和 profiles 表扩展信息
+        auth_response, profile_response = await asyncio.gather(
+            run_in_threadpool(supabase.auth.admin.get_user_by_id, user_id),
+            db.table('profiles').select('*').eq('user_id', user_id).execute()
+        )
         if not auth_response.user:
             raise HTTPException(status_code=404, detail="用户不存在")
         
         auth_user = auth_response.user
         
-        # 从 profiles 表获取扩展信息
-        profile_response = supabase.table('profiles').select('*').eq('user_id', user_id).execute()
-        
         profile_data = None
         if profile_response.data and len(profile_response.data) > 0:
             profile_data = profile_response.data[0]
@@ -74,7 +88,9 @@ async def get_current_profile(current_user: dict = Depends(get_current_user)):
 @router.put("/current")
 async def update_current_profile(
     profile_update: ProfileUpdate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    db: AsyncDataClient = Depends(get_data_client)
 ):
     """更新当前用户的个人资料"""
     try:
@@ -83,7 +99,7 @@ async def update_current_profile(
             raise HTTPException(status_code=401, detail="无效的用户信息")
         
         # 检查是否存在 profile 记录
-        existing_profile = supabase.table('profiles').select('*').eq('user_id', user_id).execute()
+        existing_profile = await db.table('profiles').select('*').eq('user_id', user_id).execute()
         
         update_data = {}
         if profile_update.display_name is not None:
@@ -94,13 +110,14 @@ async def update_current_profile(
         
         if existing_profile.data and len(existing_profile.data) > 0:
             # 更新现有记录
-            response = supabase.table('profiles').update(update_data).eq('user_id', user_id).execute()
+            response = await db.table('profiles').update(update_data).eq('user_id', user_id).execute()
         else:
             # 创建新记录
             update_data['user_id'] = user_id
-            response = supabase.table('profiles').insert(update_data).execute()
+            response = await db.table('profiles').insert(update_data).execute()
         
         if response.data:
+            invalidate_user_caches(user_id)
             return {"message": "个人资料更新成功", "data": response.data[0]}
         else:
             raise HTTPException(status_code=500, detail="更新失败")
@@ -114,7 +131,9 @@ async def update_current_profile(
 @router.post("/upload-avatar")
 async def upload_avatar(
     file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    db: AsyncDataClient = Depends(get_data_client)
 ):
     """上传用户头像"""
     try:
@@ -138,7 +157,8 @@ async def upload_avatar(
         # 上传到 Supabase Storage
         try:
             # 上传文件
-            storage_response = supabase.storage.from_('avatars').upload(
+            storage_response = await run_in_threadpool(
+                supabase.storage.from_('avatars').upload,
                 unique_filename,
                 file_content,
                 file_options={
@@ -153,20 +173,21 @@ async def upload_avatar(
                 avatar_url = supabase.storage.from_('avatars').get_public_url(unique_filename)
                 
                 # 更新用户资料中的头像URL
-                profile_response = supabase.table('profiles').select('*').eq('user_id', user_id).execute()
+                profile_response = await db.table('profiles').select('*').eq('user_id', user_id).execute()
                 
                 if profile_response.data and len(profile_response.data) > 0:
                     # 更新现有记录
-                    update_response = supabase.table('profiles').update({
+                    update_response = await db.table('profiles').update({
                         'avatar_url': avatar_url
                     }).eq('user_id', user_id).execute()
                 else:
                     # 创建新记录
-                    update_response = supabase.table('profiles').insert({
+                    update_response = await db.table('profiles').insert({
                         'user_id': user_id,
                         'avatar_url': avatar_url
                     }).execute()
                 
+                invalidate_user_caches(user_id)
                 return {
                     "message": "头像上传成功",
                     "avatar_url": avatar_url
@@ -187,7 +208,8 @@ async def upload_avatar(
 @router.put("/change-email")
 async def change_email(
     email_change: EmailChange,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_checked),
+    supabase: Client = Depends(get_supabase)
 ):
     """修改用户邮箱"""
     try:
@@ -196,7 +218,7 @@ async def change_email(
             raise HTTPException(status_code=401, detail="无效的用户信息")
         
         # 获取当前用户信息以验证密码
-        auth_user_response = supabase.auth.admin.get_user_by_id(user_id)
+        auth_user_response = await run_in_threadpool(supabase.auth.admin.get_user_by_id, user_id)
         if not auth_user_response.user:
             raise HTTPException(status_code=404, detail="用户不存在")
         
@@ -204,7 +226,7 @@ async def change_email(
         
         # 验证当前密码（通过尝试登录）
         try:
-            sign_in_response = supabase.auth.sign_in_with_password({
+            sign_in_response = await run_in_threadpool(_password_check_client().auth.sign_in_with_password, {
                 "email": current_email,
                 "password": email_change.current_password
             })
@@ -215,7 +237,7 @@ async def change_email(
         
         # 检查新邮箱是否已被使用
         try:
-            existing_user = supabase.auth.admin.list_users()
+            existing_user = await run_in_threadpool(supabase.auth.admin.list_users)
             for user in existing_user:
                 if user.email == email_change.new_email and user.id != user_id:
                     raise HTTPException(status_code=400, detail="邮箱地址已被使用")
@@ -224,7 +246,8 @@ async def change_email(
         
         # 更新邮箱（不需要验证）
         try:
-            update_response = supabase.auth.admin.update_user_by_id(
+            update_response = await run_in_threadpool(
+                supabase.auth.admin.update_user_by_id,
                 user_id,
                 {"email": email_change.new_email}
             )
@@ -250,7 +273,8 @@ async def change_email(
 @router.put("/change-password")
 async def change_password(
     password_change: PasswordChange,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user_checked),
+    supabase: Client = Depends(get_supabase)
 ):
     """修改用户密码"""
     try:
@@ -263,7 +287,7 @@ async def change_password(
             raise HTTPException(status_code=400, detail="新密码长度至少6位")
         
         # 获取当前用户邮箱
-        auth_user_response = supabase.auth.admin.get_user_by_id(user_id)
+        auth_user_response = await run_in_threadpool(supabase.auth.admin.get_user_by_id, user_id)
         if not auth_user_response.user:
             raise HTTPException(status_code=404, detail="用户不存在")
         
@@ -271,7 +295,7 @@ async def change_password(
         
         # 验证当前密码
         try:
-            sign_in_response = supabase.auth.sign_in_with_password({
+            sign_in_response = await run_in_threadpool(_password_check_client().auth.sign_in_with_password, {
                 "email": current_email,
                 "password": password_change.current_password
             })
@@ -282,7 +306,8 @@ async def change_password(
         
         # 更新密码
         try:
-            update_response = supabase.auth.admin.update_user_by_id(
+            update_response = await run_in_threadpool(
+                supabase.auth.admin.update_user_by_id,
                 user_id,
                 {"password": password_change.new_password}
             )
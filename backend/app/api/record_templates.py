@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+import asyncio
 from typing import Optional, List
-from supabase import create_client
-from app.core.config import settings
 from app.core.auth import get_current_user_id
+from app.core.cache import invalidate_user_caches
+from app.core.http_cache import etag_matches, not_modified, set_cache_headers, user_data_etag
+from app.core.supabase_client import AsyncDataClient, get_data_client
 from app.schemas.record_template import RecordTemplateCreate, RecordTemplateUpdate
 from .records import (
     get_valid_resource_type,
@@ -14,17 +16,13 @@ from .records import (
 router = APIRouter()
 
 
-def get_supabase_client():
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-
-
 async def get_template_tags(client, template: dict, user_id: str) -> List[str]:
     """Fetch associated tag names for a template via resource relations."""
     if not template.get("resource_id"):
         return []
 
     try:
-        resource_tags_response = client.table("resource_tags")\
+        resource_tags_response = await client.table("resource_tags")\
             .select("tag_id")\
             .eq("user_id", user_id)\
             .eq("resource_id", template["resource_id"])\
@@ -37,7 +35,7 @@ async def get_template_tags(client, template: dict, user_id: str) -> List[str]:
         if not tag_ids:
             return []
 
-        tags_response = client.table("tags")\
+        tags_response = await client.table("tags")\
             .select("tag_name")\
             .in_("tag_id", tag_ids)\
             .execute()
@@ -52,60 +50,34 @@ async def get_template_tags(client, template: dict, user_id: str) -> List[str]:
 
 
 async def get_template_detail(client, template_id: int, user_id: str) -> Optional[dict]:
-    """Assemble template detail with resource and tags information."""
-    template_response = client.table("record_templates")\
-        .select("*")\
-        .eq("template_id", template_id)\
-        .eq("user_id", user_id)\
-        .execute()
-
-    if not template_response.data:
-        return None
-
-    template = template_response.data[0]
-    detail = dict(template)
-
-    # Resource info
-    resource_info = None
-    if template.get("resource_id"):
-        resource_response = client.table("resources")\
-            .select("*")\
-            .eq("resource_id", template["resource_id"])\
-            .execute()
-        if resource_response.data:
-            resource_info = resource_response.data[0]
-    detail["resource"] = resource_info
-
-    # User resource relationship (reuse existing structure)
-    user_resource_info = None
-    if template.get("resource_id"):
-        user_resource_response = client.table("user_resources")\
-            .select("*")\
-            .eq("user_id", user_id)\
-            .eq("resource_id", template["resource_id"])\
-            .execute()
-        if user_resource_response.data:
-            user_resource_info = user_resource_response.data[0]
-    detail["user_resource"] = user_resource_info
+    """Fetch template detail with resource and tags in one round trip (see sql/009)."""
+    response = await client.rpc("get_record_template_detail", {
+        "p_user_id": user_id,
+        "p_template_id": template_id,
+    }).execute()
 
-    # Tags
-    tag_names = await get_template_tags(client, template, user_id)
-    detail["tags"] = tag_names
+    if not response.data:
+        return None
 
-    return detail
+    return response.data[0]["detail"]
 
 
 @router.get("/", response_model=dict)
 async def list_record_templates(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     search: Optional[str] = Query(None, min_length=1, description="Search by title"),
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """List templates for the current user."""
-    try:
-        client = get_supabase_client()
+    etag = await user_data_etag(client, current_user_id, "record_templates", skip, limit, search)
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
+    try:
         query = client.table("record_templates")\
             .select("*")\
             .eq("user_id", current_user_id)
@@ -113,18 +85,22 @@ async def list_record_templates(
         if search:
             query = query.ilike("title", f"%{search}%")
 
-        response = query.order("updated_at", desc=True)\
+        templates_response = await query.order("updated_at", desc=True)\
             .range(skip, skip + limit - 1)\
             .execute()
 
-        templates = response.data or []
+        templates = templates_response.data or []
 
         # Attach tag strings for list view
         if templates:
-            for template in templates:
-                tag_names = await get_template_tags(client, template, current_user_id)
+            tag_lists = await asyncio.gather(*[
+                get_template_tags(client, template, current_user_id)
+                for template in templates
+            ])
+            for template, tag_names in zip(templates, tag_lists):
                 template["tags"] = tag_names
 
+        set_cache_headers(response, etag)
         return {
             "templates": templates,
             "total": len(templates)
@@ -139,14 +115,13 @@ async def list_record_templates(
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def create_record_template(
     template_data: RecordTemplateCreate,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """Create a new record template."""
     try:
-        client = get_supabase_client()
-
         # Validate form_type for user
-        form_type_check = client.table("user_form_types")\
+        form_type_check = await client.table("user_form_types")\
             .select("type_id")\
             .eq("user_id", current_user_id)\
             .eq("type_code", template_data.form_type)\
@@ -200,7 +175,7 @@ async def create_record_template(
             "assets": template_data.assets
         }
 
-        template_response = client.table("record_templates").insert(insert_data).execute()
+        template_response = await client.table("record_templates").insert(insert_data).execute()
         if not template_response.data:
             raise HTTPException(status_code=500, detail="Failed to create record template")
 
@@ -215,6 +190,7 @@ async def create_record_template(
                 user_id=current_user_id
             )
 
+        invalidate_user_caches(current_user_id)
         detail = await get_template_detail(client, created_template["template_id"], current_user_id)
         return detail
 
@@ -230,11 +206,11 @@ async def create_record_template(
 @router.get("/{template_id}", response_model=dict)
 async def get_record_template(
     template_id: int,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """Get detailed information for a template."""
     try:
-        client = get_supabase_client()
         detail = await get_template_detail(client, template_id, current_user_id)
         if not detail:
             raise HTTPException(status_code=404, detail="Template not found")
@@ -252,13 +228,12 @@ async def get_record_template(
 async def update_record_template(
     template_id: int,
     template_update: RecordTemplateUpdate,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """Update a record template."""
     try:
-        client = get_supabase_client()
-
-        existing = client.table("record_templates")\
+        existing = await client.table("record_templates")\
             .select("*")\
             .eq("template_id", template_id)\
             .eq("user_id", current_user_id)\
@@ -288,7 +263,7 @@ async def update_record_template(
 
         # Validate form_type if updated
         if "form_type" in update_data:
-            form_type_check = client.table("user_form_types")\
+            form_type_check = await client.table("user_form_types")\
                 .select("type_id")\
                 .eq("user_id", current_user_id)\
                 .eq("type_code", update_data["form_type"])\
@@ -297,7 +272,7 @@ async def update_record_template(
                 raise HTTPException(status_code=400, detail=f"Invalid form_type '{update_data['form_type']}' for user")
 
         if update_data:
-            update_response = client.table("record_templates")\
+            update_response = await client.table("record_templates")\
                 .update(update_data)\
                 .eq("template_id", template_id)\
                 .eq("user_id", current_user_id)\
@@ -322,7 +297,7 @@ async def update_record_template(
                     resource_update[field_name] = value
 
         if resource_update and current_template.get("resource_id"):
-            client.table("resources")\
+            await client.table("resources")\
                 .update(resource_update)\
                 .eq("resource_id", current_template["resource_id"])\
                 .execute()
@@ -341,27 +316,20 @@ async def update_record_template(
                     resource_type=resource_type,
                     created_by=current_user_id
                 )
-                client.table("record_templates")\
+                await client.table("record_templates")\
                     .update({"resource_id": resource_id})\
                     .eq("template_id", template_id)\
                     .execute()
 
-            tag_payload = []
-            for tag in template_update.tags:
-                if isinstance(tag, dict):
-                    tag_name = tag.get("tag_name")
-                else:
-                    tag_name = str(tag).strip() if tag else None
-                if tag_name:
-                    tag_payload.append({"tag_name": tag_name})
-
+            # Strings or {"tag_name": ...} dicts are normalized by the tag sync service
             await update_record_tags(
                 client,
                 resource_id,
-                tag_payload,
+                template_update.tags,
                 current_user_id
             )
 
+        invalidate_user_caches(current_user_id)
         detail = await get_template_detail(client, template_id, current_user_id)
         return detail
 
@@ -377,13 +345,12 @@ async def update_record_template(
 @router.delete("/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_record_template(
     template_id: int,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """Delete a record template."""
     try:
-        client = get_supabase_client()
-
-        existing = client.table("record_templates")\
+        existing = await client.table("record_templates")\
             .select("template_id")\
             .eq("template_id", template_id)\
             .eq("user_id", current_user_id)\
@@ -391,12 +358,13 @@ async def delete_record_template(
         if not existing.data:
             raise HTTPException(status_code=404, detail="Template not found")
 
-        client.table("record_templates")\
+        await client.table("record_templates")\
             .delete()\
             .eq("template_id", template_id)\
             .eq("user_id", current_user_id)\
             .execute()
 
+        invalidate_user_caches(current_user_id)
         from fastapi import Response
         return Response(status_code=204)
 
@@ -1,8 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Optional
 from datetime import datetime, timedelta
+import csv
+import io
+import json
+from postgrest.exceptions import APIError
 from app.core.auth import get_current_user_id
-from app.schemas.record import RecordCreate, RecordUpdate
+from app.core.cache import invalidate_user_caches
+from app.core.http_cache import etag_matches, not_modified, set_cache_headers, user_data_etag
+from app.core.pagination import (
+    decode_cursor, decode_search_cursor, encode_search_cursor, next_cursor_for, paginate_records
+)
+from app.core.responses import dumps
+from app.core.side_effects import side_effects
+from app.core.supabase_client import AsyncDataClient, get_data_client
+from app.schemas.record import RecordBulkCreate, RecordCreate, RecordUpdate
+from app.services.record_ingest import ingest_records
+from app.services.segmentation import build_search_query, index_records
+from app.services.tag_sync import sync_resource_tags
 
 router = APIRouter()
 
@@ -20,15 +36,111 @@ def get_valid_resource_type(form_type_value, fallback_type=None):
     else:
         return 'other'  # Default fallback for custom types
 
+# 数据库函数用 22023 (invalid_parameter_value) 表示参数校验失败，映射为 400
+INVALID_PARAMETER_ERROR_CODE = '22023'
+
+USER_RESOURCE_FIELDS = ('status', 'rating', 'review_short', 'is_favorite')
+
+# 导出等需要完整记录时读取的列（不含 search_text / search_tsv 分词列）
+RECORD_LIST_COLUMNS = (
+    'record_id, user_id, resource_id, form_type, title, body_md, occurred_at, duration_min, '
+    'effective_duration_min, mood, difficulty, focus, energy, privacy, auto_confidence, assets, '
+    'created_at, updated_at'
+)
+
+# 列表接口 fields= 可选的字段；tags 为逗号分隔的标签名，excerpt 为正文摘要（见 sql/016）
+RECORD_SELECTABLE_FIELDS = (
+    'record_id', 'user_id', 'resource_id', 'form_type', 'title', 'excerpt', 'body_md', 'occurred_at',
+    'duration_min', 'effective_duration_min', 'mood', 'difficulty', 'focus', 'energy', 'privacy',
+    'auto_confidence', 'assets', 'created_at', 'updated_at', 'tags'
+)
+
+# 默认的精简列表：列表页展示所需字段，不含完整正文与附件
+RECORD_LEAN_FIELDS = (
+    'record_id', 'resource_id', 'form_type', 'title', 'excerpt', 'occurred_at',
+    'duration_min', 'difficulty', 'focus', 'mood', 'tags'
+)
+
+# 游标分页依赖的字段，总是返回
+RECORD_KEY_FIELDS = ('record_id', 'occurred_at')
+
+def resolve_record_fields(fields: Optional[str]) -> list:
+    """解析 fields= 参数：缺省为精简列表，* 为全部字段"""
+    if not fields:
+        return list(RECORD_LEAN_FIELDS)
+    if fields.strip() == '*':
+        return list(RECORD_SELECTABLE_FIELDS)
+    
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in RECORD_SELECTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys([*RECORD_KEY_FIELDS, *requested]))
+
+def record_select_columns(fields: list) -> str:
+    """fields 对应的 PostgREST select 列（补标签需要 resource_id）"""
+    columns = [field for field in fields if field != 'tags']
+    if 'tags' in fields and 'resource_id' not in columns:
+        columns.append('resource_id')
+    return ','.join(columns)
+
+def build_create_record_payload(record_data: RecordCreate) -> dict:
+    """把 RecordCreate 组装成 create_record_with_tags 的 p_payload"""
+    resource = None
+    if not record_data.resource_id:
+        if record_data.resource_title:
+            resource = {
+                'title': record_data.resource_title,
+                'type': get_valid_resource_type(
+                    record_data.resource_type or record_data.form_type,
+                    record_data.resource_type
+                ),
+                'author': record_data.resource_author,
+                'url': record_data.resource_url,
+                'platform': record_data.resource_platform,
+                'isbn': record_data.resource_isbn,
+                'description': record_data.resource_description
+            }
+        else:
+            # 如果没有资源信息，使用记录标题创建简单资源
+            resource = {
+                'title': record_data.title,
+                'type': get_valid_resource_type(record_data.form_type)
+            }
+    
+    # 用户资源关系字段（user_resource_status 等，提供了才写入）
+    user_resource = {
+        field: getattr(record_data, f'user_resource_{field}')
+        for field in USER_RESOURCE_FIELDS
+        if getattr(record_data, f'user_resource_{field}', None) is not None
+    }
+    
+    return {
+        'resource_id': record_data.resource_id,
+        'resource': resource,
+        'record': {
+            'form_type': record_data.form_type,
+            'title': record_data.title,
+            'body_md': record_data.body_md,
+            'occurred_at': (record_data.occurred_at or datetime.utcnow()).isoformat(),
+            'duration_min': record_data.duration_min,
+            'effective_duration_min': record_data.effective_duration_min,
+            'mood': record_data.mood,
+            'difficulty': record_data.difficulty,
+            'focus': record_data.focus,
+            'energy': record_data.energy,
+            'privacy': record_data.privacy.value if record_data.privacy else 'private',
+            'assets': record_data.assets
+        },
+        'tags': record_data.tags or [],
+        'user_resource': user_resource or None
+    }
+
 @router.get("/test", response_model=dict)
-async def test_supabase_connection():
+async def test_supabase_connection(client: AsyncDataClient = Depends(get_data_client)):
     """测试Supabase连接"""
     try:
-        from supabase import create_client
-        from app.core.config import settings
-        
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        response = client.table('records').select('*', count='exact').execute()
+        response = await client.table('records').select('*', count='exact').execute()
         
         return {
             "status": "success", 
@@ -43,16 +155,14 @@ async def test_supabase_connection():
 
 
 @router.get("/debug/current-user", response_model=dict)
-async def debug_current_user(current_user_id: str = Depends(get_current_user_id)):
+async def debug_current_user(
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
+):
     """调试：显示当前用户ID"""
     try:
-        from supabase import create_client
-        from app.core.config import settings
-        
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        
         # 查询该用户的记录数量
-        response = client.table('records').select('*', count='exact').eq('user_id', current_user_id).execute()
+        response = await client.table('records').select('*', count='exact').eq('user_id', current_user_id).execute()
         
         return {
             "current_user_id": current_user_id,
@@ -71,88 +181,56 @@ async def debug_current_user(current_user_id: str = Depends(get_current_user_id)
 
 @router.get("/", response_model=dict)
 async def get_records(
-    skip: int = Query(0, ge=0),
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0, description="偏移分页（兼容旧客户端，传cursor时忽略）"),
     limit: int = Query(50, ge=1, le=1000),
     days: Optional[int] = Query(None, ge=1, le=3650, description="获取最近N天的记录"),
-    current_user_id: str = Depends(get_current_user_id)
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，* 为全部；缺省返回不含正文的精简列表"),
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
-    """获取用户的学习记录"""
+    """获取用户的学习记录（按 occurred_at, record_id 倒序，支持游标分页）"""
+    cursor_key = decode_cursor(cursor) if cursor else None
+    selected_fields = resolve_record_fields(fields)
+    # days 是相对当前时间的滑动窗口，按小时计入 ETag
+    window_hour = datetime.now().strftime('%Y%m%d%H') if days else None
+    etag = await user_data_etag(
+        client, current_user_id, 'records', skip, limit, days, window_hour, cursor, ','.join(selected_fields)
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     try:
-        from supabase import create_client
-        from app.core.config import settings
-        
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        
         # 构建查询
-        query = client.table('records').select('*').eq('user_id', current_user_id)
+        query = client.table('records').select(record_select_columns(selected_fields)).eq('user_id', current_user_id)
         
         # 如果指定了天数，过滤日期
         if days:
-            from datetime import datetime, timedelta
             start_date = datetime.now() - timedelta(days=days)
             query = query.gte('occurred_at', start_date.isoformat())
         
-        # 执行查询
-        response = query.order('occurred_at', desc=True).range(skip, skip + limit - 1).execute()
+        # 执行查询（游标存在时走keyset，否则兼容旧的skip偏移）
+        records_response = await paginate_records(query, limit, cursor_key, skip).execute()
         
-        # 批量获取所有记录的标签信息（解决N+1查询问题）
-        records_with_tags = []
-        if response.data:
-            # 1. 收集所有有效的resource_id
-            resource_ids = [record['resource_id'] for record in response.data if record.get('resource_id')]
-            
-            # 2. 如果有资源ID，批量查询所有标签信息
-            resource_tags_map = {}  # resource_id -> tag_names
-            if resource_ids:
-                try:
-                    # 批量查询资源标签关联
-                    resource_tags_response = client.table('resource_tags')\
-                        .select('resource_id, tag_id')\
-                        .eq('user_id', current_user_id)\
-                        .in_('resource_id', resource_ids)\
-                        .execute()
-                    
-                    if resource_tags_response.data:
-                        # 收集所有标签ID
-                        tag_ids = list(set([rt['tag_id'] for rt in resource_tags_response.data]))
-                        
-                        if tag_ids:
-                            # 批量查询标签名称
-                            tags_response = client.table('tags')\
-                                .select('tag_id, tag_name')\
-                                .in_('tag_id', tag_ids)\
-                                .execute()
-                            
-                            # 构建tag_id -> tag_name映射
-                            tag_id_to_name = {}
-                            if tags_response.data:
-                                tag_id_to_name = {tag['tag_id']: tag['tag_name'] for tag in tags_response.data}
-                            
-                            # 构建resource_id -> tag_names映射
-                            for rt in resource_tags_response.data:
-                                resource_id = rt['resource_id']
-                                tag_name = tag_id_to_name.get(rt['tag_id'])
-                                
-                                if tag_name:
-                                    if resource_id not in resource_tags_map:
-                                        resource_tags_map[resource_id] = []
-                                    resource_tags_map[resource_id].append(tag_name)
-                                    
-                except Exception as tag_error:
-                    print(f"批量标签查询失败: {tag_error}")
-            
-            # 3. 组装最终结果
-            for record in response.data:
-                resource_id = record.get('resource_id')
-                if resource_id and resource_id in resource_tags_map:
-                    record['tags'] = ','.join(resource_tags_map[resource_id])
-                else:
-                    record['tags'] = ''
-                records_with_tags.append(record)
+        next_cursor = next_cursor_for(records_response.data or [], limit)
+        records_response.data = (records_response.data or [])[:limit]
         
+        records = records_response.data
+        if 'tags' in selected_fields:
+            # 批量获取所有记录的标签信息（解决N+1查询问题）
+            records = await attach_tags(client, records, current_user_id)
+            if 'resource_id' not in selected_fields:
+                for record in records:
+                    record.pop('resource_id', None)
+        
+        set_cache_headers(response, etag)
         return {
-            "records": records_with_tags,
-            "total": len(records_with_tags)
+            "records": records,
+            "total": len(records),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
         }
         
     except Exception as e:
@@ -161,17 +239,72 @@ async def get_records(
             detail=f"Failed to fetch records: {str(e)}"
         )
 
+async def attach_tags(client, records: list, user_id: str) -> list:
+    """为一批记录批量补充 tags 字段（逗号分隔的标签名），固定两次查询"""
+    if not records:
+        return []
+    
+    # 1. 收集所有有效的resource_id
+    resource_ids = list({record['resource_id'] for record in records if record.get('resource_id')})
+    
+    # 2. 如果有资源ID，批量查询所有标签信息
+    resource_tags_map = {}  # resource_id -> tag_names
+    if resource_ids:
+        try:
+            # 批量查询资源标签关联
+            resource_tags_response = await client.table('resource_tags')\
+                .select('resource_id, tag_id')\
+                .eq('user_id', user_id)\
+                .in_('resource_id', resource_ids)\
+                .execute()
+            
+            if resource_tags_response.data:
+                # 收集所有标签ID
+                tag_ids = list(set([rt['tag_id'] for rt in resource_tags_response.data]))
+                
+                if tag_ids:
+                    # 批量查询标签名称
+                    tags_response = await client.table('tags')\
+                        .select('tag_id, tag_name')\
+                        .in_('tag_id', tag_ids)\
+                        .execute()
+                    
+                    # 构建tag_id -> tag_name映射
+                    tag_id_to_name = {}
+                    if tags_response.data:
+                        tag_id_to_name = {tag['tag_id']: tag['tag_name'] for tag in tags_response.data}
+                    
+                    # 构建resource_id -> tag_names映射
+                    for rt in resource_tags_response.data:
+                        resource_id = rt['resource_id']
+                        tag_name = tag_id_to_name.get(rt['tag_id'])
+                        
+                        if tag_name:
+                            if resource_id not in resource_tags_map:
+                                resource_tags_map[resource_id] = []
+                            resource_tags_map[resource_id].append(tag_name)
+                            
+        except Exception as tag_error:
+            print(f"批量标签查询失败: {tag_error}")
+    
+    # 3. 组装最终结果
+    for record in records:
+        resource_id = record.get('resource_id')
+        if resource_id and resource_id in resource_tags_map:
+            record['tags'] = ','.join(resource_tags_map[resource_id])
+        else:
+            record['tags'] = ''
+    return records
+
 @router.get("/recent-tags", response_model=list)
-async def get_recent_tags(current_user_id: str = Depends(get_current_user_id)):
+async def get_recent_tags(
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
+):
     """获取用户最近使用的标签（基于最近10条记录）"""
     try:
-        from supabase import create_client
-        from app.core.config import settings
-        
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        
         # 查询用户最近10条记录
-        records_response = client.table('records')\
+        records_response = await client.table('records')\
             .select('resource_id')\
             .eq('user_id', current_user_id)\
             .order('occurred_at', desc=True)\
@@ -188,7 +321,7 @@ async def get_recent_tags(current_user_id: str = Depends(get_current_user_id)):
             return []
         
         # 批量查询资源标签关联
-        resource_tags_response = client.table('resource_tags')\
+        resource_tags_response = await client.table('resource_tags')\
             .select('tag_id')\
             .eq('user_id', current_user_id)\
             .in_('resource_id', resource_ids)\
@@ -201,7 +334,7 @@ async def get_recent_tags(current_user_id: str = Depends(get_current_user_id)):
         tag_ids = list(set([rt['tag_id'] for rt in resource_tags_response.data]))
         
         # 批量查询标签名称
-        tags_response = client.table('tags')\
+        tags_response = await client.table('tags')\
             .select('tag_name')\
             .in_('tag_id', tag_ids)\
             .execute()
@@ -219,158 +352,169 @@ async def get_recent_tags(current_user_id: str = Depends(get_current_user_id)):
         # 如果出错，返回空列表而不是抛出异常，让前端可以优雅降级
         return []
 
-@router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def create_record(
-    record_data: RecordCreate,
-    current_user_id: str = Depends(get_current_user_id)
+@router.get("/search", response_model=dict)
+async def search_records(
+    q: str = Query(..., min_length=1, max_length=200, description="搜索关键词（标题与正文）"),
+    form_type: Optional[str] = Query(None, description="按学习形式过滤"),
+    date_from: Optional[datetime] = Query(None, description="起始时间（含）"),
+    date_to: Optional[datetime] = Query(None, description="结束时间（不含）"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
-    """创建新的学习记录，包括资源和标签处理"""
+    """搜索学习记录：jieba 分词全文 + 标题子串匹配（尚未分词的记录另按正文子串匹配），按相关度排序，返回高亮片段（见 sql/014）"""
+    query_text = q.strip()
+    if not query_text:
+        raise HTTPException(status_code=400, detail="Search query is empty")
+    cursor_rank, cursor_id = decode_search_cursor(cursor) if cursor else (None, None)
+    
     try:
-        from supabase import create_client
-        from app.core.config import settings
-        from datetime import datetime
-        
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+        ts_query, terms = await build_search_query(query_text)
+        response = await client.rpc('search_records', {
+            'p_user_id': current_user_id,
+            'p_query': query_text,
+            'p_ts_query': ts_query,
+            'p_terms': terms,
+            'p_form_type': form_type,
+            'p_date_from': date_from.isoformat() if date_from else None,
+            'p_date_to': date_to.isoformat() if date_to else None,
+            'p_limit': limit + 1,
+            'p_cursor_rank': cursor_rank,
+            'p_cursor_id': cursor_id
+        }).execute()
+        
+        rows = response.data or []
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_search_cursor(last['rank'], last['record_id'])
+        
+        records = await attach_tags(client, rows[:limit], current_user_id)
         
-        # Validate form_type against user's form types
-        form_type_check = client.table('user_form_types').select('type_id').eq('user_id', current_user_id).eq('type_code', record_data.form_type).execute()
-        if not form_type_check.data:
-            raise HTTPException(status_code=400, detail=f"Invalid form_type '{record_data.form_type}' for user")
+        return {
+            "records": records,
+            "total": len(records),
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
         
-        resource_id = record_data.resource_id
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search records: {str(e)}"
+        )
 
-        # 如果没有提供resource_id，但有资源信息，则创建或查找资源
-        if not resource_id and hasattr(record_data, 'resource_title') and record_data.resource_title:
-            resource_type = get_valid_resource_type(
-                record_data.resource_type or record_data.form_type, 
-                record_data.resource_type
-            )
-            resource_id = await create_or_find_resource(
-                client, 
-                title=record_data.resource_title,
-                resource_type=resource_type,
-                created_by=current_user_id,
-                author=getattr(record_data, 'resource_author', None),
-                url=getattr(record_data, 'resource_url', None),
-                platform=getattr(record_data, 'resource_platform', None),
-                isbn=getattr(record_data, 'resource_isbn', None),
-                description=getattr(record_data, 'resource_description', None)
-            )
-        elif not resource_id:
-            # 如果没有资源信息，使用记录标题创建简单资源
-            resource_type = get_valid_resource_type(record_data.form_type)
-            resource_id = await create_or_find_resource(
-                client, 
-                title=record_data.title,
-                resource_type=resource_type,
-                created_by=current_user_id
-            )
+EXPORT_CHUNK_SIZE = 500
+
+EXPORT_CSV_COLUMNS = [
+    'record_id', 'occurred_at', 'form_type', 'title', 'body_md', 'duration_min', 'effective_duration_min',
+    'mood', 'difficulty', 'focus', 'energy', 'privacy', 'resource_id', 'tags', 'assets',
+    'created_at', 'updated_at'
+]
+
+async def iter_record_chunks(client, user_id: str, start_date: Optional[datetime] = None) -> AsyncIterator[list]:
+    """按 (occurred_at, record_id) keyset 逐块读取用户记录并补充标签，内存占用只与块大小有关"""
+    cursor_key = None
+    while True:
+        query = client.table('records').select(RECORD_LIST_COLUMNS).eq('user_id', user_id)
+        if start_date:
+            query = query.gte('occurred_at', start_date.isoformat())
+        response = await paginate_records(query, EXPORT_CHUNK_SIZE, cursor_key).execute()
         
-        # 准备插入记录数据
-        insert_data = {
-            "user_id": current_user_id,
-            "resource_id": resource_id,
-            "form_type": record_data.form_type,
-            "title": record_data.title,
-            "body_md": record_data.body_md,
-            "occurred_at": (record_data.occurred_at or datetime.utcnow()).isoformat(),
-            "duration_min": record_data.duration_min,
-            "effective_duration_min": record_data.effective_duration_min,
-            "mood": record_data.mood,
-            "difficulty": record_data.difficulty,
-            "focus": record_data.focus,
-            "energy": record_data.energy,
-            "privacy": record_data.privacy or "private",
-            "assets": record_data.assets
+        rows = response.data or []
+        chunk = rows[:EXPORT_CHUNK_SIZE]
+        if chunk:
+            yield await attach_tags(client, chunk, user_id)
+        if len(rows) <= EXPORT_CHUNK_SIZE:
+            return
+        cursor_key = (chunk[-1]['occurred_at'], chunk[-1]['record_id'])
+
+async def export_ndjson(chunks: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        yield b''.join(dumps(record) + b'\n' for record in chunk)
+
+async def export_csv(chunks: AsyncIterator[list]) -> AsyncIterator[str]:
+    # BOM 让 Excel 正确识别 UTF-8 中文；表头立即发出
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    yield '\ufeff' + buffer.getvalue()
+    
+    async for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        for record in chunk:
+            if record.get('assets') is not None:
+                record['assets'] = json.dumps(record['assets'], ensure_ascii=False)
+            writer.writerow(record)
+        yield buffer.getvalue()
+
+@router.get("/export")
+async def export_records(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="导出格式：ndjson 或 csv"),
+    days: Optional[int] = Query(None, ge=1, le=3650, description="只导出最近N天的记录"),
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
+):
+    """流式导出用户的全部学习记录（按时间倒序，分块读取、边查边写）"""
+    start_date = datetime.now() - timedelta(days=days) if days else None
+    chunks = iter_record_chunks(client, current_user_id, start_date)
+    
+    if format == 'csv':
+        body, media_type = export_csv(chunks), 'text/csv'
+    else:
+        body, media_type = export_ndjson(chunks), 'application/x-ndjson'
+    
+    filename = f"study-records-{datetime.now().strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store"
         }
+    )
+
+@router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
+async def create_record(
+    record_data: RecordCreate,
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
+):
+    """创建新的学习记录，包括资源和标签处理"""
+    try:
+        payload = build_create_record_payload(record_data)
         
-        # 插入记录
-        record_response = client.table('records').insert(insert_data).execute()
+        # 学习形式校验、资源、记录、标签、用户资源关系在数据库函数中一个事务内完成（见 sql/010）
+        response = await client.rpc('create_record_with_tags', {
+            'p_user_id': current_user_id,
+            'p_payload': payload
+        }).execute()
         
-        if not record_response.data:
+        if not response.data:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to create record"
             )
         
-        created_record = record_response.data[0]
-        record_id = created_record['record_id']
+        record_with_tags = response.data[0]['created_record']
         
-        # 处理标签关系
-        if record_data.tags and resource_id:
-            await process_tags_for_resource(
-                client,
-                tags=record_data.tags,
-                resource_id=resource_id,
-                user_id=current_user_id
-            )
-        
-        # 处理用户资源关系（如果有相关数据）
-        if resource_id and hasattr(record_data, '__dict__'):
-            user_resource_data = {}
-            
-            # 检查是否有用户资源关系相关的字段
-            for attr_name in dir(record_data):
-                if attr_name.startswith('user_resource_'):
-                    attr_value = getattr(record_data, attr_name)
-                    if attr_value is not None:
-                        field_name = attr_name.replace('user_resource_', '')
-                        if field_name == 'status':
-                            user_resource_data['status'] = attr_value
-                        elif field_name == 'rating':
-                            user_resource_data['rating'] = attr_value
-                        elif field_name == 'review_short':
-                            user_resource_data['review_short'] = attr_value
-                        elif field_name == 'is_favorite':
-                            user_resource_data['is_favorite'] = attr_value
-            
-            if user_resource_data:
-                # 检查是否已存在用户资源关系
-                existing_user_resource = client.table('user_resources').select('*').eq('user_id', current_user_id).eq('resource_id', resource_id).execute()
-                
-                if not existing_user_resource.data:
-                    # 创建新的用户资源关系
-                    user_resource_create_data = {
-                        'user_id': current_user_id,
-                        'resource_id': resource_id,
-                        **user_resource_data
-                    }
-                    user_resource_response = client.table('user_resources').insert(user_resource_create_data).execute()
-                    if not user_resource_response.data:
-                        print(f"警告: 用户资源关系创建可能失败，resource_id: {resource_id}")
-                else:
-                    # 更新现有的用户资源关系
-                    user_resource_response = client.table('user_resources').update(user_resource_data).eq('user_id', current_user_id).eq('resource_id', resource_id).execute()
-                    if not user_resource_response.data:
-                        print(f"警告: 用户资源关系更新可能失败，resource_id: {resource_id}")
-        
-        # 重新查询记录以包含标签信息（使用与get_records相同的逻辑）
-        record_with_tags = await get_record_with_tags(client, record_id, current_user_id)
-        
-        # 异步清除汇总缓存（新记录会影响统计数据）
-        try:
-            from .summaries import get_cache_key, _cache, _cache_expiry
-            
-            # 清除该用户的所有汇总缓存
-            keys_to_remove = []
-            for key in _cache.keys():
-                if key.startswith(f"{current_user_id}:"):
-                    keys_to_remove.append(key)
-            
-            for key in keys_to_remove:
-                if key in _cache:
-                    del _cache[key]
-                if key in _cache_expiry:
-                    del _cache_expiry[key]
-                    
-            print(f"✅ 清除了 {len(keys_to_remove)} 个缓存条目")
-                    
-        except Exception as cache_error:
-            print(f"⚠️ 清除缓存失败: {cache_error}")
-            # 缓存清除失败不应影响记录创建
+        # 汇总缓存失效只是推进一次代数；搜索分词放到后台执行，不阻塞响应
+        invalidate_user_caches(current_user_id)
+        side_effects.enqueue('search_index', index_records, client, [record_with_tags['record_id']])
         
         return record_with_tags
         
+    except HTTPException:
+        raise
+    except APIError as e:
+        if e.code == INVALID_PARAMETER_ERROR_CODE:
+            raise HTTPException(status_code=400, detail=e.message)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create record: {e.message}"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -378,6 +522,44 @@ async def create_record(
         )
 
 
+BULK_MAX_RECORDS = 1000
+
+@router.post("/bulk", response_model=dict)
+async def create_records_bulk(
+    bulk_data: RecordBulkCreate,
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
+):
+    """批量创建学习记录（历史数据导入、插件离线队列补传），逐条返回成功/失败"""
+    if not bulk_data.records:
+        raise HTTPException(status_code=400, detail="No records provided")
+    if len(bulk_data.records) > BULK_MAX_RECORDS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_RECORDS} records per request")
+    
+    created_ids = []
+    try:
+        payloads = [build_create_record_payload(record_data) for record_data in bulk_data.records]
+        results = await ingest_records(client, current_user_id, payloads, created_ids)
+        
+        created = len(created_ids)
+        return {
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create records: {str(e)}"
+        )
+    finally:
+        # 已提交的记录（包括中途出错前的分块）都要失效缓存并分词；整批作为一个后台任务，汇总缓存只失效一次
+        if created_ids:
+            invalidate_user_caches(current_user_id)
+            side_effects.enqueue('search_index', index_records, client, created_ids)
+
+
 async def create_or_find_resource(client, title: str, resource_type: str, created_by: str, 
                                 author: str = None, url: str = None, platform: str = None, 
                                 isbn: str = None, description: str = None):
@@ -387,7 +569,7 @@ async def create_or_find_resource(client, title: str, resource_type: str, create
         validated_resource_type = get_valid_resource_type(resource_type)
         
         # 首先尝试通过标题查找现有资源
-        existing_response = client.table('resources').select('resource_id').eq('title', title).eq('type', validated_resource_type).limit(1).execute()
+        existing_response = await client.table('resources').select('resource_id').eq('title', title).eq('type', validated_resource_type).limit(1).execute()
         
         if existing_response.data:
             return existing_response.data[0]['resource_id']
@@ -411,7 +593,7 @@ async def create_or_find_resource(client, title: str, resource_type: str, create
         if description:
             resource_data["description"] = description
         
-        create_response = client.table('resources').insert(resource_data).execute()
+        create_response = await client.table('resources').insert(resource_data).execute()
         
         if create_response.data:
             return create_response.data[0]['resource_id']
@@ -424,172 +606,36 @@ async def create_or_find_resource(client, title: str, resource_type: str, create
 
 
 async def process_tags_for_resource(client, tags: list, resource_id: int, user_id: str):
-    """处理资源的标签关系"""
+    """为资源追加标签（批量同步，不删除已有标签）"""
     try:
-        for tag_name in tags:
-            if not tag_name.strip():
-                continue
-                
-            # 创建或查找标签
-            tag_id = await create_or_find_tag(client, tag_name.strip(), user_id)
-            
-            # 创建资源-标签关系（如果不存在）
-            await create_resource_tag_relation(client, user_id, resource_id, tag_id)
-            
+        await sync_resource_tags(client, user_id, resource_id, tags, replace=False)
     except Exception as e:
         print(f"Error in process_tags_for_resource: {e}")
         # 不抛出异常，因为记录已经创建成功，标签失败不应该影响整个流程
 
-
-async def create_or_find_tag(client, tag_name: str, created_by: str):
-    """创建或查找标签"""
-    try:
-        # 查找现有标签
-        existing_response = client.table('tags').select('tag_id').eq('tag_name', tag_name).eq('created_by', created_by).limit(1).execute()
-        
-        if existing_response.data:
-            return existing_response.data[0]['tag_id']
-        
-        # 如果不存在，创建新标签
-        tag_data = {
-            "tag_name": tag_name,
-            "tag_type": "category",
-            "created_by": created_by
-        }
-        
-        create_response = client.table('tags').insert(tag_data).execute()
-        
-        if create_response.data:
-            return create_response.data[0]['tag_id']
-        else:
-            raise Exception(f"Failed to create tag: {tag_name}")
-            
-    except Exception as e:
-        print(f"Error in create_or_find_tag: {e}")
-        raise
-
-
-async def create_resource_tag_relation(client, user_id: str, resource_id: int, tag_id: int):
-    """创建资源-标签关系"""
-    try:
-        # 检查关系是否已存在
-        existing_response = client.table('resource_tags').select('resource_tag_id').eq('user_id', user_id).eq('resource_id', resource_id).eq('tag_id', tag_id).limit(1).execute()
-        
-        if existing_response.data:
-            return  # 关系已存在
-        
-        # 创建新的关系
-        relation_data = {
-            "user_id": user_id,
-            "resource_id": resource_id,
-            "tag_id": tag_id
-        }
-        
-        client.table('resource_tags').insert(relation_data).execute()
-        
-    except Exception as e:
-        print(f"Error in create_resource_tag_relation: {e}")
-        # 不抛出异常，因为这不是关键失败
-
-
-async def get_record_with_tags(client, record_id: int, user_id: str):
-    """获取包含标签信息的单条记录"""
-    try:
-        # 查询记录
-        record_response = client.table('records').select('*').eq('record_id', record_id).eq('user_id', user_id).execute()
-        
-        if not record_response.data:
-            return None
-        
-        record = record_response.data[0]
-        
-        # 添加标签信息（使用与get_records相同的逻辑）
-        if record.get('resource_id'):
-            try:
-                # 查询资源标签关联
-                resource_tags_response = client.table('resource_tags').select('tag_id').eq('user_id', user_id).eq('resource_id', record['resource_id']).execute()
-                
-                tag_names = []
-                if resource_tags_response.data:
-                    # 获取所有标签ID
-                    tag_ids = [rt['tag_id'] for rt in resource_tags_response.data]
-                    
-                    if tag_ids:
-                        # 查询标签名称
-                        tags_response = client.table('tags').select('tag_name').in_('tag_id', tag_ids).execute()
-                        if tags_response.data:
-                            tag_names = [tag['tag_name'] for tag in tags_response.data]
-                
-                record['tags'] = ','.join(tag_names) if tag_names else ''
-            except Exception as tag_error:
-                print(f"标签查询失败: {tag_error}")
-                record['tags'] = ''
-        else:
-            record['tags'] = ''
-        
-        return record
-        
-    except Exception as e:
-        print(f"Error in get_record_with_tags: {e}")
-        return None
-
 @router.get("/{record_id}", response_model=dict)
 async def get_record(
     record_id: int,
-    current_user_id: str = Depends(get_current_user_id)
+    request: Request,
+    response: Response,
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """获取特定的学习记录及其完整详情"""
+    etag = await user_data_etag(client, current_user_id, 'record', record_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     try:
-        from supabase import create_client
-        from app.core.config import settings
-        
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        
-        # 1. 获取记录基本信息
-        record_response = client.table('records').select('*').eq('record_id', record_id).eq('user_id', current_user_id).execute()
+        result = await get_full_record_detail(client, record_id, current_user_id)
         
-        if not record_response.data:
+        if result is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Record not found"
             )
         
-        record = record_response.data[0]
-        result = dict(record)
-        
-        # 2. 获取关联的资源信息
-        resource_info = None
-        if record.get('resource_id'):
-            resource_response = client.table('resources').select('*').eq('resource_id', record['resource_id']).execute()
-            if resource_response.data:
-                resource_info = resource_response.data[0]
-        result['resource'] = resource_info
-        
-        # 3. 获取用户-资源关系信息
-        user_resource_info = None
-        if record.get('resource_id'):
-            user_resource_response = client.table('user_resources').select('*').eq('user_id', current_user_id).eq('resource_id', record['resource_id']).execute()
-            if user_resource_response.data:
-                user_resource_info = user_resource_response.data[0]
-        result['user_resource'] = user_resource_info
-        
-        # 4. 获取标签信息
-        tags_info = []
-        if record.get('resource_id'):
-            # 获取资源标签关联
-            resource_tags_response = client.table('resource_tags').select('tag_id').eq('user_id', current_user_id).eq('resource_id', record['resource_id']).execute()
-            
-            if resource_tags_response.data:
-                tag_ids = [rt['tag_id'] for rt in resource_tags_response.data]
-                
-                # 获取标签详细信息
-                if tag_ids:
-                    tags_response = client.table('tags').select('*').in_('tag_id', tag_ids).execute()
-                    if tags_response.data:
-                        tags_info = tags_response.data
-        
-        result['tags'] = tags_info
-        
+        set_cache_headers(response, etag)
         return result
         
     except Exception as e:
@@ -604,17 +650,13 @@ async def get_record(
 async def update_record(
     record_id: int,
     record_update: dict,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """更新学习记录及其相关资源、标签信息"""
     try:
-        from supabase import create_client
-        from app.core.config import settings
-        
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        
         # 首先检查记录是否存在并获取当前数据
-        check_response = client.table('records').select('*').eq('record_id', record_id).eq('user_id', current_user_id).execute()
+        check_response = await client.table('records').select('record_id, resource_id').eq('record_id', record_id).eq('user_id', current_user_id).execute()
         
         if not check_response.data:
             raise HTTPException(
@@ -643,13 +685,16 @@ async def update_record(
         # 更新记录数据
         record_update_data = {k: v for k, v in record_update.items() if k in record_fields}
         if record_update_data:
-            response = client.table('records').update(record_update_data).eq('record_id', record_id).eq('user_id', current_user_id).execute()
+            response = await client.table('records').update(record_update_data).eq('record_id', record_id).eq('user_id', current_user_id).execute()
             
             if not response.data:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to update record"
                 )
+            if 'title' in record_update_data or 'body_md' in record_update_data:
+                # 标题或正文变化时后台重新分词
+                side_effects.enqueue('search_index', index_records, client, [record_id])
         
         # 更新资源数据（如果存在资源）
         resource_update_data = {}
@@ -675,7 +720,7 @@ async def update_record(
                 resource_update_data[field_name] = v
         
         if resource_update_data and current_record.get('resource_id'):
-            resource_response = client.table('resources').update(resource_update_data).eq('resource_id', current_record['resource_id']).execute()
+            resource_response = await client.table('resources').update(resource_update_data).eq('resource_id', current_record['resource_id']).execute()
             
             if not resource_response.data:
                 print(f"警告: 资源更新可能失败，resource_id: {current_record['resource_id']}")
@@ -696,11 +741,11 @@ async def update_record(
         
         if user_resource_update_data and current_record.get('resource_id'):
             # 检查是否已存在用户资源关系
-            existing_user_resource = client.table('user_resources').select('*').eq('user_id', current_user_id).eq('resource_id', current_record['resource_id']).execute()
+            existing_user_resource = await client.table('user_resources').select('*').eq('user_id', current_user_id).eq('resource_id', current_record['resource_id']).execute()
             
             if existing_user_resource.data:
                 # 更新现有的用户资源关系
-                user_resource_response = client.table('user_resources').update(user_resource_update_data).eq('user_id', current_user_id).eq('resource_id', current_record['resource_id']).execute()
+                user_resource_response = await client.table('user_resources').update(user_resource_update_data).eq('user_id', current_user_id).eq('resource_id', current_record['resource_id']).execute()
                 if not user_resource_response.data:
                     print(f"警告: 用户资源关系更新可能失败，resource_id: {current_record['resource_id']}")
             else:
@@ -710,7 +755,7 @@ async def update_record(
                     'resource_id': current_record['resource_id'],
                     **user_resource_update_data
                 }
-                user_resource_response = client.table('user_resources').insert(user_resource_create_data).execute()
+                user_resource_response = await client.table('user_resources').insert(user_resource_create_data).execute()
                 if not user_resource_response.data:
                     print(f"警告: 用户资源关系创建可能失败，resource_id: {current_record['resource_id']}")
         
@@ -718,6 +763,9 @@ async def update_record(
         if 'tags' in record_update:
             await update_record_tags(client, current_record['resource_id'], record_update['tags'], current_user_id, record_id)
         
+        # 记录、资源、标签的修改都会影响汇总
+        invalidate_user_caches(current_user_id)
+        
         # 返回更新后的完整记录
         return await get_full_record_detail(client, record_id, current_user_id)
         
@@ -732,48 +780,16 @@ async def update_record(
 
 # 辅助函数
 async def get_full_record_detail(client, record_id: int, user_id: str):
-    """获取完整的记录详情"""
-    # 重用现有的get_record逻辑
-    record_response = client.table('records').select('*').eq('record_id', record_id).eq('user_id', user_id).execute()
+    """获取完整的记录详情（资源、用户-资源关系、标签由数据库函数一次返回，见 sql/009）"""
+    response = await client.rpc('get_record_detail', {
+        'p_user_id': user_id,
+        'p_record_id': record_id
+    }).execute()
     
-    if not record_response.data:
+    if not response.data:
         return None
     
-    record = record_response.data[0]
-    result = dict(record)
-    
-    # 获取关联的资源信息
-    resource_info = None
-    if record.get('resource_id'):
-        resource_response = client.table('resources').select('*').eq('resource_id', record['resource_id']).execute()
-        if resource_response.data:
-            resource_info = resource_response.data[0]
-    result['resource'] = resource_info
-    
-    # 获取用户-资源关系信息
-    user_resource_info = None
-    if record.get('resource_id'):
-        user_resource_response = client.table('user_resources').select('*').eq('user_id', user_id).eq('resource_id', record['resource_id']).execute()
-        if user_resource_response.data:
-            user_resource_info = user_resource_response.data[0]
-    result['user_resource'] = user_resource_info
-    
-    # 获取标签信息
-    tags_info = []
-    if record.get('resource_id'):
-        resource_tags_response = client.table('resource_tags').select('tag_id').eq('user_id', user_id).eq('resource_id', record['resource_id']).execute()
-        
-        if resource_tags_response.data:
-            tag_ids = [rt['tag_id'] for rt in resource_tags_response.data]
-            
-            if tag_ids:
-                tags_response = client.table('tags').select('*').in_('tag_id', tag_ids).execute()
-                if tags_response.data:
-                    tags_info = tags_response.data
-    
-    result['tags'] = tags_info
-    
-    return result
+    return response.data[0]['detail']
 
 async def update_record_tags(client, resource_id: int, tags_data: list, user_id: str, record_id: int = None):
     """更新记录的标签"""
@@ -782,7 +798,7 @@ async def update_record_tags(client, resource_id: int, tags_data: list, user_id:
         print(f"为记录 {record_id} 创建虚拟资源以关联标签")
         
         # 获取记录信息作为资源
-        record_response = client.table('records').select('title, form_type').eq('record_id', record_id).execute()
+        record_response = await client.table('records').select('title, form_type').eq('record_id', record_id).execute()
         if not record_response.data:
             return
             
@@ -797,12 +813,12 @@ async def update_record_tags(client, resource_id: int, tags_data: list, user_id:
             'created_by': user_id
         }
         
-        resource_response = client.table('resources').insert(resource_data).execute()
+        resource_response = await client.table('resources').insert(resource_data).execute()
         if resource_response.data:
             resource_id = resource_response.data[0]['resource_id']
             
             # 更新记录的resource_id
-            client.table('records').update({'resource_id': resource_id}).eq('record_id', record_id).execute()
+            await client.table('records').update({'resource_id': resource_id}).eq('record_id', record_id).execute()
             print(f"✅ 为记录 {record_id} 创建了虚拟资源 {resource_id}")
         else:
             print(f"❌ 创建虚拟资源失败")
@@ -812,20 +828,8 @@ async def update_record_tags(client, resource_id: int, tags_data: list, user_id:
         return
         
     try:
-        # 删除现有的资源标签关联
-        client.table('resource_tags').delete().eq('user_id', user_id).eq('resource_id', resource_id).execute()
-        
-        # 添加新的标签关联
-        for tag_data in tags_data:
-            tag_name = tag_data.get('tag_name')
-            if not tag_name:
-                continue
-                
-            # 创建或查找标签
-            tag_id = await create_or_find_tag(client, tag_name, user_id)
-            
-            # 创建资源-标签关系
-            await create_resource_tag_relation(client, user_id, resource_id, tag_id)
+        # 与现有关联求差集，只增删变化的标签
+        await sync_resource_tags(client, user_id, resource_id, tags_data, replace=True)
             
     except Exception as e:
         print(f"更新标签失败: {e}")
@@ -834,17 +838,13 @@ async def update_record_tags(client, resource_id: int, tags_data: list, user_id:
 @router.delete("/{record_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_record(
     record_id: int,
-    current_user_id: str = Depends(get_current_user_id)
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
 ):
     """删除学习记录"""
     try:
-        from supabase import create_client
-        from app.core.config import settings
-        
-        client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
-        
         # 首先检查记录是否存在
-        check_response = client.table('records').select('record_id').eq('record_id', record_id).eq('user_id', current_user_id).execute()
+        check_response = await client.table('records').select('record_id').eq('record_id', record_id).eq('user_id', current_user_id).execute()
         
         if not check_response.data:
             raise HTTPException(
@@ -853,7 +853,8 @@ async def delete_record(
             )
         
         # 删除记录
-        response = client.table('records').delete().eq('record_id', record_id).eq('user_id', current_user_id).execute()
+        response = await client.table('records').delete().eq('record_id', record_id).eq('user_id', current_user_id).execute()
+        invalidate_user_caches(current_user_id)
         
         # 返回空响应 (204 No Content)
         from fastapi import Response
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import select
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.database import get_async_db
 from app.core.auth import get_current_user_id
 from app.models.resource import Resource, UserResource
 from app.schemas.resource import ResourceResponse, UserResourceResponse
@@ -16,20 +17,22 @@ async def get_resources(
     resource_type: Optional[str] = Query(None, description="过滤资源类型"),
     search: Optional[str] = Query(None, min_length=2, description="搜索资源标题"),
     current_user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取资源列表"""
-    query = db.query(Resource)
+    query = select(Resource)
     
     # 类型过滤
     if resource_type:
-        query = query.filter(Resource.type == resource_type)
+        query = query.where(Resource.type == resource_type)
     
     # 标题搜索
     if search:
-        query = query.filter(Resource.title.ilike(f"%{search}%"))
+        query = query.where(Resource.title.ilike(f"%{search}%"))
     
-    resources = query.order_by(Resource.created_at.desc()).offset(skip).limit(limit).all()
+    resources = (await db.scalars(
+        query.order_by(Resource.created_at.desc()).offset(skip).limit(limit)
+    )).all()
     return resources
 
 @router.get("/my", response_model=List[UserResourceResponse])
@@ -38,25 +41,32 @@ async def get_my_resources(
     limit: int = Query(50, ge=1, le=100),
     status: Optional[str] = Query(None, description="过滤学习状态"),
     favorites_only: bool = Query(False, description="只显示收藏"),
+    sort: str = Query("recent", pattern="^(recent|duration)$", description="recent：最近学习；duration：累计时长最多"),
     current_user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取用户的资源学习状态"""
-    query = db.query(UserResource).options(
+    query = select(UserResource).options(
         joinedload(UserResource.resource)
-    ).filter(UserResource.user_id == current_user_id)
+    ).where(UserResource.user_id == current_user_id)
     
     # 状态过滤
     if status:
-        query = query.filter(UserResource.status == status)
+        query = query.where(UserResource.status == status)
     
     # 收藏过滤
     if favorites_only:
-        query = query.filter(UserResource.is_favorite == True)
+        query = query.where(UserResource.is_favorite == True)
     
-    user_resources = query.order_by(
-        UserResource.last_interaction_at.desc().nullslast()
-    ).offset(skip).limit(limit).all()
+    # 两种排序都有 (user_id, ...) 索引（见 sql/001、sql/017），累计时长由触发器维护
+    if sort == "duration":
+        order_by = (UserResource.total_duration_min.desc(), UserResource.user_resource_id.desc())
+    else:
+        order_by = (UserResource.last_interaction_at.desc().nullslast(),)
+    
+    user_resources = (await db.scalars(
+        query.order_by(*order_by).offset(skip).limit(limit)
+    )).all()
     
     # 手动构建响应，包含resource信息
     result = []
@@ -89,10 +99,10 @@ async def get_my_resources(
 async def get_resource(
     resource_id: int,
     current_user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取特定资源详情"""
-    resource = db.query(Resource).filter(Resource.resource_id == resource_id).first()
+    resource = await db.scalar(select(Resource).where(Resource.resource_id == resource_id))
     
     if not resource:
         raise HTTPException(
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from typing import Optional
+from app.core.auth import get_current_user_id
+from app.core.pagination import decode_sync_token, encode_sync_page_token, encode_sync_token
+from app.core.supabase_client import AsyncDataClient, get_data_client
+
+router = APIRouter()
+
+SYNC_ENTITIES = ('records', 'templates', 'form_types', 'tags')
+
+@router.get("/", response_model=dict)
+async def sync_changes(
+    response: Response,
+    since: Optional[str] = Query(None, description="上次同步返回的next_token；不传为全量同步"),
+    limit: int = Query(500, ge=1, le=2000, description="每页最多返回的记录数"),
+    current_user_id: str = Depends(get_current_user_id),
+    client: AsyncDataClient = Depends(get_data_client)
+):
+    """
+    增量同步（前端 IndexedDB 缓存使用，见 sql/018）
+    返回 since 之后新增/修改的记录、模板、学习形式、资源标签，以及被删除的 id（deleted）。
+    full_sync 为 true 时客户端应整体替换本地缓存；has_more 为 true 时用 next_token 继续拉取下一页记录。
+    """
+    since_version, until, after_version, after_id = decode_sync_token(since) if since else (None, None, None, None)
+
+    try:
+        sync_response = await client.rpc('sync_changes', {
+            'p_user_id': current_user_id,
+            'p_since': since_version,
+            'p_until': until,
+            'p_after_version': after_version,
+            'p_after_id': after_id,
+            'p_limit': limit
+        }).execute()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to sync changes: {str(e)}"
+        )
+
+    result = sync_response.data[0]
+    records = result['records']
+    full_sync = result['full_sync']
+
+    if result['has_more']:
+        last = records[-1]
+        next_token = encode_sync_page_token(
+            None if full_sync else since_version, result['version'], last['sync_version'], last['record_id']
+        )
+    else:
+        next_token = encode_sync_token(result['version'])
+
+    response.headers["Cache-Control"] = "no-store"
+    return {
+        "full_sync": full_sync,
+        "records": records,
+        # 续传页只有记录，其余实体已在第一页返回
+        **{entity: result[entity] or [] for entity in SYNC_ENTITIES if entity != 'records'},
+        "deleted": result['deleted'] or {},
+        "has_more": result['has_more'],
+        "next_token": next_token
+    }
@@ -1,72 +1,307 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+import httpx
 from fastapi import HTTPException, Security, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
-from supabase import create_client, Client
 from app.core.config import settings
-
-# Supabase客户端
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+from app.core.supabase_client import get_supabase_client
 
 security = HTTPBearer()
 
+# 非对称签名（RS256/ES256）项目的公钥集合缓存
+# fetched_at: 最近一次成功拉取；attempted_at: 最近一次发起拉取（无论成败），用于限制刷新频率
+_jwks_cache = {"keys": [], "fetched_at": 0.0, "attempted_at": None, "failed": False}
+_jwks_lock = asyncio.Lock()
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "ES256"}
+
+
+class VerifiedTokenCache:
+    """
+    远程校验结果缓存：LRU + TTL，按token的SHA-256哈希存储（不保存原始token）
+    每个条目的过期时间取 TTL 与 token 自身 exp 中较早者
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, claims)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def key_for(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims
+
+    def set(self, key: str, claims: dict):
+        expires_at = time.time() + self.ttl_seconds
+        token_exp = claims.get("exp")
+        if isinstance(token_exp, (int, float)):
+            expires_at = min(expires_at, token_exp)
+        if expires_at <= time.time():
+            return
+
+        with self._lock:
+            self._entries[key] = (expires_at, claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_rate": round(self.hits / total, 3) if total else 0,
+            }
+
+
+token_cache = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_TOKEN_CACHE_TTL_SECONDS)
+
+# 正在进行中的远程校验（同一token的并发请求只发起一次往返）
+_inflight_verifications: Dict[str, asyncio.Future] = {}
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid authentication credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def _jwks_unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service unavailable",
+    )
+
+
+def _cached_jwks(force_refresh: bool) -> Optional[list]:
+    """不需要拉取时返回缓存的公钥；需要拉取时返回None"""
+    now = time.monotonic()
+    attempted_at = _jwks_cache["attempted_at"]
+    if attempted_at is not None and now - attempted_at < settings.AUTH_JWKS_MIN_REFRESH_SECONDS:
+        # 刚拉取过（包括强制刷新与失败的拉取）：不再请求上游
+        if _jwks_cache["failed"] and not _jwks_cache["keys"]:
+            raise _jwks_unavailable()
+        return _jwks_cache["keys"]
+    if not force_refresh and _jwks_cache["keys"] and now - _jwks_cache["fetched_at"] < settings.AUTH_JWKS_CACHE_SECONDS:
+        return _jwks_cache["keys"]
+    return None
+
+
+async def _get_jwks(force_refresh: bool = False) -> list:
+    """
+    获取Supabase Auth的JWKS公钥（带缓存，过期或找不到kid时才重新拉取）
+    两次拉取至少间隔 AUTH_JWKS_MIN_REFRESH_SECONDS，未知kid不会让每个请求都访问上游；
+    拉取失败时沿用旧的公钥，从未拉取成功时返回503
+    """
+    keys = _cached_jwks(force_refresh)
+    if keys is not None:
+        return keys
+
+    async with _jwks_lock:
+        # 其他协程可能已经刷新过
+        keys = _cached_jwks(force_refresh)
+        if keys is not None:
+            return keys
+
+        _jwks_cache["attempted_at"] = time.monotonic()
+        try:
+            async with httpx.AsyncClient(timeout=5.0) as http:
+                response = await http.get(settings.SUPABASE_JWKS_URL)
+                response.raise_for_status()
+                keys = response.json().get("keys", [])
+        except (httpx.HTTPError, ValueError) as e:
+            _jwks_cache["failed"] = True
+            print(f"⚠️ 拉取JWKS失败: {e}")
+            if not _jwks_cache["keys"]:
+                raise _jwks_unavailable()
+            return _jwks_cache["keys"]
+
+        _jwks_cache["keys"] = keys
+        _jwks_cache["fetched_at"] = time.monotonic()
+        _jwks_cache["failed"] = False
+
+    return _jwks_cache["keys"]
+
+
+async def _resolve_signing_key(token: str):
+    """根据token header选择校验密钥，返回 (key, algorithms)；无法本地校验时返回 (None, None)"""
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+
+    if algorithm == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            return None, None
+        return settings.SUPABASE_JWT_SECRET, ["HS256"]
+
+    if algorithm in ASYMMETRIC_ALGORITHMS:
+        kid = header.get("kid")
+        for force_refresh in (False, True):
+            keys = await _get_jwks(force_refresh=force_refresh)
+            for key in keys:
+                if key.get("kid") == kid:
+                    return key, [algorithm]
+        raise JWTError(f"Unknown signing key: {kid}")
+
+    raise JWTError(f"Unsupported token algorithm: {algorithm}")
+
+
+async def verify_token_locally(token: str) -> dict:
+    """
+    本地校验Supabase JWT（签名、过期时间、audience、issuer），返回claims
+    无法本地校验（例如HS256但未配置SUPABASE_JWT_SECRET）时返回None
+    """
+    key, algorithms = await _resolve_signing_key(token)
+    if key is None:
+        return None
+
+    claims = jwt.decode(
+        token,
+        key,
+        algorithms=algorithms,
+        audience=settings.SUPABASE_JWT_AUDIENCE,
+        issuer=settings.SUPABASE_JWT_ISSUER,
+        options={"leeway": settings.AUTH_CLOCK_SKEW_SECONDS},
+    )
+    if not claims.get("sub"):
+        raise JWTError("Token has no subject")
+    return claims
+
+
+def verify_token_remote(token: str) -> dict:
+    """调用Supabase Auth校验token（可发现已注销/被吊销的会话），返回claims"""
+    response = get_supabase_client().auth.get_user(token)
+
+    if response.user is None:
+        raise _credentials_exception()
+
+    try:
+        # 不验证签名，只解析payload（因为Supabase已经验证过了）
+        claims = jwt.get_unverified_claims(token)
+    except JWTError:
+        # 如果JWT解析失败，至少返回用户基本信息
+        claims = {}
+    claims.setdefault("sub", response.user.id)
+    claims.setdefault("email", response.user.email)
+    return claims
+
+
+async def verify_token_remote_cached(token: str) -> dict:
+    """远程校验（带缓存与并发合并）：一批并发请求中只有第一个会真正调用Supabase"""
+    key = token_cache.key_for(token)
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    future = _inflight_verifications.get(key)
+    if future is not None:
+        token_cache.coalesced += 1
+    else:
+        future = asyncio.ensure_future(run_in_threadpool(verify_token_remote, token))
+        _inflight_verifications[key] = future
+
+        def _on_done(done: asyncio.Future, key: str = key):
+            _inflight_verifications.pop(key, None)
+            if not done.cancelled() and done.exception() is None:
+                token_cache.set(key, done.result())
+
+        future.add_done_callback(_on_done)
+
+    # shield：单个请求被取消时不影响其他等待同一结果的请求
+    return await asyncio.shield(future)
+
+
+def get_token_cache_stats() -> dict:
+    """获取token校验缓存统计"""
+    return {
+        "verify_mode": settings.AUTH_VERIFY_MODE,
+        "inflight": len(_inflight_verifications),
+        **token_cache.stats(),
+    }
+
+
+async def authenticate_token(token: str, check_revocation: bool = False) -> dict:
+    """
+    校验token并返回claims
+    默认本地校验；AUTH_VERIFY_MODE=remote 时走带缓存的远程校验；
+    check_revocation=True 时总是实时远程校验（不读缓存）
+    """
+    if check_revocation:
+        return await run_in_threadpool(verify_token_remote, token)
+
+    if settings.AUTH_VERIFY_MODE == "remote":
+        return await verify_token_remote_cached(token)
+
+    claims = await verify_token_locally(token)
+    if claims is None:
+        # 未配置本地校验密钥，退回远程校验
+        return await verify_token_remote_cached(token)
+    return claims
+
+
 async def get_current_user_id(credentials: HTTPAuthorizationCredentials = Security(security)) -> str:
     """
     验证JWT token并返回用户ID
     """
-    token = credentials.credentials
-    
     try:
-        # 验证Supabase JWT token
-        response = supabase.auth.get_user(token)
-        
-        if response.user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-            
-        return response.user.id
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        claims = await authenticate_token(credentials.credentials)
+        return claims["sub"]
+    except HTTPException:
+        raise
+    except Exception:
+        raise _credentials_exception()
+
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
     """
     验证JWT token并返回用户信息
     """
-    token = credentials.credentials
-    
     try:
-        # 验证Supabase JWT token
-        response = supabase.auth.get_user(token)
-        
-        if response.user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        # 解析JWT token获取payload
-        try:
-            # 不验证签名，只解析payload（因为Supabase已经验证过了）
-            payload = jwt.get_unverified_claims(token)
-            return payload
-        except JWTError:
-            # 如果JWT解析失败，至少返回用户基本信息
-            return {
-                "sub": response.user.id,
-                "email": response.user.email
-            }
-        
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        return await authenticate_token(credentials.credentials)
+    except HTTPException:
+        raise
+    except Exception:
+        raise _credentials_exception()
+
+
+async def get_current_user_checked(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
+    """
+    验证JWT token并远程确认会话未被吊销（用于修改邮箱/密码等敏感操作）
+    """
+    try:
+        return await authenticate_token(credentials.credentials, check_revocation=True)
+    except HTTPException:
+        raise
+    except Exception:
+        raise _credentials_exception()
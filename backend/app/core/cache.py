@@ -0,0 +1,373 @@
+"""
+进程内 LRU + TTL 缓存
+
+替代 summaries 中无上限的模块级字典：
+- 条目数与估算字节数（值的 JSON 序列化长度）双重上限，超出时按 LRU 淘汰最久未使用的条目；
+- 每个条目有自己的过期时间，读到硬过期的条目即删除，后台任务再定期清理没人读的硬过期条目；
+- 每个 owner（用户ID）有一个缓存代数（generation），并作为缓存键的一部分：用户数据写入后只需推进代数（O(1)），
+  旧代数的条目不再命中，随 TTL / LRU 自然淘汰；
+- 所有操作持有同一把锁，可以在事件循环与线程池中同时使用；
+- get_or_compute 对同一个键的并发未命中只计算一次（single-flight），其余请求等待同一个结果；
+- 过期时间带随机抖动，同一批写入的条目不会在同一时刻集中过期；
+- stale-while-revalidate：过期后的宽限期内 get_or_compute 立即返回旧值（附带年龄），同时在后台刷新；
+  超过宽限期（硬过期）或用户数据写入（代数推进）后旧值不再返回；
+- 按命名空间（dashboard / recent / init_data ...）统计命中、未命中、淘汰、过期与内存占用。
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from itertools import count
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.core.responses import dumps
+
+CacheKey = Tuple[str, str, int, Hashable]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    created_at: float
+    # 过期（之后只在宽限期内作为旧值返回）
+    expires_at: float
+    # 硬过期（之后删除）
+    stale_until: float
+
+
+class CacheResult(NamedTuple):
+    value: Any
+    # 距离计算完成的秒数
+    age: float
+    # 是否为宽限期内返回的过期旧值（后台正在刷新）
+    stale: bool
+
+
+class _NamespaceStats:
+    __slots__ = (
+        "entries", "bytes", "hits", "stale_hits", "misses", "evictions", "expirations",
+        "computations", "collapsed", "refreshes", "errors"
+    )
+
+    def __init__(self):
+        self.entries = 0
+        self.bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.computations = 0
+        self.collapsed = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict:
+        served = self.hits + self.stale_hits
+        total = served + self.misses
+        return {
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "computations": self.computations,
+            "collapsed": self.collapsed,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "hit_rate": round(served / total, 3) if total else 0,
+        }
+
+
+def estimate_size(value: Any) -> int:
+    """按 JSON 序列化后的长度估算条目大小（缓存的都是接口响应体）"""
+    try:
+        return len(dumps(value))
+    except TypeError:
+        return len(repr(value))
+
+
+class TTLCache:
+    def __init__(
+        self,
+        max_entries: int,
+        max_bytes: int,
+        default_ttl: float,
+        sweep_interval: float = 60.0,
+        ttl_jitter: float = 0.0,
+        stale_grace: float = 0.0
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sweep_interval = sweep_interval
+        self.ttl_jitter = ttl_jitter
+        self.stale_grace = stale_grace
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        # owner -> (代数, 推进时间)；代数取自全局递增计数，清理后重新推进也不会与旧值重复
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._generation_counter = count(1)
+        self._owner_entries: Dict[str, int] = defaultdict(int)
+        self._bytes = 0
+        self._stats: Dict[str, _NamespaceStats] = defaultdict(_NamespaceStats)
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # 进行中的计算（只在事件循环线程中访问）
+        self._inflight: Dict[CacheKey, asyncio.Task] = {}
+
+    def generation(self, owner: str) -> int:
+        """owner 当前的缓存代数；读数据之前取一次，写缓存时带上（见 set）"""
+        with self._lock:
+            return self._generation(owner)
+
+    def _generation(self, owner: str) -> int:
+        entry = self._generations.get(owner)
+        return entry[0] if entry else 0
+
+    def bump_generation(self, owner: str):
+        """推进 owner 的缓存代数：之前写入的条目全部失效"""
+        with self._lock:
+            self._generations[owner] = (next(self._generation_counter), time.monotonic())
+
+    def get(self, namespace: str, owner: str, params: Hashable = "") -> Optional[Any]:
+        """只返回未过期的值（宽限期内的旧值只由 get_or_compute 返回）"""
+        now = time.monotonic()
+        with self._lock:
+            key = (namespace, owner, self._generation(owner), params)
+            entry = self._lookup(key, now)
+            stats = self._stats[namespace]
+            if entry is None or entry.expires_at <= now:
+                stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            stats.hits += 1
+            return entry.value
+
+    def _lookup(self, key: CacheKey, now: float) -> Optional[_Entry]:
+        # 调用方须持有锁；硬过期的条目顺带删除
+        entry = self._entries.get(key)
+        if entry is not None and entry.stale_until <= now:
+            self._remove(key)
+            self._stats[key[0]].expirations += 1
+            return None
+        return entry
+
+    def set(
+        self,
+        namespace: str,
+        owner: str,
+        params: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        generation: Optional[int] = None
+    ):
+        """
+        generation 为读数据之前取得的代数：读取期间发生了写入（代数已推进）时，
+        这份可能过时的数据直接丢弃，不写入缓存
+        """
+        # 序列化估算大小放在锁外
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        ttl = ttl if ttl is not None else self.default_ttl
+        if self.ttl_jitter:
+            ttl *= random.uniform(1 - self.ttl_jitter, 1 + self.ttl_jitter)
+        now = time.monotonic()
+        entry = _Entry(value, size, now, now + ttl, now + ttl + self.stale_grace)
+
+        with self._lock:
+            current = self._generation(owner)
+            if generation is not None and generation != current:
+                return
+            key = (namespace, owner, current, params)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._owner_entries[owner] += 1
+            self._bytes += size
+            stats = self._stats[namespace]
+            stats.entries += 1
+            stats.bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats[oldest[0]].evictions += 1
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        owner: str,
+        params: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> CacheResult:
+        """
+        命中直接返回；过期但仍在宽限期内时立即返回旧值（stale=True），并在后台发起一次刷新。
+        未命中时同一个 (命名空间, 用户, 代数, 参数) 只有一个计算在进行，其余请求等待它的结果。
+        计算在独立任务中执行：发起它的请求断开（被取消）不影响其他等待者，结果照常写入缓存；
+        计算失败时所有等待者收到同一个异常，不写缓存，下一次请求重新计算。
+        """
+        now = time.monotonic()
+        with self._lock:
+            key = (namespace, owner, self._generation(owner), params)
+            stats = self._stats[namespace]
+            entry = self._lookup(key, now)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry.expires_at > now:
+                    stats.hits += 1
+                    return CacheResult(entry.value, now - entry.created_at, False)
+                stats.stale_hits += 1
+            else:
+                stats.misses += 1
+
+        if entry is not None:
+            if key not in self._inflight:
+                with self._lock:
+                    stats.refreshes += 1
+                self._start_compute(key, compute, ttl, refresh=True)
+            return CacheResult(entry.value, now - entry.created_at, True)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            with self._lock:
+                stats.collapsed += 1
+        else:
+            with self._lock:
+                stats.computations += 1
+            task = self._start_compute(key, compute, ttl)
+        return CacheResult(await asyncio.shield(task), 0.0, False)
+
+    def _start_compute(
+        self,
+        key: CacheKey,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[float],
+        refresh: bool = False
+    ) -> asyncio.Task:
+        task = asyncio.create_task(self._compute(key, compute, ttl))
+        self._inflight[key] = task
+
+        def done(task: asyncio.Task):
+            # 等待者全部断开（或后台刷新）时异常无人读取，这里取走避免 "exception was never retrieved" 警告
+            if task.cancelled():
+                return
+            error = task.exception()
+            if error is not None and refresh:
+                print(f"⚠️ 后台刷新缓存失败 ({key[0]}): {error}")
+
+        task.add_done_callback(done)
+        return task
+
+    async def _compute(self, key: CacheKey, compute: Callable[[], Awaitable[Any]], ttl: Optional[float]) -> Any:
+        namespace, owner, generation, params = key
+        try:
+            value = await compute()
+        except Exception:
+            with self._lock:
+                self._stats[namespace].errors += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self.set(namespace, owner, params, value, ttl, generation)
+        return value
+
+    def purge_expired(self) -> int:
+        """清理所有已过期条目与不再需要的代数记录，返回清理的条目数量"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry.stale_until <= now]
+            for key in expired:
+                self._remove(key)
+                self._stats[key[0]].expirations += 1
+            # 没有条目、且推进时间早于一个 TTL + 宽限期的代数可以丢弃（不会再有持有旧代数的请求写回）
+            stale_owners = [
+                owner for owner, (_, bumped_at) in self._generations.items()
+                if owner not in self._owner_entries and now - bumped_at > self.default_ttl + self.stale_grace
+            ]
+            for owner in stale_owners:
+                del self._generations[owner]
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owner_entries.clear()
+            self._bytes = 0
+            for stats in self._stats.values():
+                stats.entries = 0
+                stats.bytes = 0
+
+    def _remove(self, key: CacheKey):
+        # 调用方须持有锁
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        stats = self._stats[key[0]]
+        stats.entries -= 1
+        stats.bytes -= entry.size
+        owner = key[1]
+        self._owner_entries[owner] -= 1
+        if not self._owner_entries[owner]:
+            del self._owner_entries[owner]
+
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.purge_expired()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweep())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 关闭数据库客户端之前取消仍在进行的计算（主要是后台刷新）
+        inflight = list(self._inflight.values())
+        for task in inflight:
+            task.cancel()
+        await asyncio.gather(*inflight, return_exceptions=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "owners": len(self._owner_entries),
+                "generations": len(self._generations),
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "default_ttl_seconds": self.default_ttl,
+                "ttl_jitter": self.ttl_jitter,
+                "stale_grace_seconds": self.stale_grace,
+                "inflight": len(self._inflight),
+                "namespaces": {name: stats.as_dict() for name, stats in self._stats.items()},
+            }
+
+
+# 首页汇总（dashboard / recent / init_data）的响应缓存
+summary_cache = TTLCache(
+    max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+    max_bytes=settings.SUMMARY_CACHE_MAX_BYTES,
+    default_ttl=settings.SUMMARY_CACHE_TTL_SECONDS,
+    sweep_interval=settings.SUMMARY_CACHE_SWEEP_SECONDS,
+    ttl_jitter=settings.SUMMARY_CACHE_TTL_JITTER,
+    stale_grace=settings.SUMMARY_CACHE_STALE_SECONDS
+)
+
+
+def invalidate_user_caches(user_id: str):
+    """用户数据（记录、标签、模板、学习形式、资料）写入成功后调用：推进该用户的缓存代数"""
+    summary_cache.bump_generation(user_id)
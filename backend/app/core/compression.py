@@ -0,0 +1,192 @@
+"""
+响应压缩中间件
+
+按 Accept-Encoding 协商 br（安装了 brotli 时优先）或 gzip，小于阈值的响应、已编码的响应和 304 原样返回。
+流式响应（如 /records/export）逐块压缩，不会把整个响应缓存在内存里。
+zlib / brotli 压缩时释放 GIL，较大的响应体放到线程池中压缩，避免阻塞事件循环。
+压缩后的响应把强 ETag 降为弱 ETag（W/"..."）：字节已不同于原始表示，If-None-Match 按弱比较仍能命中。
+"""
+import gzip
+import io
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli 未安装时只提供 gzip
+    brotli = None
+
+# 超过该大小的响应体在线程池中压缩
+THREADPOOL_COMPRESS_SIZE = 64 * 1024
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """从 Accept-Encoding 中选出 br / gzip（忽略 q=0），都不接受时返回 None"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        self._buffer = io.BytesIO()
+        self._file = gzip.GzipFile(mode="wb", fileobj=self._buffer, compresslevel=level)
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def compress(self, data: bytes) -> bytes:
+        self._file.write(data)
+        self._file.flush()
+        return self._drain()
+
+    def finish(self) -> bytes:
+        self._file.close()
+        return self._drain()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 4, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressionResponder(self, encoding)(scope, receive, send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.app = middleware.app
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _new_compressor(self):
+        if self.encoding == "br":
+            return _BrotliCompressor(self.middleware.brotli_quality)
+        return _GzipCompressor(self.middleware.gzip_level)
+
+    async def _compress_all(self, body: bytes) -> bytes:
+        compressor = self._new_compressor()
+        if len(body) >= THREADPOOL_COMPRESS_SIZE:
+            return await run_in_threadpool(lambda: compressor.compress(body) + compressor.finish())
+        return compressor.compress(body) + compressor.finish()
+
+    def _prepare_headers(self, content_length: Optional[int] = None):
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        if content_length is None:
+            del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(content_length)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            # 先暂存响应头，拿到第一块响应体后再决定是否压缩
+            self.initial_message = message
+            headers = MutableHeaders(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or message["status"] in (204, 304)
+            if message["status"] == 304 and headers.get("etag", "").startswith('"'):
+                # 与压缩后的 200 响应保持同一个（弱）ETag
+                headers["ETag"] = f"W/{headers['etag']}"
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            if not more_body:
+                # 完整响应：小于阈值不压缩
+                if len(body) < self.middleware.minimum_size:
+                    MutableHeaders(raw=self.initial_message["headers"]).add_vary_header("Accept-Encoding")
+                    await self.send(self.initial_message)
+                    await self.send(message)
+                    return
+                compressed = await self._compress_all(body)
+                self._prepare_headers(len(compressed))
+                await self.send(self.initial_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            # 流式响应：逐块压缩
+            self.compressor = self._new_compressor()
+            self._prepare_headers()
+            await self.send(self.initial_message)
+
+        if self.compressor is None:
+            await self.send(message)
+            return
+
+        if len(body) >= THREADPOOL_COMPRESS_SIZE:
+            chunk = await run_in_threadpool(self.compressor.compress, body)
+        else:
+            chunk = self.compressor.compress(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
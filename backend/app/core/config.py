@@ -7,13 +7,65 @@ class Settings:
     SUPABASE_ANON_KEY: str = config('SUPABASE_ANON_KEY')
     SUPABASE_SERVICE_KEY: str = config('SUPABASE_SERVICE_KEY')
     
-    # 数据库配置（已弃用 - 使用Supabase客户端）
+    # Supabase HTTP 连接池配置（进程级共享客户端）
+    SUPABASE_POOL_MAX_CONNECTIONS: int = config('SUPABASE_POOL_MAX_CONNECTIONS', default=20, cast=int)
+    SUPABASE_POOL_MAX_KEEPALIVE: int = config('SUPABASE_POOL_MAX_KEEPALIVE', default=10, cast=int)
+    SUPABASE_POOL_KEEPALIVE_EXPIRY: float = config('SUPABASE_POOL_KEEPALIVE_EXPIRY', default=30.0, cast=float)
+    SUPABASE_HTTP_TIMEOUT: float = config('SUPABASE_HTTP_TIMEOUT', default=10.0, cast=float)
+    SUPABASE_CONNECT_TIMEOUT: float = config('SUPABASE_CONNECT_TIMEOUT', default=5.0, cast=float)
+    
+    # 数据库直连配置（stats / resources 路由使用，其余路由走Supabase客户端）
     DATABASE_URL: str = config('DATABASE_URL', default='sqlite:///./temp.db')
+    # SQLAlchemy 连接池配置（stats / resources 路由使用异步引擎 asyncpg）
+    DB_POOL_SIZE: int = config('DB_POOL_SIZE', default=5, cast=int)
+    DB_MAX_OVERFLOW: int = config('DB_MAX_OVERFLOW', default=10, cast=int)
+    DB_POOL_TIMEOUT: float = config('DB_POOL_TIMEOUT', default=10.0, cast=float)
+    DB_POOL_RECYCLE: int = config('DB_POOL_RECYCLE', default=1800, cast=int)
+    DB_DISABLE_STATEMENT_CACHE: bool = config('DB_DISABLE_STATEMENT_CACHE', default=False, cast=bool)
+    
+    # 搜索分词（jieba）进程池大小（每个worker进程）
+    SEARCH_SEGMENT_WORKERS: int = config('SEARCH_SEGMENT_WORKERS', default=1, cast=int)
+    
+    # 写入后的异步副作用队列（搜索分词等）
+    SIDE_EFFECT_WORKERS: int = config('SIDE_EFFECT_WORKERS', default=2, cast=int)
+    SIDE_EFFECT_QUEUE_SIZE: int = config('SIDE_EFFECT_QUEUE_SIZE', default=10000, cast=int)
+    SIDE_EFFECT_MAX_ATTEMPTS: int = config('SIDE_EFFECT_MAX_ATTEMPTS', default=3, cast=int)
+    
+    # 首页汇总响应缓存（LRU + TTL，每个worker进程）
+    SUMMARY_CACHE_MAX_ENTRIES: int = config('SUMMARY_CACHE_MAX_ENTRIES', default=5000, cast=int)
+    SUMMARY_CACHE_MAX_BYTES: int = config('SUMMARY_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+    SUMMARY_CACHE_TTL_SECONDS: int = config('SUMMARY_CACHE_TTL_SECONDS', default=300, cast=int)
+    SUMMARY_CACHE_SWEEP_SECONDS: int = config('SUMMARY_CACHE_SWEEP_SECONDS', default=60, cast=int)
+    # 过期时间随机抖动比例（0.1 表示 ±10%）
+    SUMMARY_CACHE_TTL_JITTER: float = config('SUMMARY_CACHE_TTL_JITTER', default=0.1, cast=float)
+    # 过期后的宽限期：期间先返回旧值再后台刷新（stale-while-revalidate），超过后必须重新计算
+    # 与 TTL 同量级，旧值最多晚约两个 TTL
+    SUMMARY_CACHE_STALE_SECONDS: int = config('SUMMARY_CACHE_STALE_SECONDS', default=300, cast=int)
+    
+    # 响应压缩：小于该字节数的响应不压缩
+    COMPRESSION_MIN_SIZE: int = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+    COMPRESSION_GZIP_LEVEL: int = config('COMPRESSION_GZIP_LEVEL', default=4, cast=int)
+    COMPRESSION_BROTLI_QUALITY: int = config('COMPRESSION_BROTLI_QUALITY', default=4, cast=int)
     
     # JWT配置
     JWT_SECRET_KEY: str = config('SECRET_KEY', default='your-secret-key')
     JWT_ALGORITHM: str = 'HS256'
     
+    # Supabase Auth token 校验配置
+    # local: 本地校验签名/过期/aud/iss；remote: 每次请求调用 supabase.auth.get_user
+    AUTH_VERIFY_MODE: str = config('AUTH_VERIFY_MODE', default='local')
+    SUPABASE_JWT_SECRET: str = config('SUPABASE_JWT_SECRET', default='')
+    SUPABASE_JWT_AUDIENCE: str = config('SUPABASE_JWT_AUDIENCE', default='authenticated')
+    SUPABASE_JWT_ISSUER: str = config('SUPABASE_JWT_ISSUER', default=f"{SUPABASE_URL.rstrip('/')}/auth/v1")
+    SUPABASE_JWKS_URL: str = config('SUPABASE_JWKS_URL', default=f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json")
+    AUTH_JWKS_CACHE_SECONDS: int = config('AUTH_JWKS_CACHE_SECONDS', default=600, cast=int)
+    # 两次拉取JWKS的最小间隔（未知kid触发的强制刷新也受此限制，避免伪造token放大上游请求）
+    AUTH_JWKS_MIN_REFRESH_SECONDS: int = config('AUTH_JWKS_MIN_REFRESH_SECONDS', default=30, cast=int)
+    AUTH_CLOCK_SKEW_SECONDS: int = config('AUTH_CLOCK_SKEW_SECONDS', default=30, cast=int)
+    # 远程校验结果缓存（按token哈希，TTL不超过token自身的exp）
+    AUTH_TOKEN_CACHE_SIZE: int = config('AUTH_TOKEN_CACHE_SIZE', default=2048, cast=int)
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = config('AUTH_TOKEN_CACHE_TTL_SECONDS', default=300, cast=int)
+    
     # CORS配置 - 合并部署时同域，不需要复杂CORS配置
     CORS_ORIGINS: List[str] = config(
         'CORS_ORIGINS', 
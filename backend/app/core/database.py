@@ -1,15 +1,22 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
 
-# 简化连接配置以测试Supabase连接稳定性
+# 同步引擎：仅供脚本等非请求场景使用，路由中请使用 get_async_db
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
     pool_pre_ping=True,
-    pool_recycle=1800
+    pool_recycle=settings.DB_POOL_RECYCLE
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -20,4 +27,138 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+class PoolMetrics:
+    """异步连接池指标：取连接等待时间、签出/归还次数、超时次数"""
+
+    def __init__(self, window: int = 1024):
+        self._waits = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.timeouts = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.acquired += 1
+            self._waits.append(seconds)
+            self.max_wait = max(self.max_wait, seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 2)
+
+        return {
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "connects": self.connects,
+            "wait_p50_ms": percentile(0.50),
+            "wait_p99_ms": percentile(0.99),
+            "wait_max_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+pool_metrics = PoolMetrics()
+
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+
+def _async_database_url(url: str) -> str:
+    """把同步连接串转换为异步驱动（asyncpg / aiosqlite）"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+def _register_pool_events(async_engine: AsyncEngine):
+    pool_events_target = async_engine.sync_engine
+
+    @event.listens_for(pool_events_target, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        pool_metrics.connects += 1
+
+    @event.listens_for(pool_events_target, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_metrics.checkouts += 1
+
+    @event.listens_for(pool_events_target, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        pool_metrics.checkins += 1
+
+
+def init_async_engine() -> AsyncEngine:
+    """创建异步引擎（首次使用时调用；连接在请求中按需建立）"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        url = _async_database_url(settings.DATABASE_URL)
+        engine_options = {"pool_pre_ping": True}
+        if url.startswith("postgresql+asyncpg://"):
+            engine_options.update(
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+            )
+            if settings.DB_DISABLE_STATEMENT_CACHE:
+                # 通过 Supavisor/pgbouncer 事务模式连接时不能使用预编译语句缓存
+                engine_options["connect_args"] = {"statement_cache_size": 0}
+
+        _async_engine = create_async_engine(url, **engine_options)
+        _register_pool_events(_async_engine)
+        _async_session_factory = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engine
+
+
+async def close_async_engine():
+    """释放异步连接池（应用关闭时调用）"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """FastAPI 依赖：注入 AsyncSession，并记录从连接池取连接的等待时间"""
+    init_async_engine()
+    async with _async_session_factory() as session:
+        started = time.perf_counter()
+        try:
+            await session.connection()
+        except PoolTimeoutError:
+            pool_metrics.timeouts += 1
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        yield session
+
+
+def get_pool_stats() -> dict:
+    """获取异步连接池状态与指标"""
+    stats = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "initialized": _async_engine is not None,
+    }
+    if _async_engine is not None:
+        pool = _async_engine.pool
+        for name in ("checkedout", "checkedin", "overflow"):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+    stats.update(pool_metrics.stats())
+    return stats
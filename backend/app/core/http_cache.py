@@ -0,0 +1,82 @@
+"""
+条件请求（ETag / 304）
+
+ETag 由用户数据版本号（sql/015 的 user_data_versions，任一写入即 +1）与请求参数计算。
+读接口先查版本号（主键单行），If-None-Match 命中时直接返回 304，不再执行列表/汇总查询。
+
+版本号必须在业务查询之前读取：两者之间若发生写入，ETag 只会比数据旧，下一次请求自然失配，不会把新数据当成旧版本缓存。
+版本表不可用时不生成 ETag，接口照常返回完整响应。
+
+来自服务端缓存的响应带 Age 头；缓存宽限期内返回的旧值（stale-while-revalidate）另带 Warning: 110。
+"""
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+# private：只允许浏览器缓存；no-cache：每次使用前都带 If-None-Match 回源校验
+CACHE_CONTROL = "private, no-cache"
+
+
+async def get_data_version(client, user_id: str) -> Optional[int]:
+    """读取用户数据版本号；用户尚无写入时为 0，读取失败返回 None"""
+    try:
+        response = await client.table('user_data_versions')\
+            .select('version')\
+            .eq('user_id', user_id)\
+            .limit(1)\
+            .execute()
+    except Exception as e:
+        print(f"⚠️ 读取数据版本失败: {e}")
+        return None
+    return response.data[0]['version'] if response.data else 0
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+async def user_data_etag(client, user_id: str, *parts) -> Optional[str]:
+    """按用户数据版本号 + 接口/参数计算强 ETag"""
+    version = await get_data_version(client, user_id)
+    if version is None:
+        return None
+    return make_etag(user_id, version, *parts)
+
+
+def etag_matches(request: Request, etag: Optional[str]) -> bool:
+    """If-None-Match 使用弱比较（忽略 W/ 前缀）"""
+    if not etag:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def cache_headers(etag: str) -> dict:
+    return {
+        "ETag": etag,
+        "Cache-Control": CACHE_CONTROL,
+        "Vary": "Authorization"
+    }
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def set_cache_headers(response: Response, etag: Optional[str]):
+    if etag:
+        response.headers.update(cache_headers(etag))
+
+
+def set_age_headers(response: Response, age: float, stale: bool = False):
+    """标注服务端缓存结果的年龄（秒）；stale 为宽限期内返回的旧值"""
+    response.headers["Age"] = str(int(age))
+    if stale:
+        response.headers["Warning"] = '110 - "Response is Stale"'
@@ -0,0 +1,54 @@
+"""
+事件循环延迟监控
+
+后台协程按固定间隔 sleep，实际唤醒时间与预期的差值即为事件循环延迟。
+路由中若有阻塞调用（同步 I/O、重计算），延迟会直接升高，可在压测时通过 /health 观察。
+"""
+import asyncio
+from collections import deque
+from typing import Optional
+
+
+class EventLoopLagMonitor:
+    def __init__(self, interval: float = 0.25, window: int = 240):
+        self.interval = interval
+        self._samples = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self._samples.append(max(loop.time() - started - self.interval, 0.0))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0, "p50_ms": 0, "p99_ms": 0, "max_ms": 0}
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 2)
+
+        return {
+            "samples": len(samples),
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 2),
+        }
+
+
+loop_lag_monitor = EventLoopLagMonitor()
@@ -0,0 +1,117 @@
+"""
+游标（keyset）分页
+
+游标是 (occurred_at, record_id) 的不透明编码。下一页条件为
+`occurred_at < 游标时间 OR (occurred_at = 游标时间 AND record_id < 游标ID)`，
+配合 `order by occurred_at desc, record_id desc` 直接沿 idx_records_user_time 索引继续扫描，
+深分页不再需要跳过前面的所有行，翻页期间插入的新记录也不会让页面错位。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+
+
+def _encode(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+
+
+def _invalid_cursor() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid cursor"
+    )
+
+
+def encode_cursor(occurred_at: str, record_id: int) -> str:
+    """把一行的排序键编码为游标"""
+    return _encode([occurred_at, record_id])
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """解析游标，格式不合法时返回400"""
+    try:
+        occurred_at, record_id = _decode(cursor)
+        # 校验时间格式（游标值会拼进过滤条件，不能放过任意字符串）
+        datetime.fromisoformat(occurred_at.replace("Z", "+00:00"))
+        return occurred_at, int(record_id)
+    except Exception:
+        raise _invalid_cursor()
+
+
+def encode_search_cursor(rank: float, record_id: int) -> str:
+    """搜索结果按 (rank, record_id) 排序，游标编码这两个值"""
+    return _encode([rank, record_id])
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """解析搜索游标，格式不合法时返回400"""
+    try:
+        rank, record_id = _decode(cursor)
+        return float(rank), int(record_id)
+    except Exception:
+        raise _invalid_cursor()
+
+
+
+def encode_sync_token(version: int) -> str:
+    """增量同步令牌：客户端已同步到的用户数据版本号"""
+    return _encode([version])
+
+
+def encode_sync_page_token(since: Optional[int], until: int, after_version: int, after_id: int) -> str:
+    """同一次同步的下一页：记录续传位置 (sync_version, record_id)，其余实体已在第一页返回"""
+    return _encode([since, until, after_version, after_id])
+
+
+def decode_sync_token(token: str) -> Tuple[Optional[int], Optional[int], Optional[int], Optional[int]]:
+    """解析同步令牌为 (since, until, after_version, after_id)，格式不合法时返回400"""
+    try:
+        values = _decode(token)
+        if len(values) == 1:
+            return int(values[0]), None, None, None
+        since, until, after_version, after_id = values
+        return (None if since is None else int(since)), int(until), int(after_version), int(after_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token"
+        )
+
+
+KEYSET_ORDER = "occurred_at.desc,record_id.desc"
+
+
+def keyset_filter(occurred_at: str, record_id: int) -> str:
+    """生成 PostgREST or 过滤条件：严格排在游标之后的行"""
+    return f'(occurred_at.lt."{occurred_at}",and(occurred_at.eq."{occurred_at}",record_id.lt.{record_id}))'
+
+
+def paginate_records(query, limit: int, cursor_key: Optional[Tuple[str, int]] = None, skip: int = 0):
+    """
+    为记录查询加上排序与分页参数，多取一行用于判断是否还有下一页
+    postgrest-py 的 order() 每调用一次追加一个 order 参数、也没有 or_()/offset()，这里直接写查询参数
+    """
+    query.params = query.params.add("order", KEYSET_ORDER)
+    if cursor_key:
+        # 冗余的 occurred_at <= 游标时间 让 idx_records_user_time 直接从游标处开始扫描（or条件本身无法用作索引条件）
+        query.params = query.params.add("occurred_at", f"lte.{cursor_key[0]}")
+        query.params = query.params.add("or", keyset_filter(*cursor_key))
+    elif skip:
+        query.params = query.params.add("offset", skip)
+    return query.limit(limit + 1)
+
+
+def next_cursor_for(rows: list, limit: int) -> Optional[str]:
+    """rows 按 limit + 1 查询：多出一行说明还有下一页，游标取本页最后一行"""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(last["occurred_at"], last["record_id"])
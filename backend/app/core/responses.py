@@ -0,0 +1,32 @@
+"""
+默认 JSON 响应类（orjson）
+
+orjson 原生序列化 datetime / date / UUID / numpy 数组，比标准库 json 快数倍；
+Decimal（如 PostgreSQL numeric 列）按 float 输出。在 app/main.py 中设为 default_response_class。
+"""
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _default(obj: Any):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
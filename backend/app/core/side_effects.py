@@ -0,0 +1,140 @@
+"""
+写入后的非关键副作用队列
+
+记录写入成功后，客户端不需要等待的工作（如搜索分词）放进进程内的异步队列，
+由后台 worker 执行，失败按指数退避重试。接口在数据库写入完成后立即返回。
+
+队列只存在于当前进程：进程退出时会在超时内尽量执行完剩余任务，之后丢弃；
+丢失的搜索分词可由 scripts/backfill_search_text.py 补上。
+"""
+import asyncio
+import inspect
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+
+@dataclass
+class _Job:
+    name: str
+    func: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class SideEffectQueue:
+    def __init__(self, workers: int = 2, max_size: int = 10000, max_attempts: int = 3, retry_delay: float = 0.5):
+        self.workers = workers
+        self.max_size = max_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._scheduled = set()
+        self._counters: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._latency_total: Dict[str, float] = defaultdict(float)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5.0):
+        """等待已入队的任务在 timeout 内执行完，然后停止 worker"""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ 副作用队列关闭时仍有 {self._queue.qsize()} 个任务未执行，已丢弃")
+        for task in [*self._tasks, *self._scheduled]:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._scheduled, return_exceptions=True)
+        self._tasks = []
+        self._scheduled.clear()
+        self._queue = None
+
+    def enqueue(self, name: str, func: Callable[..., Any], *args, **kwargs) -> bool:
+        """提交任务（不阻塞）；队列未启动时直接在当前事件循环中调度执行，队列满时丢弃并返回 False"""
+        job = _Job(name, func, args, kwargs)
+        self._counters[name]['enqueued'] += 1
+        if self._queue is None:
+            task = asyncio.get_running_loop().create_task(self._run(job))
+            self._scheduled.add(task)
+            task.add_done_callback(self._scheduled.discard)
+            return True
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self._counters[name]['dropped'] += 1
+            print(f"⚠️ 副作用队列已满，丢弃任务: {name}")
+            return False
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: _Job):
+        job.attempts += 1
+        try:
+            result = job.func(*job.args, **job.kwargs)
+            if inspect.isawaitable(result):
+                await result
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if job.attempts >= self.max_attempts:
+                self._counters[job.name]['failed'] += 1
+                print(f"❌ 副作用任务失败（已重试{job.attempts - 1}次）: {job.name} - {e}")
+                return
+            self._counters[job.name]['retried'] += 1
+            task = asyncio.create_task(self._retry_later(job, self.retry_delay * 2 ** (job.attempts - 1)))
+            self._scheduled.add(task)
+            task.add_done_callback(self._scheduled.discard)
+            return
+
+        self._counters[job.name]['completed'] += 1
+        self._latency_total[job.name] += time.monotonic() - job.enqueued_at
+
+    async def _retry_later(self, job: _Job, delay: float):
+        await asyncio.sleep(delay)
+        if self._queue is None:
+            await self._run(job)
+            return
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._counters[job.name]['dropped'] += 1
+
+    def stats(self) -> dict:
+        jobs = {}
+        for name, counters in self._counters.items():
+            completed = counters['completed']
+            jobs[name] = {
+                **counters,
+                "avg_completion_ms": round(self._latency_total[name] / completed * 1000, 1) if completed else None
+            }
+        return {
+            "workers": len(self._tasks),
+            "pending": self._queue.qsize() if self._queue else 0,
+            "scheduled": len(self._scheduled),
+            "jobs": jobs
+        }
+
+
+side_effects = SideEffectQueue(
+    workers=settings.SIDE_EFFECT_WORKERS,
+    max_size=settings.SIDE_EFFECT_QUEUE_SIZE,
+    max_attempts=settings.SIDE_EFFECT_MAX_ATTEMPTS
+)
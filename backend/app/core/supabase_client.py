@@ -0,0 +1,128 @@
+"""
+进程级共享的 Supabase 数据访问客户端
+
+在 FastAPI lifespan 中创建/关闭，所有请求复用带 keep-alive 连接池的 HTTP 会话，
+避免每次请求重新建连和握手。
+
+- get_data_client: 异步 PostgREST 客户端，路由中 `await ...execute()`，不阻塞事件循环
+- get_supabase: 同步 supabase 客户端，仅用于 Auth Admin / Storage 等没有异步实现的接口
+"""
+from typing import Optional
+import httpx
+from postgrest import AsyncFilterRequestBuilder, AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+from postgrest.utils import AsyncClient, SyncClient
+from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+from app.core.config import settings
+
+_client: Optional[Client] = None
+_data_client: Optional["AsyncDataClient"] = None
+
+
+class AsyncDataClient(AsyncPostgrestClient):
+    """异步 PostgREST 客户端；rpc() 与 table() 一样直接返回请求构造器"""
+
+    def rpc(self, func: str, params: dict) -> AsyncFilterRequestBuilder:
+        return AsyncFilterRequestBuilder(
+            self.session, f"/rpc/{func}", "POST", httpx.Headers(), httpx.QueryParams(), json=params
+        )
+
+    def create_session(self, base_url, headers, timeout) -> AsyncClient:
+        return AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=_http_limits(),
+        )
+
+
+def _http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.SUPABASE_HTTP_TIMEOUT, connect=settings.SUPABASE_CONNECT_TIMEOUT)
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=settings.SUPABASE_POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def _build_client() -> Client:
+    options = ClientOptions(
+        auto_refresh_token=False,
+        persist_session=False,
+        postgrest_client_timeout=_http_timeout(),
+    )
+    client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY, options)
+
+    # supabase-py 不暴露连接池参数，这里用带连接池配置的会话替换 PostgREST 默认会话
+    default_session = client.postgrest.session
+    client.postgrest.session = SyncClient(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        timeout=_http_timeout(),
+        limits=_http_limits(),
+    )
+    default_session.close()
+    return client
+
+
+def _build_data_client() -> AsyncDataClient:
+    return AsyncDataClient(
+        f"{settings.SUPABASE_URL}/rest/v1",
+        headers={
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            "apiKey": settings.SUPABASE_SERVICE_KEY,
+            "Authorization": f"Bearer {settings.SUPABASE_SERVICE_KEY}",
+        },
+        timeout=_http_timeout(),
+    )
+
+
+def init_supabase_client() -> Client:
+    """创建进程级客户端（应用启动时调用）"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def close_supabase_client():
+    """关闭客户端连接池（应用关闭时调用）"""
+    global _client
+    if _client is not None:
+        _client.postgrest.session.close()
+        _client = None
+
+
+def init_data_client() -> AsyncDataClient:
+    """创建进程级异步数据客户端（应用启动时调用）"""
+    global _data_client
+    if _data_client is None:
+        _data_client = _build_data_client()
+    return _data_client
+
+
+async def close_data_client():
+    """关闭异步数据客户端连接池（应用关闭时调用）"""
+    global _data_client
+    if _data_client is not None:
+        await _data_client.aclose()
+        _data_client = None
+
+
+def get_supabase_client() -> Client:
+    """获取共享客户端；脚本等未经过 lifespan 的场景会按需创建"""
+    return _client or init_supabase_client()
+
+
+def get_supabase() -> Client:
+    """FastAPI 依赖：注入共享的 Supabase 客户端"""
+    return get_supabase_client()
+
+
+def get_data_client() -> AsyncDataClient:
+    """FastAPI 依赖：注入共享的异步 PostgREST 客户端"""
+    return _data_client or init_data_client()
@@ -1,7 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import api_router
+from app.core.cache import summary_cache
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.database import close_async_engine, get_pool_stats
+from app.core.loop_monitor import loop_lag_monitor
+from app.core.responses import ORJSONResponse
+from app.core.side_effects import side_effects
+from app.core.supabase_client import (
+    init_supabase_client, close_supabase_client, init_data_client, close_data_client
+)
+from app.services.segmentation import init_segmenter, shutdown_segmenter
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 进程级共享的Supabase客户端（连接池在请求间复用）
+    init_supabase_client()
+    init_data_client()
+    loop_lag_monitor.start()
+    # jieba 分词进程池（写入记录与搜索时使用）
+    init_segmenter()
+    # 写入后的异步副作用（搜索分词、缓存失效）
+    side_effects.start()
+    # 汇总缓存的后台过期清理
+    summary_cache.start()
+    yield
+    await side_effects.stop()
+    await summary_cache.stop()
+    shutdown_segmenter()
+    await loop_lag_monitor.stop()
+    await close_async_engine()
+    await close_data_client()
+    close_supabase_client()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -9,7 +41,9 @@ app = FastAPI(
     version="2.0.0",
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS设置
@@ -19,6 +53,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
+)
+
+# 响应压缩（br / gzip，小响应不压缩）
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
 )
 
 @app.get("/")
@@ -31,7 +74,13 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "study-buddy-api"}
+    return {
+        "status": "healthy",
+        "service": "study-buddy-api",
+        "event_loop_lag": loop_lag_monitor.stats(),
+        "db_pool": get_pool_stats(),
+        "side_effects": side_effects.stats()
+    }
 
 # API路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
\ No newline at end of file
@@ -1,2 +1,3 @@
 from .record import Record
-from .resource import Resource, UserResource
\ No newline at end of file
+from .resource import Resource, UserResource
+from .summary import UserSummary
\ No newline at end of file
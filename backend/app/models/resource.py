@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -28,7 +29,7 @@ class UserResource(Base):
 
     user_resource_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
-    resource_id = Column(Integer, nullable=False, index=True)
+    resource_id = Column(Integer, ForeignKey('public.resources.resource_id'), nullable=False, index=True)
     status = Column(String, default='learning', nullable=False)  # resource_status enum
     rating = Column(Integer, nullable=True)
     review_short = Column(Text, nullable=True)
@@ -37,4 +38,7 @@ class UserResource(Base):
     privacy = Column(String, default='private', nullable=False)  # privacy_level enum
     last_interaction_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # 异步会话不支持懒加载，查询时需显式 joinedload
+    resource = relationship("Resource", lazy="raise")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class UserSummary(Base):
+    __tablename__ = "user_summaries"
+    __table_args__ = {'schema': 'public'}
+
+    summary_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    period = Column(String, nullable=False)  # summary_period enum
+    period_start = Column(Date, nullable=False)
+    period_end = Column(Date, nullable=False)
+    summary_md = Column(Text, nullable=True)
+    metrics = Column(JSONB, nullable=True)  # daily/weekly/monthly 由 records 触发器维护（sql/019）
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
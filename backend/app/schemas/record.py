@@ -45,6 +45,9 @@ class RecordCreate(BaseModel):
     resource_isbn: Optional[str] = Field(None, max_length=20)
     resource_description: Optional[str] = Field(None, max_length=2000)
 
+class RecordBulkCreate(BaseModel):
+    records: List[RecordCreate] = Field(..., description="Records to create; at most BULK_MAX_RECORDS per request")
+
 class RecordResponse(BaseModel):
     record_id: int
     user_id: str
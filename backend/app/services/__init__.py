@@ -0,0 +1,4 @@
+from .record_ingest import ingest_records
+from .tag_sync import normalize_tag_names, sync_resource_tags
+from .segmentation import build_search_query, index_records
+from .rollups import fetch_streak_days, fetch_summaries, streak_days, summarize_period
\ No newline at end of file
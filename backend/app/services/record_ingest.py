@@ -0,0 +1,157 @@
+"""
+批量记录导入
+
+供 POST /records/bulk 使用：学习形式只校验一次、资源按 (title, type) 去重后批量解析、
+记录分块多行插入、标签与用户资源关系按资源合并后各一次同步，返回每一条的成功/失败结果。
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BULK_INSERT_CHUNK_SIZE = 200
+RESOURCE_RESOLVE_CHUNK_SIZE = 500
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _failure(index: int, error: str) -> dict:
+    return {"index": index, "success": False, "error": error}
+
+
+async def _valid_form_types(client, user_id: str) -> set:
+    response = await client.table('user_form_types').select('type_code').eq('user_id', user_id).execute()
+    return {row['type_code'] for row in response.data or []}
+
+
+async def _resolve_resources(client, user_id: str, resources: List[dict]) -> Dict[Tuple[str, str], Optional[int]]:
+    """批量查找/创建资源，返回 (title, type) -> resource_id"""
+    resolved = {}
+    for chunk in _chunks(resources, RESOURCE_RESOLVE_CHUNK_SIZE):
+        response = await client.rpc('resolve_resources', {
+            'p_user_id': user_id,
+            'p_resources': chunk
+        }).execute()
+        for row in response.data or []:
+            resolved[(row['title'], row['type'])] = row['resource_id']
+    return resolved
+
+
+async def _insert_chunk(client, rows: List[dict]) -> List[Tuple[Optional[dict], Optional[str]]]:
+    """多行插入一个分块；失败时二分重试，把错误定位到具体条目而不拖累同块的其他记录"""
+    try:
+        response = await client.table('records').insert(rows).execute()
+        if len(response.data or []) == len(rows):
+            return [(row, None) for row in response.data]
+        error = "Failed to create record"
+    except Exception as e:
+        error = getattr(e, 'message', None) or str(e)
+
+    if len(rows) == 1:
+        return [(None, error)]
+
+    middle = len(rows) // 2
+    return await _insert_chunk(client, rows[:middle]) + await _insert_chunk(client, rows[middle:])
+
+
+def _add_warning(results: List[Optional[dict]], indexes: List[int], warning: str):
+    for index in indexes:
+        results[index].setdefault("warnings", []).append(warning)
+
+
+async def ingest_records(client, user_id: str, payloads: List[dict], created_ids: Optional[List[int]] = None) -> List[dict]:
+    """
+    批量创建记录
+    payloads 为 build_create_record_payload 生成的结构，返回与输入顺序一致的结果列表
+    created_ids 由调用方传入时，每创建一条就追加其 record_id；中途抛出异常时调用方仍能拿到已提交的记录
+    """
+    if created_ids is None:
+        created_ids = []
+    results: List[Optional[dict]] = [None] * len(payloads)
+
+    # 1. 学习形式只查询一次
+    valid_form_types = await _valid_form_types(client, user_id)
+    pending = []
+    for index, payload in enumerate(payloads):
+        form_type = payload['record']['form_type']
+        if form_type in valid_form_types:
+            pending.append(index)
+        else:
+            results[index] = _failure(index, f"Invalid form_type '{form_type}' for user")
+
+    # 2. 资源按 (title, type) 去重后批量解析
+    wanted = {}
+    for index in pending:
+        resource = payloads[index]['resource']
+        if not payloads[index]['resource_id'] and resource:
+            wanted.setdefault((resource['title'], resource['type']), resource)
+    resolved = await _resolve_resources(client, user_id, list(wanted.values())) if wanted else {}
+
+    def resource_id_for(payload: dict) -> Optional[int]:
+        if payload['resource_id']:
+            return payload['resource_id']
+        resource = payload['resource']
+        return resolved.get((resource['title'], resource['type'])) if resource else None
+
+    # 3. 记录分块多行插入
+    tags_by_resource: Dict[int, List[str]] = {}
+    user_resources: Dict[int, dict] = {}
+    indexes_by_resource: Dict[int, List[int]] = {}
+    for chunk in _chunks(pending, BULK_INSERT_CHUNK_SIZE):
+        rows = [
+            {**payloads[index]['record'], 'user_id': user_id, 'resource_id': resource_id_for(payloads[index])}
+            for index in chunk
+        ]
+        for index, (created, error) in zip(chunk, await _insert_chunk(client, rows)):
+            if created is None:
+                results[index] = _failure(index, error)
+                continue
+            results[index] = {"index": index, "success": True, "record_id": created['record_id']}
+            created_ids.append(created['record_id'])
+            resource_id = created.get('resource_id')
+            if not resource_id:
+                continue
+            indexes_by_resource.setdefault(resource_id, []).append(index)
+            if payloads[index]['tags']:
+                tags_by_resource.setdefault(resource_id, []).extend(payloads[index]['tags'])
+            if payloads[index]['user_resource']:
+                # 同一资源的多条记录按输入顺序合并，后面的字段覆盖前面的（与逐条创建的结果一致）
+                user_resources.setdefault(resource_id, {}).update(payloads[index]['user_resource'])
+
+    # 4. 标签、用户资源关系按资源合并后各一次同步；失败不影响已创建的记录，在受影响条目的结果中给出 warnings
+    if tags_by_resource:
+        try:
+            await client.rpc('sync_resource_tags_bulk', {
+                'p_user_id': user_id,
+                'p_items': [
+                    {'resource_id': resource_id, 'tags': tags}
+                    for resource_id, tags in tags_by_resource.items()
+                ]
+            }).execute()
+        except Exception as tag_error:
+            logger.warning("批量标签同步失败 (user=%s): %s", user_id, tag_error)
+            _add_warning(results, [
+                index for resource_id in tags_by_resource for index in indexes_by_resource[resource_id]
+                if payloads[index]['tags']
+            ], f"Failed to sync tags: {tag_error}")
+
+    if user_resources:
+        try:
+            await client.rpc('upsert_user_resources_bulk', {
+                'p_user_id': user_id,
+                'p_items': [
+                    {'resource_id': resource_id, 'user_resource': fields}
+                    for resource_id, fields in user_resources.items()
+                ]
+            }).execute()
+        except Exception as user_resource_error:
+            logger.warning("批量用户资源关系写入失败 (user=%s): %s", user_id, user_resource_error)
+            _add_warning(results, [
+                index for resource_id in user_resources for index in indexes_by_resource[resource_id]
+                if payloads[index]['user_resource']
+            ], f"Failed to update user resource: {user_resource_error}")
+
+    return results
@@ -0,0 +1,114 @@
+"""
+学习汇总（user_summaries 预计算行，见 sql/019）
+
+records 写入时触发器按本地日期刷新受影响的 daily 行，并重算所在的 weekly / monthly 行。
+仪表盘与统计接口只读取日期范围内的汇总行，开销与天数相关，与记录数无关。
+
+metrics: {count, minutes, days, difficulty_sum, difficulty_count, focus_sum, focus_count,
+          form_types: {<form_type>: {count, minutes}}}
+"""
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable
+
+import pytz
+
+# 本地时区：日期划分必须与 sql/019 的 summary_local_date 一致
+USER_TIMEZONE = pytz.timezone('Asia/Shanghai')
+
+# 连续学习天数每次向前读取的天数（连续段更长时继续向前分段读取，直到遇到空档）
+STREAK_CHUNK_DAYS = 60
+
+METRIC_KEYS = ('count', 'minutes', 'days', 'difficulty_sum', 'difficulty_count', 'focus_sum', 'focus_count')
+
+
+def local_today() -> date:
+    return datetime.now(USER_TIMEZONE).date()
+
+
+async def fetch_summaries(client, user_id: str, start: date, end: date, period: str = 'daily') -> Dict[date, dict]:
+    """读取 period_start 在 [start, end] 内的汇总行，返回 {period_start: metrics}"""
+    response = await client.table('user_summaries')\
+        .select('period_start, metrics')\
+        .eq('user_id', user_id)\
+        .eq('period', period)\
+        .gte('period_start', start.isoformat())\
+        .lte('period_start', end.isoformat())\
+        .execute()
+    return {
+        date.fromisoformat(row['period_start']): row['metrics']
+        for row in response.data or []
+        if row.get('metrics')
+    }
+
+
+def merge_metrics(rows: Iterable[dict]) -> dict:
+    """把多行 metrics 相加（多天合成一个区间）"""
+    total = dict.fromkeys(METRIC_KEYS, 0)
+    form_types: Dict[str, dict] = {}
+    for metrics in rows:
+        for key in METRIC_KEYS:
+            total[key] += metrics.get(key) or 0
+        for form_type, stat in (metrics.get('form_types') or {}).items():
+            bucket = form_types.setdefault(form_type, {'count': 0, 'minutes': 0})
+            bucket['count'] += stat.get('count') or 0
+            bucket['minutes'] += stat.get('minutes') or 0
+    total['form_types'] = form_types
+    return total
+
+
+def average(metrics: dict, name: str) -> float:
+    """平均分（difficulty / focus），没有填写时为 0"""
+    count = metrics.get(f'{name}_count') or 0
+    return round(metrics.get(f'{name}_sum', 0) / count, 1) if count else 0
+
+
+def type_distribution(metrics: dict) -> list:
+    return [
+        {"type": form_type, "count": stat['count'], "total_duration": stat['minutes']}
+        for form_type, stat in (metrics.get('form_types') or {}).items()
+    ]
+
+
+def summarize_period(daily: Dict[date, dict], start: date, end: date) -> dict:
+    """把 [start, end] 内的 daily 行汇总成仪表盘 / 统计概览的格式"""
+    total = merge_metrics(metrics for day, metrics in daily.items() if start <= day <= end)
+    total_duration = total['minutes']
+    learning_days = total['days']
+    return {
+        "period_days": (end - start).days + 1,
+        "total_records": total['count'],
+        "total_duration_hours": round(total_duration / 60, 1) if total_duration else 0,
+        "learning_days": learning_days,
+        "avg_difficulty": average(total, 'difficulty'),
+        "avg_focus": average(total, 'focus'),
+        "daily_avg_duration": round(total_duration / max(learning_days, 1), 1) if total_duration else 0,
+        "type_distribution": type_distribution(total)
+    }
+
+
+def streak_days(learning_dates: Iterable[date], today: date) -> int:
+    """连续学习天数：从今天（今天还没有记录时从昨天）往前数"""
+    learning_dates = set(learning_dates)
+    check_date = today if today in learning_dates else today - timedelta(days=1)
+    streak = 0
+    while check_date in learning_dates:
+        streak += 1
+        check_date -= timedelta(days=1)
+    return streak
+
+
+async def fetch_streak_days(client, user_id: str, daily: Dict[date, dict], start: date, today: date) -> int:
+    """
+    连续学习天数：daily 为已读取的 [start, today] 内的 daily 行
+    连续段延伸到 start 之前时按 STREAK_CHUNK_DAYS 继续向前读取，直到遇到没有记录的一天，不做截断
+    """
+    learning_dates = set(daily)
+    while True:
+        streak = streak_days(learning_dates, today)
+        anchor = today if today in learning_dates else today - timedelta(days=1)
+        # 连续段之前的那一天已在读取范围内（没有记录），结果确定
+        if anchor - timedelta(days=streak) >= start:
+            return streak
+        end = start - timedelta(days=1)
+        start = end - timedelta(days=STREAK_CHUNK_DAYS - 1)
+        learning_dates.update(await fetch_summaries(client, user_id, start, end))
@@ -0,0 +1,161 @@
+"""
+中文分词（jieba）
+
+to_tsvector('simple', ...) 会把一整段连续汉字当成一个词，中文检索基本失效。
+这里在记录写入后（后台任务 index_records）用 jieba 把标题与正文切成以空格分隔的词（records.search_text），
+数据库据此生成 search_tsv 并建 GIN 索引（见 sql/014）；查询时用同一词典切分关键词拼成 tsquery。
+
+jieba 是纯 Python 的 CPU 密集计算，放在独立的进程池中执行，不阻塞事件循环、也不受 GIL 限制。
+"""
+import asyncio
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+import jieba
+
+from app.core.config import settings
+
+# 至少包含一个字母/数字/汉字的词才进入索引（丢弃空白与标点）
+_TOKEN_RE = re.compile(r"[^\W_]")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def init_segment_worker():
+    jieba.setLogLevel(60)
+    jieba.initialize()
+
+
+def _tokens(words) -> List[str]:
+    tokens = []
+    for word in words:
+        word = word.strip().lower()
+        if word and _TOKEN_RE.search(word):
+            tokens.append(word)
+    return tokens
+
+
+def segment_text(text: Optional[str]) -> str:
+    """搜索引擎模式切分（长词同时产出其中的短词），返回空格分隔的词序列"""
+    return " ".join(_tokens(jieba.cut_for_search(text or "")))
+
+
+def segment_record(title: Optional[str], body_md: Optional[str]) -> str:
+    return segment_text(f"{title or ''}\n{body_md or ''}")
+
+
+def segment_records(items: List[Tuple[Optional[str], Optional[str]]]) -> List[str]:
+    return [segment_record(title, body_md) for title, body_md in items]
+
+
+def _quote_lexeme(word: str) -> str:
+    return "'" + word.replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def _covers(word: str, subwords: List[str]) -> bool:
+    covered = set()
+    for sub in subwords:
+        start = word.find(sub)
+        while start != -1:
+            covered.update(range(start, start + len(sub)))
+            start = word.find(sub, start + 1)
+    return len(covered) == len(word)
+
+
+def segment_query(query: str) -> Tuple[Optional[str], List[str]]:
+    """
+    把搜索关键词切成 to_tsquery('simple', ...) 表达式与高亮用的词列表
+    精确模式切出的每个词 w 匹配 w 本身；若搜索引擎模式切出的子词能覆盖 w，也可以匹配同时包含全部子词的记录
+    （索引侧用搜索引擎模式，同一个词在不同上下文中可能只被切成子词），词之间取 AND
+    """
+    terms = []
+    highlight = []
+    for word in dict.fromkeys(_tokens(jieba.cut(query))):
+        subwords = [sub for sub in dict.fromkeys(_tokens(jieba.cut_for_search(word))) if sub != word]
+        highlight.extend([word, *subwords])
+        if subwords and _covers(word, subwords):
+            terms.append(f"({_quote_lexeme(word)} | ({' & '.join(_quote_lexeme(sub) for sub in subwords)}))")
+        else:
+            terms.append(_quote_lexeme(word))
+    return (" & ".join(terms) or None), list(dict.fromkeys(highlight))
+
+
+def init_segmenter():
+    """创建分词进程池并预热（子进程加载词典约1秒，不等待）"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.SEARCH_SEGMENT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_segment_worker
+        )
+        _executor.submit(segment_text, "")
+
+
+def shutdown_segmenter():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run(func, *args):
+    if _executor is None:
+        init_segmenter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+    except BrokenProcessPool:
+        # 子进程异常退出后进程池不可再用，丢弃并在下次调用时重建
+        shutdown_segmenter()
+        raise
+
+
+INDEX_CHUNK_SIZE = 200
+
+
+async def _segment_many(items: List[Tuple[Optional[str], Optional[str]]]) -> List[str]:
+    """批量切分：按进程数分块提交，每块一次进程间往返"""
+    size = -(-len(items) // settings.SEARCH_SEGMENT_WORKERS)
+    chunks = await asyncio.gather(*[
+        _run(segment_records, items[start:start + size]) for start in range(0, len(items), size)
+    ])
+    return [text for chunk in chunks for text in chunk]
+
+
+async def index_records(client, record_ids: List[int]):
+    """
+    后台任务：重新读取记录的标题与正文，分词后写回 search_text
+    按 id 读取最新内容，同一条记录的多次更新无论执行顺序如何都以最后一次为准
+    只写分词结果有变化的记录；search_text 不计入数据版本号、updated_at 与 sync_version
+    （sql/014 的 row_payload），写回不会让 ETag、初始化缓存或增量同步失效
+    """
+    for start in range(0, len(record_ids), INDEX_CHUNK_SIZE):
+        response = await client.table('records')\
+            .select('record_id, title, body_md, search_text')\
+            .in_('record_id', record_ids[start:start + INDEX_CHUNK_SIZE])\
+            .execute()
+        rows = response.data or []
+        if not rows:
+            continue
+
+        texts = await _segment_many([(row['title'], row['body_md']) for row in rows])
+        items = [
+            {'record_id': row['record_id'], 'search_text': text}
+            for row, text in zip(rows, texts)
+            if text != row.get('search_text')
+        ]
+        if items:
+            await client.rpc('set_record_search_text', {'p_items': items}).execute()
+
+
+async def build_search_query(query: str) -> Tuple[Optional[str], List[str]]:
+    """查询用：返回 (tsquery 表达式, 高亮词)；分词失败时只保留标题子串匹配"""
+    try:
+        ts_query, terms = await _run(segment_query, query)
+    except Exception as e:
+        print(f"⚠️ 关键词分词失败: {e}")
+        ts_query, terms = None, []
+    return ts_query, list(dict.fromkeys([query.lower(), *terms]))
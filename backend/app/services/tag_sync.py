@@ -0,0 +1,34 @@
+"""
+标签同步
+
+把一组标签名同步到用户在某个资源上的 resource_tags（sql/011 的 sync_resource_tags）：
+标签名批量 upsert、与现有关联求差集、只增删变化部分，一次 RPC 完成，查询次数与标签数量无关。
+"""
+from typing import Iterable, List
+
+
+def normalize_tag_names(tags: Iterable) -> List[str]:
+    """接受字符串或 {'tag_name': ...} 字典，去空白、去重并保持顺序"""
+    names = []
+    seen = set()
+    for tag in tags or []:
+        name = tag.get('tag_name') if isinstance(tag, dict) else tag
+        name = str(name).strip() if name else ''
+        if name and name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+async def sync_resource_tags(client, user_id: str, resource_id: int, tags: Iterable, replace: bool = True) -> List[dict]:
+    """
+    同步资源标签，返回同步后的标签行 [{tag_id, tag_name}]
+    replace=True 时移除不在列表中的关联；replace=False 只追加
+    """
+    response = await client.rpc('sync_resource_tags', {
+        'p_user_id': user_id,
+        'p_resource_id': resource_id,
+        'p_tag_names': normalize_tag_names(tags),
+        'p_replace': replace
+    }).execute()
+    return response.data or []
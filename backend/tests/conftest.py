@@ -0,0 +1,16 @@
+"""
+后端单元测试（不需要真实的 Supabase / 数据库）
+
+运行：cd backend && python -m pytest
+数据库客户端用 tests/fakes.py 中的假对象代替，只覆盖纯逻辑与查询编排。
+"""
+import os
+import sys
+
+# 配置在导入 app 时读取：测试用占位值，不会真正连接
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test-anon-key")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "test-service-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-jwt-secret")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,91 @@
+"""
+测试用的 PostgREST 客户端替身
+
+只实现后端用到的链式调用（select / eq / gte / lte / in_ / limit / insert / execute 与 rpc），
+表数据保存在内存中；insert 与 rpc 的行为由测试传入的函数决定，并记录每次调用。
+"""
+from typing import Callable, Dict, List, Optional
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeClient", table: str):
+        self.client = client
+        self.table = table
+        self.filters: List[Callable[[dict], bool]] = []
+        self.inserted: Optional[List[dict]] = None
+        self.max_rows: Optional[int] = None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) >= value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row.get(column) <= value)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def limit(self, count: int):
+        self.max_rows = count
+        return self
+
+    def insert(self, rows):
+        self.inserted = rows if isinstance(rows, list) else [rows]
+        return self
+
+    async def execute(self) -> FakeResponse:
+        self.client.calls.append((self.table, self.inserted))
+        if self.inserted is not None:
+            return FakeResponse(self.client.on_insert(self.table, self.inserted))
+        rows = self.client.tables.get(self.table, [])
+        matched = [row for row in rows if all(check(row) for check in self.filters)]
+        return FakeResponse(matched[:self.max_rows] if self.max_rows is not None else matched)
+
+
+class FakeRpc:
+    def __init__(self, client: "FakeClient", name: str, params: dict):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    async def execute(self) -> FakeResponse:
+        self.client.calls.append((self.name, self.params))
+        handler = self.client.rpcs.get(self.name)
+        return FakeResponse(handler(self.params) if handler else [])
+
+
+class FakeClient:
+    def __init__(
+        self,
+        tables: Optional[Dict[str, List[dict]]] = None,
+        rpcs: Optional[Dict[str, Callable[[dict], list]]] = None,
+        on_insert: Optional[Callable[[str, List[dict]], list]] = None
+    ):
+        self.tables = tables or {}
+        self.rpcs = rpcs or {}
+        self.on_insert = on_insert or (lambda table, rows: rows)
+        self.calls: List[tuple] = []
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+    def calls_to(self, name: str) -> list:
+        return [args for called, args in self.calls if called == name]
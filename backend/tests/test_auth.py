@@ -0,0 +1,177 @@
+import asyncio
+import base64
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jose import JWTError, jwt
+
+from app.core import auth
+from app.core.config import settings
+
+
+def make_hs256_token(**overrides) -> str:
+    claims = {
+        "sub": "user-1",
+        "aud": settings.SUPABASE_JWT_AUDIENCE,
+        "iss": settings.SUPABASE_JWT_ISSUER,
+        "exp": int(time.time()) + 3600,
+        **overrides,
+    }
+    return jwt.encode(claims, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+
+def make_unsigned_token(header: dict) -> str:
+    def part(value: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+    return f"{part(header)}.{part({'sub': 'user-1'})}.c2ln"
+
+
+class JwksServer:
+    """替换 httpx.AsyncClient 的 JWKS 端点，记录请求次数"""
+
+    def __init__(self, monkeypatch):
+        self.calls = 0
+        self.fail = False
+        self.keys = [{"kid": "current"}]
+        original = httpx.AsyncClient
+
+        def factory(**kwargs):
+            return original(transport=httpx.MockTransport(self.handle), **kwargs)
+
+        monkeypatch.setattr(auth.httpx, "AsyncClient", factory)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.fail:
+            return httpx.Response(502)
+        return httpx.Response(200, json={"keys": self.keys})
+
+
+@pytest.fixture(autouse=True)
+def reset_jwks_cache(monkeypatch):
+    monkeypatch.setattr(auth, "_jwks_cache", {"keys": [], "fetched_at": 0.0, "attempted_at": None, "failed": False})
+    monkeypatch.setattr(auth, "_jwks_lock", asyncio.Lock())
+
+
+@pytest.fixture
+def jwks(monkeypatch):
+    return JwksServer(monkeypatch)
+
+
+def test_verify_hs256_token_locally():
+    claims = asyncio.run(auth.verify_token_locally(make_hs256_token()))
+    assert claims["sub"] == "user-1"
+
+
+@pytest.mark.parametrize("overrides", [
+    {"exp": int(time.time()) - 3600},
+    {"aud": "someone-else"},
+    {"iss": "https://evil.example.com/auth/v1"},
+])
+def test_reject_invalid_hs256_claims(overrides):
+    with pytest.raises(JWTError):
+        asyncio.run(auth.verify_token_locally(make_hs256_token(**overrides)))
+
+
+def test_reject_wrong_signature():
+    token = jwt.encode({"sub": "user-1", "aud": settings.SUPABASE_JWT_AUDIENCE}, "other-secret", algorithm="HS256")
+    with pytest.raises(JWTError):
+        asyncio.run(auth.verify_token_locally(token))
+
+
+def test_known_kid_is_resolved_from_jwks(jwks):
+    key, algorithms = asyncio.run(auth._resolve_signing_key(make_unsigned_token({"alg": "RS256", "kid": "current"})))
+    assert key == {"kid": "current"}
+    assert algorithms == ["RS256"]
+    assert jwks.calls == 1
+
+
+def test_unknown_kids_do_not_refetch_within_min_interval(jwks):
+    async def run():
+        await auth._get_jwks()
+        for index in range(20):
+            with pytest.raises(JWTError):
+                await auth._resolve_signing_key(make_unsigned_token({"alg": "RS256", "kid": f"forged-{index}"}))
+
+    asyncio.run(run())
+    assert jwks.calls == 1
+
+
+def test_unknown_kid_refreshes_after_min_interval(jwks):
+    async def run():
+        await auth._get_jwks()
+        jwks.keys = [{"kid": "current"}, {"kid": "rotated"}]
+        auth._jwks_cache["attempted_at"] -= settings.AUTH_JWKS_MIN_REFRESH_SECONDS + 1
+        return await auth._resolve_signing_key(make_unsigned_token({"alg": "RS256", "kid": "rotated"}))
+
+    key, _ = asyncio.run(run())
+    assert key == {"kid": "rotated"}
+    assert jwks.calls == 2
+
+
+def test_failed_fetch_keeps_previous_keys(jwks):
+    async def run():
+        await auth._get_jwks()
+        jwks.fail = True
+        auth._jwks_cache["attempted_at"] -= settings.AUTH_JWKS_MIN_REFRESH_SECONDS + 1
+        return await auth._get_jwks(force_refresh=True)
+
+    assert asyncio.run(run()) == [{"kid": "current"}]
+    assert jwks.calls == 2
+
+
+def test_failed_fetch_without_keys_is_503(jwks):
+    jwks.fail = True
+
+    async def run():
+        credentials = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=make_unsigned_token({"alg": "RS256", "kid": "current"})
+        )
+        for _ in range(5):
+            with pytest.raises(HTTPException) as error:
+                await auth.get_current_user_id(credentials)
+            assert error.value.status_code == 503
+
+    asyncio.run(run())
+    assert jwks.calls == 1
+
+
+def test_token_cache_keys_are_hashes():
+    key = auth.VerifiedTokenCache.key_for("secret-token")
+    assert key != "secret-token" and len(key) == 64
+    assert key == auth.VerifiedTokenCache.key_for("secret-token")
+
+
+def test_token_cache_expires_at_ttl_or_token_exp(monkeypatch):
+    now = time.time()
+    # 只替换 auth 模块看到的 time
+    monkeypatch.setattr(auth, "time", SimpleNamespace(time=lambda: now, monotonic=time.monotonic))
+    cache = auth.VerifiedTokenCache(max_entries=10, ttl_seconds=60)
+    cache.set("long", {"sub": "user-1", "exp": now + 3600})
+    cache.set("short", {"sub": "user-2", "exp": now + 10})
+    cache.set("expired", {"sub": "user-3", "exp": now - 1})
+    assert cache.get("expired") is None
+
+    now += 11
+    assert cache.get("short") is None
+    assert cache.get("long") == {"sub": "user-1", "exp": now - 11 + 3600}
+    now += 50
+    assert cache.get("long") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = auth.VerifiedTokenCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", {"sub": "a"})
+    cache.set("b", {"sub": "b"})
+    assert cache.get("a") == {"sub": "a"}
+    cache.set("c", {"sub": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"sub": "a"} and cache.get("c") == {"sub": "c"}
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (2, 3, 1)
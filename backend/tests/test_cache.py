@@ -0,0 +1,327 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import TTLCache, estimate_size
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # 只替换缓存模块看到的 time，事件循环的时钟不受影响
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def make_cache(**overrides) -> TTLCache:
+    options = {"max_entries": 100, "max_bytes": 1_000_000, "default_ttl": 60, **overrides}
+    return TTLCache(**options)
+
+
+def test_get_returns_value_until_ttl(clock):
+    cache = make_cache()
+    cache.set("dashboard", "user-1", 7, {"total": 1})
+    assert cache.get("dashboard", "user-1", 7) == {"total": 1}
+    assert cache.get("dashboard", "user-1", 30) is None
+    assert cache.get("dashboard", "user-2", 7) is None
+
+    clock.advance(61)
+    assert cache.get("dashboard", "user-1", 7) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_per_entry_ttl(clock):
+    cache = make_cache()
+    cache.set("recent", "user-1", 10, [1], ttl=5)
+    cache.set("dashboard", "user-1", 7, [2])
+    clock.advance(10)
+    assert cache.get("recent", "user-1", 10) is None
+    assert cache.get("dashboard", "user-1", 7) == [2]
+
+
+def test_ttl_jitter_stays_within_bounds(clock):
+    cache = make_cache(ttl_jitter=0.1)
+    for params in range(50):
+        cache.set("dashboard", "user-1", params, params)
+    clock.advance(53.9)
+    assert all(cache.get("dashboard", "user-1", params) == params for params in range(50))
+    clock.advance(12.2)
+    assert all(cache.get("dashboard", "user-1", params) is None for params in range(50))
+
+
+def test_lru_eviction_by_entry_count(clock):
+    cache = make_cache(max_entries=2)
+    cache.set("dashboard", "user-1", 1, "a")
+    cache.set("dashboard", "user-2", 1, "b")
+    assert cache.get("dashboard", "user-1", 1) == "a"
+    cache.set("dashboard", "user-3", 1, "c")
+
+    assert cache.get("dashboard", "user-2", 1) is None
+    assert cache.get("dashboard", "user-1", 1) == "a"
+    assert cache.stats()["namespaces"]["dashboard"]["evictions"] == 1
+
+
+def test_eviction_by_bytes_and_oversized_values(clock):
+    value = {"data": "x" * 100}
+    size = estimate_size(value)
+    cache = make_cache(max_bytes=size * 2)
+    for owner in ("user-1", "user-2", "user-3"):
+        cache.set("dashboard", owner, 1, value)
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == size * 2
+
+    cache.set("dashboard", "user-4", 1, {"data": "x" * 1000})
+    assert cache.get("dashboard", "user-4", 1) is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_replacing_a_key_keeps_byte_accounting(clock):
+    cache = make_cache()
+    cache.set("dashboard", "user-1", 1, "a" * 10)
+    cache.set("dashboard", "user-1", 1, "b" * 20)
+    assert cache.stats()["bytes"] == estimate_size("b" * 20)
+    assert cache.stats()["entries"] == 1
+
+
+def test_purge_expired_removes_unread_entries(clock):
+    cache = make_cache()
+    cache.set("dashboard", "user-1", 1, "a")
+    cache.set("dashboard", "user-2", 1, "b", ttl=600)
+    clock.advance(61)
+    assert cache.purge_expired() == 1
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["namespaces"]["dashboard"]["expirations"] == 1
+
+
+def test_bumping_generation_invalidates_only_that_owner(clock):
+    cache = make_cache()
+    cache.set("dashboard", "user-1", 7, "old")
+    cache.set("dashboard", "user-2", 7, "other")
+    cache.bump_generation("user-1")
+
+    assert cache.get("dashboard", "user-1", 7) is None
+    assert cache.get("dashboard", "user-2", 7) == "other"
+    cache.set("dashboard", "user-1", 7, "new")
+    assert cache.get("dashboard", "user-1", 7) == "new"
+
+
+def test_write_computed_before_a_bump_is_discarded(clock):
+    cache = make_cache()
+    generation = cache.generation("user-1")
+    # 读取数据期间用户写入了新数据
+    cache.bump_generation("user-1")
+    cache.set("dashboard", "user-1", 7, "stale", generation=generation)
+    assert cache.get("dashboard", "user-1", 7) is None
+
+    cache.set("dashboard", "user-1", 7, "fresh", generation=cache.generation("user-1"))
+    assert cache.get("dashboard", "user-1", 7) == "fresh"
+
+
+def test_generations_never_repeat_after_purge(clock):
+    cache = make_cache()
+    cache.bump_generation("user-1")
+    first = cache.generation("user-1")
+    clock.advance(61)
+    cache.purge_expired()
+    assert cache.stats()["generations"] == 0
+    assert cache.generation("user-1") == 0
+
+    cache.bump_generation("user-1")
+    assert cache.generation("user-1") not in (0, first)
+
+
+def test_generation_of_owner_with_entries_is_kept(clock):
+    cache = make_cache()
+    cache.bump_generation("user-1")
+    cache.set("dashboard", "user-1", 7, "value", ttl=600)
+    clock.advance(61)
+    cache.purge_expired()
+    assert cache.get("dashboard", "user-1", 7) == "value"
+    assert cache.stats()["generations"] == 1
+
+
+class SlowCompute:
+    """可控的计算：等待 release 后返回（或抛出）结果，记录调用次数"""
+
+    def __init__(self, result="value", error: Exception = None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_misses_compute_once(clock):
+    cache = make_cache()
+    compute = SlowCompute({"total": 3})
+
+    async def run():
+        waiters = [asyncio.create_task(cache.get_or_compute("dashboard", "user-1", 7, compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        compute.release.set()
+        return await asyncio.gather(*waiters)
+
+    results = asyncio.run(run())
+    assert compute.calls == 1
+    assert [result.value for result in results] == [{"total": 3}] * 5
+    assert cache.get("dashboard", "user-1", 7) == {"total": 3}
+    stats = cache.stats()["namespaces"]["dashboard"]
+    assert (stats["computations"], stats["collapsed"]) == (1, 4)
+
+
+def test_different_keys_compute_separately(clock):
+    cache = make_cache()
+    compute = SlowCompute()
+
+    async def run():
+        waiters = [
+            asyncio.create_task(cache.get_or_compute("dashboard", owner, days, compute))
+            for owner, days in (("user-1", 7), ("user-1", 30), ("user-2", 7))
+        ]
+        await asyncio.sleep(0)
+        compute.release.set()
+        await asyncio.gather(*waiters)
+
+    asyncio.run(run())
+    assert compute.calls == 3
+
+
+def test_errors_reach_every_waiter_and_are_not_cached(clock):
+    cache = make_cache()
+    failing = SlowCompute(error=RuntimeError("db down"))
+
+    async def run():
+        waiters = [asyncio.create_task(cache.get_or_compute("dashboard", "user-1", 7, failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        failing.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        retry = SlowCompute("recovered")
+        retry.release.set()
+        return await cache.get_or_compute("dashboard", "user-1", 7, retry)
+
+    assert asyncio.run(run()).value == "recovered"
+    assert failing.calls == 1
+    assert cache.stats()["namespaces"]["dashboard"]["errors"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_shared_computation(clock):
+    cache = make_cache()
+    compute = SlowCompute("value")
+
+    async def run():
+        first = asyncio.create_task(cache.get_or_compute("dashboard", "user-1", 7, compute))
+        second = asyncio.create_task(cache.get_or_compute("dashboard", "user-1", 7, compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        compute.release.set()
+        return await second
+
+    assert asyncio.run(run()).value == "value"
+    assert cache.get("dashboard", "user-1", 7) == "value"
+
+
+def test_result_computed_across_a_bump_is_returned_but_not_cached(clock):
+    cache = make_cache()
+    compute = SlowCompute("before-write")
+
+    async def run():
+        waiter = asyncio.create_task(cache.get_or_compute("dashboard", "user-1", 7, compute))
+        await asyncio.sleep(0)
+        cache.bump_generation("user-1")
+        compute.release.set()
+        return await waiter
+
+    assert asyncio.run(run()).value == "before-write"
+    assert cache.get("dashboard", "user-1", 7) is None
+
+
+def ready(value):
+    compute = SlowCompute(value)
+    compute.release.set()
+    return compute
+
+
+def test_stale_value_is_served_while_one_refresh_runs(clock):
+    cache = make_cache(stale_grace=30)
+    cache.set("dashboard", "user-1", 7, "old")
+    clock.advance(70)
+    refresh = SlowCompute("new")
+
+    async def run():
+        first = await cache.get_or_compute("dashboard", "user-1", 7, refresh)
+        second = await cache.get_or_compute("dashboard", "user-1", 7, refresh)
+        assert (first.value, first.age, first.stale) == ("old", 70, True)
+        assert (second.value, second.stale) == ("old", True)
+        refresh.release.set()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return await cache.get_or_compute("dashboard", "user-1", 7, refresh)
+
+    fresh = asyncio.run(run())
+    assert (fresh.value, fresh.stale) == ("new", False)
+    assert refresh.calls == 1
+    stats = cache.stats()["namespaces"]["dashboard"]
+    assert (stats["stale_hits"], stats["refreshes"]) == (2, 1)
+
+
+def test_past_grace_recomputes_synchronously(clock):
+    cache = make_cache(stale_grace=30)
+    cache.set("dashboard", "user-1", 7, "old")
+    clock.advance(91)
+
+    result = asyncio.run(cache.get_or_compute("dashboard", "user-1", 7, ready("new")))
+    assert (result.value, result.stale) == ("new", False)
+
+
+def test_stale_value_is_not_served_after_bump(clock):
+    cache = make_cache(stale_grace=30)
+    cache.set("dashboard", "user-1", 7, "old")
+    clock.advance(70)
+    cache.bump_generation("user-1")
+
+    result = asyncio.run(cache.get_or_compute("dashboard", "user-1", 7, ready("new")))
+    assert (result.value, result.stale) == ("new", False)
+
+
+def test_failed_refresh_keeps_stale_value(clock, capsys):
+    cache = make_cache(stale_grace=30)
+    cache.set("dashboard", "user-1", 7, "old")
+    clock.advance(70)
+    failing = SlowCompute(error=RuntimeError("db down"))
+    failing.release.set()
+
+    async def run():
+        first = await cache.get_or_compute("dashboard", "user-1", 7, failing)
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return first, await cache.get_or_compute("dashboard", "user-1", 7, failing)
+
+    first, second = asyncio.run(run())
+    assert (first.value, first.stale) == ("old", True)
+    assert (second.value, second.stale) == ("old", True)
+    assert failing.calls == 2
+    assert cache.stats()["namespaces"]["dashboard"]["errors"] == 2
+    assert "后台刷新缓存失败" in capsys.readouterr().out
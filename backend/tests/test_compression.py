@@ -0,0 +1,114 @@
+import gzip
+
+import brotli
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, negotiate_encoding
+
+BODY = ('{"records": [' + ",".join('{"title": "线性代数"}' for _ in range(200)) + ']}').encode()
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0.5", "gzip"),
+    ("GZIP", "gzip"),
+    ("*", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;q=abc", None),
+    ("identity", None),
+    ("", None),
+])
+def test_negotiate_encoding(accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+async def large(request):
+    return Response(BODY, media_type="application/json", headers={"ETag": '"v1"'})
+
+
+async def small(request):
+    return Response(b'{"ok": true}', media_type="application/json")
+
+
+async def not_modified(request):
+    return Response(status_code=304, headers={"ETag": '"v1"'})
+
+
+async def encoded(request):
+    return Response(gzip.compress(BODY), headers={"Content-Encoding": "gzip"})
+
+
+async def stream(request):
+    async def chunks():
+        for _ in range(3):
+            yield BODY
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+
+@pytest.fixture
+def raw_client():
+    app = Starlette(routes=[
+        Route("/large", large), Route("/small", small), Route("/not-modified", not_modified),
+        Route("/encoded", encoded), Route("/stream", stream),
+    ])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def get_raw(client, path, accept_encoding):
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_large_response_is_brotli_compressed(raw_client):
+    response, raw = get_raw(raw_client, "/large", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["content-length"] == str(len(raw))
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert brotli.decompress(raw) == BODY
+
+
+def test_gzip_when_brotli_not_accepted(raw_client):
+    response, raw = get_raw(raw_client, "/large", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw) == BODY
+
+
+def test_uncompressed_when_nothing_acceptable(raw_client):
+    response, raw = get_raw(raw_client, "/large", "identity")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
+    assert raw == BODY
+
+
+def test_small_response_is_not_compressed_but_varies(raw_client):
+    response, raw = get_raw(raw_client, "/small", "gzip")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert raw == b'{"ok": true}'
+
+
+def test_not_modified_uses_the_weak_etag(raw_client):
+    response, raw = get_raw(raw_client, "/not-modified", "gzip")
+    assert response.status_code == 304
+    assert response.headers["etag"] == 'W/"v1"'
+    assert raw == b""
+
+
+def test_already_encoded_response_passes_through(raw_client):
+    response, raw = get_raw(raw_client, "/encoded", "br, gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw) == BODY
+
+
+def test_streaming_response_is_compressed_chunk_by_chunk(raw_client):
+    response, raw = get_raw(raw_client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(raw) == BODY * 3
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from app.core.http_cache import etag_matches, make_etag, not_modified, user_data_etag
+from tests.fakes import FakeClient
+
+ETAG = make_etag("user-1", 5, "records")
+
+
+def request_with(if_none_match=None) -> Request:
+    headers = [] if if_none_match is None else [(b"if-none-match", if_none_match.encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.parametrize("header", [
+    ETAG,
+    f"W/{ETAG}",
+    f'"other", {ETAG}',
+    f'  W/"other" ,W/{ETAG}  ',
+    "*",
+])
+def test_matching_if_none_match(header):
+    assert etag_matches(request_with(header), ETAG)
+
+
+@pytest.mark.parametrize("header", [None, "", '"other"', ETAG.strip('"')])
+def test_non_matching_if_none_match(header):
+    assert not etag_matches(request_with(header), ETAG)
+
+
+def test_no_etag_never_matches():
+    assert not etag_matches(request_with("*"), None)
+
+
+def test_etag_depends_on_every_part():
+    assert make_etag("user-1", 5, "records") == ETAG
+    assert len({ETAG, make_etag("user-1", 6, "records"), make_etag("user-2", 5, "records"),
+                make_etag("user-1", 5, "stats")}) == 4
+
+
+def test_user_data_etag_follows_data_version():
+    client = FakeClient(tables={"user_data_versions": [{"user_id": "user-1", "version": 5}]})
+    assert asyncio.run(user_data_etag(client, "user-1", "records")) == ETAG
+    # 还没有写入过的用户版本为 0
+    assert asyncio.run(user_data_etag(client, "user-2", "records")) == make_etag("user-2", 0, "records")
+
+
+def test_not_modified_response_keeps_validators():
+    response = not_modified(ETAG)
+    assert response.status_code == 304
+    assert response.headers["etag"] == ETAG
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert response.headers["vary"] == "Authorization"
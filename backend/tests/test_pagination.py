@@ -0,0 +1,76 @@
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import (
+    _encode, decode_cursor, decode_search_cursor, decode_sync_token, encode_cursor, encode_search_cursor,
+    encode_sync_page_token, encode_sync_token, keyset_filter, next_cursor_for
+)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2026-10-17T03:18:48.123456+00:00", 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2026-10-17T03:18:48.123456+00:00", 42)
+
+
+def test_cursor_accepts_z_suffix():
+    assert decode_cursor(encode_cursor("2026-10-17T03:18:48Z", 7)) == ("2026-10-17T03:18:48Z", 7)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    _encode(["2026-10-17T03:18:48+00:00"]),
+    _encode(["yesterday", 1]),
+    _encode(['2026-10-17",record_id.gt.0', 1]),
+    _encode(["2026-10-17T03:18:48+00:00", "abc"]),
+])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_next_cursor_uses_last_row_of_page():
+    rows = [
+        {"occurred_at": "2026-10-17T03:00:00+00:00", "record_id": 3},
+        {"occurred_at": "2026-10-16T03:00:00+00:00", "record_id": 2},
+        {"occurred_at": "2026-10-15T03:00:00+00:00", "record_id": 1},
+    ]
+    assert next_cursor_for(rows, 3) is None
+    assert decode_cursor(next_cursor_for(rows, 2)) == ("2026-10-16T03:00:00+00:00", 2)
+
+
+def test_keyset_filter_breaks_ties_by_record_id():
+    assert keyset_filter("2026-10-17T03:00:00+00:00", 5) == (
+        '(occurred_at.lt."2026-10-17T03:00:00+00:00",'
+        'and(occurred_at.eq."2026-10-17T03:00:00+00:00",record_id.lt.5))'
+    )
+
+
+def test_search_cursor_round_trip():
+    assert decode_search_cursor(encode_search_cursor(1.2345678, 9)) == (1.2345678, 9)
+
+
+@pytest.mark.parametrize("cursor", [_encode([1.5]), _encode(["high", 1]), "%%%"])
+def test_invalid_search_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_search_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_sync_token_round_trip():
+    assert decode_sync_token(encode_sync_token(17)) == (17, None, None, None)
+
+
+def test_sync_page_token_round_trip():
+    assert decode_sync_token(encode_sync_page_token(17, 42, 30, 1001)) == (17, 42, 30, 1001)
+    # 全量同步的续传页没有 since
+    assert decode_sync_token(encode_sync_page_token(None, 42, 30, 1001)) == (None, 42, 30, 1001)
+
+
+@pytest.mark.parametrize("token", [_encode([]), _encode([1, 2]), _encode(["v1"]), _encode([1, None, 3, 4]), "@@"])
+def test_invalid_sync_token_is_400(token):
+    with pytest.raises(HTTPException) as error:
+        decode_sync_token(token)
+    assert error.value.status_code == 400
+    assert error.value.detail == "Invalid sync token"
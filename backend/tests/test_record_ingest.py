@@ -0,0 +1,167 @@
+import asyncio
+from itertools import count
+
+import pytest
+
+from app.services import record_ingest
+from app.services.record_ingest import ingest_records
+from tests.fakes import FakeClient
+
+USER_ID = "user-1"
+
+
+def make_payload(title: str, form_type: str = "book", resource_id=None, resource=None, tags=(), user_resource=None):
+    return {
+        "resource_id": resource_id,
+        "resource": resource,
+        "record": {"form_type": form_type, "title": title},
+        "tags": list(tags),
+        "user_resource": user_resource,
+    }
+
+
+def records_table(fail_titles=(), record_ids=None):
+    """多行插入：包含 fail_titles 中任一标题的批次整体失败（模拟约束冲突）"""
+    record_ids = record_ids or count(1)
+
+    def on_insert(table, rows):
+        assert table == "records"
+        bad = [row["title"] for row in rows if row["title"] in fail_titles]
+        if bad:
+            raise Exception(f"violates check constraint: {bad[0]}")
+        return [{**row, "record_id": next(record_ids)} for row in rows]
+
+    return on_insert
+
+
+def make_client(fail_titles=(), rpcs=None, on_insert=None):
+    return FakeClient(
+        tables={"user_form_types": [{"user_id": USER_ID, "type_code": "book"}, {"user_id": USER_ID, "type_code": "video"}]},
+        rpcs=rpcs,
+        on_insert=on_insert or records_table(fail_titles),
+    )
+
+
+def test_invalid_form_type_fails_without_insert():
+    client = make_client()
+    results = asyncio.run(ingest_records(client, USER_ID, [make_payload("a", form_type="dance")]))
+    assert results == [{"index": 0, "success": False, "error": "Invalid form_type 'dance' for user"}]
+    assert client.calls_to("records") == []
+
+
+def test_failed_row_is_isolated_by_bisecting():
+    client = make_client(fail_titles={"bad"})
+    titles = ["a", "b", "c", "bad", "e", "f", "g"]
+    created_ids = []
+    results = asyncio.run(ingest_records(client, USER_ID, [make_payload(t) for t in titles], created_ids))
+
+    assert [result["success"] for result in results] == [title != "bad" for title in titles]
+    assert results[3]["error"] == "violates check constraint: bad"
+    assert [result["index"] for result in results] == list(range(len(titles)))
+    assert len(created_ids) == 6
+    assert sorted(result["record_id"] for result in results if result["success"]) == sorted(created_ids)
+    # 7 行 → 一次整块失败，之后只在包含坏行的一半继续二分
+    assert len(client.calls_to("records")) <= 1 + 2 * 3
+
+
+def test_insert_returning_fewer_rows_is_treated_as_failure():
+    client = make_client(on_insert=lambda table, rows: [])
+    results = asyncio.run(ingest_records(client, USER_ID, [make_payload("a"), make_payload("b")]))
+    assert [result["error"] for result in results] == ["Failed to create record"] * 2
+
+
+def test_resources_are_resolved_once_per_title_and_type():
+    resource = {"title": "SICP", "type": "book"}
+    client = make_client(rpcs={
+        "resolve_resources": lambda params: [
+            {"title": item["title"], "type": item["type"], "resource_id": 10} for item in params["p_resources"]
+        ]
+    })
+    payloads = [make_payload("ch1", resource=resource), make_payload("ch2", resource=dict(resource))]
+    asyncio.run(ingest_records(client, USER_ID, payloads))
+
+    assert [params["p_resources"] for params in client.calls_to("resolve_resources")] == [[resource]]
+    inserted = client.calls_to("records")[0]
+    assert [row["resource_id"] for row in inserted] == [10, 10]
+
+
+def test_tags_and_user_resources_are_merged_per_resource():
+    client = make_client()
+    payloads = [
+        make_payload("a", resource_id=1, tags=["python"], user_resource={"status": "learning", "rating": 3}),
+        make_payload("b", resource_id=1, tags=["算法"], user_resource={"rating": 5}),
+        make_payload("c", resource_id=2, user_resource={"is_favorite": True}),
+        make_payload("d", resource_id=3),
+    ]
+    asyncio.run(ingest_records(client, USER_ID, payloads))
+
+    assert client.calls_to("sync_resource_tags_bulk") == [{
+        "p_user_id": USER_ID,
+        "p_items": [{"resource_id": 1, "tags": ["python", "算法"]}],
+    }]
+    assert client.calls_to("upsert_user_resources_bulk") == [{
+        "p_user_id": USER_ID,
+        "p_items": [
+            {"resource_id": 1, "user_resource": {"status": "learning", "rating": 5}},
+            {"resource_id": 2, "user_resource": {"is_favorite": True}},
+        ],
+    }]
+
+
+def test_side_effect_failures_are_reported_on_affected_items():
+    def fail(params):
+        raise Exception("timeout")
+
+    client = make_client(rpcs={"sync_resource_tags_bulk": fail, "upsert_user_resources_bulk": fail})
+    payloads = [
+        make_payload("a", resource_id=1, tags=["python"]),
+        make_payload("b", resource_id=1, user_resource={"status": "done"}),
+        make_payload("c", resource_id=2),
+    ]
+    results = asyncio.run(ingest_records(client, USER_ID, payloads))
+
+    assert all(result["success"] for result in results)
+    assert results[0]["warnings"] == ["Failed to sync tags: timeout"]
+    assert results[1]["warnings"] == ["Failed to update user resource: timeout"]
+    assert "warnings" not in results[2]
+
+
+def test_created_ids_survive_an_unexpected_error(monkeypatch):
+    monkeypatch.setattr(record_ingest, "BULK_INSERT_CHUNK_SIZE", 2)
+    record_ids = count(1)
+
+    def on_insert(table, rows):
+        if rows[0]["title"] == "c":
+            # 第二块返回的行缺少 record_id：模拟插入之后的意外错误
+            return [dict(row) for row in rows]
+        return [{**row, "record_id": next(record_ids)} for row in rows]
+
+    client = make_client(on_insert=on_insert)
+    created_ids = []
+    with pytest.raises(KeyError):
+        asyncio.run(ingest_records(client, USER_ID, [make_payload(t) for t in "abcd"], created_ids))
+    assert created_ids == [1, 2]
+
+
+def test_bulk_endpoint_runs_side_effects_for_committed_records(monkeypatch):
+    from fastapi import HTTPException
+
+    from app.api import records
+    from app.schemas.record import RecordBulkCreate
+
+    async def partially_failing_ingest(client, user_id, payloads, created_ids):
+        created_ids.extend([7, 8])
+        raise RuntimeError("connection reset")
+
+    invalidated, enqueued = [], []
+    monkeypatch.setattr(records, "ingest_records", partially_failing_ingest)
+    monkeypatch.setattr(records, "invalidate_user_caches", invalidated.append)
+    monkeypatch.setattr(records.side_effects, "enqueue", lambda name, func, *args: enqueued.append((name, args[-1])))
+
+    bulk = RecordBulkCreate(records=[{"form_type": "book", "title": "a"}, {"form_type": "book", "title": "b"}])
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(records.create_records_bulk(bulk, USER_ID, FakeClient()))
+
+    assert error.value.status_code == 500
+    assert invalidated == [USER_ID]
+    assert enqueued == [("search_index", [7, 8])]
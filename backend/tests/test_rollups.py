@@ -0,0 +1,122 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from app.services import rollups
+from app.services.rollups import (
+    STREAK_CHUNK_DAYS, average, fetch_streak_days, merge_metrics, streak_days, summarize_period
+)
+from tests.fakes import FakeClient
+
+TODAY = date(2026, 10, 17)
+# 仪表盘读取的窗口：[TODAY - 29, TODAY]
+WINDOW_START = TODAY - timedelta(days=29)
+
+
+def day_metrics(count=1, minutes=30, difficulty=None, focus=None, form_type="video") -> dict:
+    metrics = {
+        "count": count, "minutes": minutes, "days": 1,
+        "difficulty_sum": difficulty or 0, "difficulty_count": 1 if difficulty else 0,
+        "focus_sum": focus or 0, "focus_count": 1 if focus else 0,
+        "form_types": {form_type: {"count": count, "minutes": minutes}}
+    }
+    return metrics
+
+
+def summary_rows(user_id: str, days) -> list:
+    return [
+        {"user_id": user_id, "period": "daily", "period_start": day.isoformat(), "metrics": day_metrics()}
+        for day in days
+    ]
+
+
+def test_merge_metrics_adds_counts_and_form_types():
+    total = merge_metrics([
+        day_metrics(count=2, minutes=40, difficulty=3, form_type="video"),
+        day_metrics(count=1, minutes=20, focus=4, form_type="book"),
+        {"count": 1, "minutes": None},
+    ])
+    assert (total["count"], total["minutes"], total["days"]) == (4, 60, 2)
+    assert (total["difficulty_sum"], total["difficulty_count"]) == (3, 1)
+    assert total["form_types"] == {"video": {"count": 2, "minutes": 40}, "book": {"count": 1, "minutes": 20}}
+
+
+def test_merge_metrics_of_nothing_is_zero():
+    total = merge_metrics([])
+    assert total["count"] == 0 and total["form_types"] == {}
+
+
+def test_average_rounds_and_handles_missing_scores():
+    assert average({"difficulty_sum": 10, "difficulty_count": 3}, "difficulty") == 3.3
+    assert average({"focus_sum": 0, "focus_count": 0}, "focus") == 0
+    assert average({}, "focus") == 0
+
+
+def test_summarize_period_only_counts_days_in_range():
+    daily = {
+        TODAY: day_metrics(count=2, minutes=90, difficulty=4),
+        TODAY - timedelta(days=3): day_metrics(count=1, minutes=30, difficulty=2),
+        TODAY - timedelta(days=10): day_metrics(count=5, minutes=300),
+    }
+    summary = summarize_period(daily, TODAY - timedelta(days=6), TODAY)
+    assert summary["period_days"] == 7
+    assert summary["total_records"] == 3
+    assert summary["total_duration_hours"] == 2.0
+    assert summary["learning_days"] == 2
+    assert summary["avg_difficulty"] == 3.0
+    assert summary["daily_avg_duration"] == 60.0
+    assert summary["type_distribution"] == [{"type": "video", "count": 3, "total_duration": 120}]
+
+
+def test_summarize_empty_period():
+    summary = summarize_period({}, TODAY - timedelta(days=6), TODAY)
+    assert summary["total_records"] == 0
+    assert summary["total_duration_hours"] == 0
+    assert summary["daily_avg_duration"] == 0
+    assert summary["type_distribution"] == []
+
+
+def test_streak_counts_back_from_today():
+    dates = [TODAY - timedelta(days=offset) for offset in (0, 1, 2, 4)]
+    assert streak_days(dates, TODAY) == 3
+
+
+def test_streak_starts_yesterday_when_today_is_empty():
+    dates = [TODAY - timedelta(days=offset) for offset in (1, 2)]
+    assert streak_days(dates, TODAY) == 2
+    assert streak_days([TODAY - timedelta(days=2)], TODAY) == 0
+
+
+def expected_extra_queries(length: int, anchor: date = TODAY) -> int:
+    # 连续段之前的空档落在窗口内才不用再读；窗口之外每段 STREAK_CHUNK_DAYS 天
+    window_days = (anchor - WINDOW_START).days + 1
+    if length < window_days:
+        return 0
+    return (length - window_days) // STREAK_CHUNK_DAYS + 1
+
+
+@pytest.mark.parametrize("length", [0, 1, 29, 30, 89, 90, 200])
+@pytest.mark.parametrize("include_today", [True, False])
+def test_fetch_streak_days_reads_back_until_a_gap(length, include_today):
+    anchor = TODAY if include_today else TODAY - timedelta(days=1)
+    days = [anchor - timedelta(days=offset) for offset in range(length)]
+    # 连续段之前空两天（length 为 0 时今天和昨天都空），再往前还有记录：不能被算进连续天数
+    days += [anchor - timedelta(days=length + 2 + offset) for offset in range(5)]
+    rows = summary_rows("user-1", days) + summary_rows("user-2", [anchor - timedelta(days=length)])
+    client = FakeClient(tables={"user_summaries": rows})
+
+    async def run():
+        daily = await rollups.fetch_summaries(client, "user-1", WINDOW_START, TODAY)
+        client.calls.clear()
+        return await fetch_streak_days(client, "user-1", daily, WINDOW_START, TODAY)
+
+    assert asyncio.run(run()) == length
+    assert len(client.calls_to("user_summaries")) == expected_extra_queries(length, anchor)
+
+
+def test_expected_extra_queries_for_long_streaks():
+    # 参数化用例所依赖的查询次数本身也核对一遍，避免与实现一起写错
+    assert [expected_extra_queries(n) for n in (29, 30, 89, 90, 149, 150, 200)] == [0, 1, 1, 2, 2, 3, 3]
+    yesterday = TODAY - timedelta(days=1)
+    assert [expected_extra_queries(n, yesterday) for n in (28, 29, 88, 89)] == [0, 1, 1, 2]
@@ -0,0 +1,67 @@
+import asyncio
+
+from app.services import segmentation
+from app.services.segmentation import _quote_lexeme, index_records, segment_query, segment_record, segment_text
+from tests.fakes import FakeClient
+
+
+def test_segment_text_lowercases_and_drops_punctuation():
+    assert segment_text("线性代数 Python入门！") == "线性 代数 线性代数 python 入门"
+
+
+def test_segment_text_handles_empty_input():
+    assert segment_text(None) == ""
+    assert segment_text("，。！ ") == ""
+
+
+def test_segment_record_joins_title_and_body():
+    assert segment_record("标题", None) == "标题"
+    assert segment_record("线性代数", "Python") == "线性 代数 线性代数 python"
+
+
+def test_query_word_also_matches_its_covering_subwords():
+    ts_query, terms = segment_query("线性代数")
+    assert ts_query == "('线性代数' | ('线性' & '代数'))"
+    assert terms == ["线性代数", "线性", "代数"]
+
+
+def test_query_terms_are_anded():
+    ts_query, terms = segment_query("Python 入门")
+    assert ts_query == "'python' & '入门'"
+    assert terms == ["python", "入门"]
+
+
+def test_punctuation_only_query_has_no_tsquery():
+    assert segment_query("！！") == (None, [])
+
+
+def test_lexemes_are_quoted_for_to_tsquery():
+    assert _quote_lexeme("it's") == "'it''s'"
+    assert _quote_lexeme("a\\b") == "'a\\\\b'"
+
+
+def index_with(monkeypatch, rows):
+    async def segment_in_process(items):
+        return segmentation.segment_records(items)
+
+    monkeypatch.setattr(segmentation, "_segment_many", segment_in_process)
+    client = FakeClient(tables={"records": rows})
+    asyncio.run(index_records(client, [row["record_id"] for row in rows]))
+    return client.calls_to("set_record_search_text")
+
+
+def test_index_records_writes_only_changed_search_text(monkeypatch):
+    rows = [
+        {"record_id": 1, "title": "线性代数", "body_md": None, "search_text": "线性 代数 线性代数"},
+        {"record_id": 2, "title": "Python", "body_md": "入门", "search_text": "python"},
+        {"record_id": 3, "title": "新记录", "body_md": None, "search_text": None},
+    ]
+    assert index_with(monkeypatch, rows) == [{"p_items": [
+        {"record_id": 2, "search_text": "python 入门"},
+        {"record_id": 3, "search_text": "新 记录"},
+    ]}]
+
+
+def test_index_records_skips_rpc_when_nothing_changed(monkeypatch):
+    rows = [{"record_id": 1, "title": "Python", "body_md": None, "search_text": "python"}]
+    assert index_with(monkeypatch, rows) == []
@@ -0,0 +1,47 @@
+import asyncio
+
+from fastapi import Response
+
+from app.api.sync import sync_changes
+from app.core.pagination import decode_sync_token, encode_sync_page_token, encode_sync_token
+from tests.fakes import FakeClient
+
+
+def sync_result(**overrides):
+    return {
+        "version": 50, "full_sync": False, "has_more": False,
+        "records": [], "templates": [], "form_types": [], "tags": [], "deleted": {},
+        **overrides,
+    }
+
+
+def call_sync(result, since=None):
+    client = FakeClient(rpcs={"sync_changes": lambda params: [result]})
+    response = Response()
+    body = asyncio.run(sync_changes(response, since, 2, "user-1", client))
+    return body, client.calls_to("sync_changes")[0], response
+
+
+def test_last_page_returns_version_token():
+    body, params, response = call_sync(sync_result(deleted={"records": [3]}), since=encode_sync_token(40))
+    assert params["p_since"] == 40 and params["p_after_version"] is None
+    assert decode_sync_token(body["next_token"]) == (50, None, None, None)
+    assert body["deleted"] == {"records": [3]}
+    assert response.headers["cache-control"] == "no-store"
+
+
+def test_more_pages_continue_after_last_record():
+    records = [{"record_id": 7, "sync_version": 41}, {"record_id": 9, "sync_version": 44}]
+    body, _, _ = call_sync(sync_result(records=records, has_more=True), since=encode_sync_token(40))
+    assert decode_sync_token(body["next_token"]) == (40, 50, 44, 9)
+
+
+def test_full_sync_continuation_pages_keep_no_since():
+    records = [{"record_id": 9, "sync_version": 44}]
+    body, params, _ = call_sync(
+        sync_result(records=records, has_more=True, full_sync=True, templates=None),
+        since=encode_sync_page_token(None, 50, 30, 2)
+    )
+    assert (params["p_since"], params["p_until"], params["p_after_version"], params["p_after_id"]) == (None, 50, 30, 2)
+    assert decode_sync_token(body["next_token"]) == (None, 50, 44, 9)
+    assert body["templates"] == []
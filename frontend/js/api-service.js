@@ -159,14 +159,20 @@ class APIService {
     // === 学习记录相关API ===
 
     async getRecords(params = {}) {
-        const { skip = 0, limit = 50, days = null } = params;
+        const { skip = 0, limit = 50, days = null, cursor = null, fields = null } = params;
         
         // 🚫 暂时禁用缓存，直接调用API
-        // 构建查询参数
+        // 构建查询参数（有cursor时使用游标分页，忽略skip）
         const queryParams = new URLSearchParams();
-        queryParams.set('skip', skip);
+        if (cursor) {
+            queryParams.set('cursor', cursor);
+        } else {
+            queryParams.set('skip', skip);
+        }
         queryParams.set('limit', limit);
         if (days) queryParams.set('days', days);
+        // 默认返回不含正文的精简列表；需要正文时传 fields（如 '*' 或 'title,body_md'）
+        if (fields) queryParams.set('fields', fields);
         
         const url = `/records?${queryParams.toString()}`;
         const data = await this.request(url);
@@ -223,6 +229,15 @@ class APIService {
         this.clearCache('stats');
     }
 
+    // === 增量同步API ===
+
+    // since 为上次返回的 next_token；不传为全量同步（has_more 为 true 时用 next_token 继续拉取）
+    async syncChanges(since = null, limit = 500) {
+        const queryParams = new URLSearchParams({ limit });
+        if (since) queryParams.set('since', since);
+        return await this.request(`/sync?${queryParams.toString()}`);
+    }
+
     // === 记录模板相关API ===
 
     async getRecordTemplates(params = {}) {
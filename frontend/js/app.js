@@ -27,10 +27,10 @@ class LearningBuddyApp {
     }
 
     async init() {
-        // 🚫 暂时禁用缓存服务初始化
-        // if (window.cacheService) {
-        //     await window.cacheService.init();
-        // }
+        // 缓存服务：用于全部记录的增量同步（entities 存储）；汇总数据的 TTL 缓存仍未启用
+        if (window.cacheService) {
+            await window.cacheService.init();
+        }
         
         await this.loadData();
         await this.loadFormTypes();
@@ -206,36 +206,54 @@ class LearningBuddyApp {
         console.log('🎨 已刷新学习形式类型显示');
     }
     
-    // Load all records for the records page (not just 20 recent)
-    async loadAllRecords() {
-        try {
-            this.showLoading(true);
+    // 获取全部记录（后端列表格式）：优先增量同步，只拉取上次同步之后的变化，
+    // 其余从 IndexedDB 的 entities 存储读取；缓存服务不可用或同步失败时退回逐页加载
+    async fetchAllRecords() {
+        if (window.cacheService?.isInitialized) {
+            try {
+                const summary = await window.cacheService.sync();
+                if (summary) {
+                    return await window.cacheService.getSyncedRecords();
+                }
+            } catch (error) {
+                console.warn('⚠️ 增量同步失败，改为逐页加载记录:', error);
+            }
+        }
 
+        // 分批加载所有记录（API限制已提升至1000条）
+        let allRecords = [];
+        let cursor = null;
+        const batchSize = 500;
 
-            // 分批加载所有记录（API限制已提升至1000条）
-            let allRecords = [];
-            let skip = 0;
-            const batchSize = 500;
+        while (true) {
+            const recordsData = await window.apiService.getRecords({
+                cursor: cursor,
+                limit: batchSize
+            });
 
-            while (true) {
-                const recordsData = await window.apiService.getRecords({
-                    skip: skip,
-                    limit: batchSize
-                });
+            if (!recordsData?.records || recordsData.records.length === 0) {
+                break; // 没有更多记录了
+            }
 
-                if (!recordsData?.records || recordsData.records.length === 0) {
-                    break; // 没有更多记录了
-                }
+            allRecords = allRecords.concat(recordsData.records);
 
-                allRecords = allRecords.concat(recordsData.records);
+            // 没有下一页游标，说明已经加载完所有记录
+            if (!recordsData.next_cursor) {
+                break;
+            }
 
-                // 如果返回的记录数少于批次大小，说明已经加载完所有记录
-                if (recordsData.records.length < batchSize) {
-                    break;
-                }
+            cursor = recordsData.next_cursor;
+        }
 
-                skip += batchSize;
-            }
+        return allRecords;
+    }
+    
+    // Load all records for the records page (not just 20 recent)
+    async loadAllRecords() {
+        try {
+            this.showLoading(true);
+
+            const allRecords = await this.fetchAllRecords();
 
             // 转换记录格式
             this.records = allRecords.map(record => this.convertBackendRecord(record));
@@ -2611,30 +2629,8 @@ class LearningBuddyApp {
             // Show loading state
             this.showLoading(true);
 
-            // Load ALL records for analytics using batch loading
-            let allRecords = [];
-            let skip = 0;
-            const batchSize = 500;
-
-            while (true) {
-                const recordsData = await window.apiService.getRecords({
-                    skip: skip,
-                    limit: batchSize
-                });
-
-                if (!recordsData?.records || recordsData.records.length === 0) {
-                    break; // No more records
-                }
-
-                allRecords = allRecords.concat(recordsData.records);
-
-                // If returned records less than batch size, all records loaded
-                if (recordsData.records.length < batchSize) {
-                    break;
-                }
-
-                skip += batchSize;
-            }
+            // Load ALL records for analytics (delta sync + local entities store)
+            const allRecords = await this.fetchAllRecords();
 
             // Convert to the expected format
             if (allRecords && allRecords.length > 0) {
@@ -347,6 +347,13 @@ class AuthService {
             // 也清除通用的缓存键（防止遗留数据）
             localStorage.removeItem('app_init_data');
             
+            // 清除增量同步到 IndexedDB 的记录副本
+            if (window.cacheService?.db) {
+                window.cacheService.clearEntities(userId).catch(error => {
+                    console.error('❌ 清除同步缓存失败:', error);
+                });
+            }
+            
             console.log(`🧹 已清除用户 ${userId.substring(0, 8)} 的缓存`);
         } catch (error) {
             console.error('❌ 清除用户缓存失败:', error);
@@ -2,7 +2,7 @@
 class CacheService {
     constructor() {
         this.dbName = 'LearningBuddyCache';
-        this.dbVersion = 1;
+        this.dbVersion = 2;
         this.db = null;
         this.isInitialized = false;
     }
@@ -44,6 +44,12 @@ class CacheService {
                     store.createIndex('timestamp', 'timestamp', { unique: false });
                     store.createIndex('type', 'type', { unique: false });
                 }
+
+                // 增量同步的实体缓存（记录、模板、学习形式、资源标签），不过期，由 /sync 增量更新
+                if (!db.objectStoreNames.contains('entities')) {
+                    const store = db.createObjectStore('entities', { keyPath: 'key' });
+                    store.createIndex('owner', 'owner', { unique: false });
+                }
             };
         });
     }
@@ -249,6 +255,116 @@ class CacheService {
         });
     }
 
+    // === 增量同步 ===
+
+    // 同步：只拉取上次同步之后的新增/修改/删除，合并进 entities 存储
+    // 并发调用共用同一次同步（记录页与统计页可能同时加载）
+    sync() {
+        if (!this.syncing) {
+            this.syncing = this.runSync().finally(() => {
+                this.syncing = null;
+            });
+        }
+        return this.syncing;
+    }
+
+    async runSync() {
+        if (!this.db || !window.apiService) return null;
+
+        const userId = this.getUserId();
+        const tokenKey = `${userId}:sync-token`;
+        let token = (await this.getEntityItem(tokenKey))?.data || null;
+        const summary = { full: false, upserts: 0, deletes: 0 };
+
+        let hasMore = true;
+        while (hasMore) {
+            const page = await window.apiService.syncChanges(token);
+
+            if (page.full_sync && !summary.full) {
+                // 全量同步：丢弃本地实体缓存
+                await this.clearEntities(userId);
+                summary.full = true;
+            }
+
+            const transaction = this.db.transaction(['entities'], 'readwrite');
+            const store = transaction.objectStore('entities');
+            for (const [entity, idField] of Object.entries(CacheService.SYNC_ENTITY_KEYS)) {
+                for (const row of page[entity] || []) {
+                    store.put({ key: `${userId}:${entity}:${row[idField]}`, owner: `${userId}:${entity}`, data: row });
+                    summary.upserts++;
+                }
+                for (const id of page.deleted?.[entity] || []) {
+                    store.delete(`${userId}:${entity}:${id}`);
+                    summary.deletes++;
+                }
+            }
+            token = page.next_token;
+            store.put({ key: tokenKey, owner: `${userId}:meta`, data: token });
+            await this.promisifyTransaction(transaction);
+
+            hasMore = page.has_more;
+        }
+
+        console.log(`🔄 同步完成: ${summary.full ? '全量' : '增量'}，更新 ${summary.upserts} 条，删除 ${summary.deletes} 条`);
+        return summary;
+    }
+
+    // 读取已同步的某类实体（records / templates / form_types / tags）
+    async getSyncedEntities(entity) {
+        if (!this.db) return [];
+        const transaction = this.db.transaction(['entities'], 'readonly');
+        const index = transaction.objectStore('entities').index('owner');
+        const items = await this.promisifyRequest(index.getAll(IDBKeyRange.only(`${this.getUserId()}:${entity}`)));
+        return items.map(item => item.data);
+    }
+
+    // 已同步的记录，格式与 GET /records 列表项一致（tags 为逗号分隔的标签名），按发生时间倒序
+    async getSyncedRecords() {
+        const [records, resourceTags] = await Promise.all([
+            this.getSyncedEntities('records'),
+            this.getSyncedEntities('tags')
+        ]);
+
+        const tagsByResource = new Map();
+        resourceTags
+            .sort((a, b) => a.tag_id - b.tag_id)
+            .forEach(tag => {
+                if (!tagsByResource.has(tag.resource_id)) {
+                    tagsByResource.set(tag.resource_id, []);
+                }
+                tagsByResource.get(tag.resource_id).push(tag.tag_name);
+            });
+
+        return records
+            .map(record => ({ ...record, tags: (tagsByResource.get(record.resource_id) || []).join(',') }))
+            .sort((a, b) => (new Date(b.occurred_at) - new Date(a.occurred_at)) || (b.record_id - a.record_id));
+    }
+
+    async getEntityItem(key) {
+        const transaction = this.db.transaction(['entities'], 'readonly');
+        return await this.promisifyRequest(transaction.objectStore('entities').get(key));
+    }
+
+    async clearEntities(userId) {
+        const transaction = this.db.transaction(['entities'], 'readwrite');
+        const store = transaction.objectStore('entities');
+        store.delete(IDBKeyRange.bound(`${userId}:`, `${userId}:\uffff`));
+        await this.promisifyTransaction(transaction);
+    }
+
+    getUserId() {
+        return window.authService?.getCurrentUser()?.id || 'anonymous';
+    }
+
+    // 将 IDBTransaction 完成转换为 Promise
+    promisifyTransaction(transaction) {
+        return new Promise((resolve, reject) => {
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+            transaction.onabort = () => reject(transaction.error);
+        });
+    }
+
     // 预设的快捷方法
     async cacheDashboard(data, ttlMinutes = 5) {
         const key = this.generateKey('dashboard', { userId: window.authService?.getCurrentUser()?.id || 'anonymous' });
@@ -282,5 +398,13 @@ class CacheService {
     }
 }
 
+// 同步实体 -> 主键字段
+CacheService.SYNC_ENTITY_KEYS = {
+    records: 'record_id',
+    templates: 'template_id',
+    form_types: 'type_id',
+    tags: 'resource_tag_id'
+};
+
 // 创建全局缓存服务实例
 window.cacheService = new CacheService();
\ No newline at end of file
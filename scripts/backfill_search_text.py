@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+回填记录的分词列 records.search_text（配合 sql/014 使用）。
+按 record_id 顺序分页读取尚未分词的记录，在进程池中用 jieba 切分后通过 set_record_search_text 批量写回。
+可重复执行、可随时中断；--all 重建全部记录（如更换词典之后）。
+只写分词列：记录的 updated_at 不变，分词结果未变化的记录不会被写入。
+
+用法:
+    python scripts/backfill_search_text.py --batch-size 500 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from supabase import create_client
+
+from app.core.config import settings
+from app.services.segmentation import init_segment_worker, segment_records
+
+
+def fetch_batch(client, after_id: int, batch_size: int, rebuild: bool) -> list:
+    query = client.table('records').select('record_id, title, body_md').gt('record_id', after_id)
+    if not rebuild:
+        query = query.is_('search_text', 'null')
+    return query.order('record_id').limit(batch_size).execute().data or []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy 记录分词回填")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--all", action="store_true", help="重建全部记录（默认只处理 search_text 为空的记录）")
+    args = parser.parse_args()
+
+    client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    started = time.perf_counter()
+    after_id = 0
+    total = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_segment_worker) as executor:
+        while True:
+            rows = fetch_batch(client, after_id, args.batch_size, args.all)
+            if not rows:
+                break
+
+            items = [(row['title'], row['body_md']) for row in rows]
+            size = -(-len(items) // args.workers)
+            texts = [
+                text
+                for chunk in executor.map(segment_records, [items[i:i + size] for i in range(0, len(items), size)])
+                for text in chunk
+            ]
+
+            client.rpc('set_record_search_text', {
+                'p_items': [
+                    {'record_id': row['record_id'], 'search_text': text}
+                    for row, text in zip(rows, texts)
+                ]
+            }).execute()
+
+            after_id = rows[-1]['record_id']
+            total += len(rows)
+            elapsed = time.perf_counter() - started
+            print(f"   已回填 {total} 条（record_id ≤ {after_id}），{total / elapsed:.0f} 条/s", end="\r")
+
+    print(f"\n✅ 回填完成：{total} 条，用时 {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
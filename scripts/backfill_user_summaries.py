@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+重建 user_summaries 的 daily / weekly / monthly 汇总（配合 sql/019 使用）。
+按 user_id 顺序分批调用 rebuild_user_summaries：重算每个用户有记录的所有日期及其所在的周、月，删除已经没有记录的汇总行。
+首次上线 sql/019 时执行一次回填；之后可随时执行校对，可随时中断（--after 从指定用户之后继续）。
+
+用法:
+    python scripts/backfill_user_summaries.py --batch-size 100
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from supabase import create_client
+
+from app.core.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy 学习汇总回填")
+    parser.add_argument("--batch-size", type=int, default=100, help="每批处理的用户数")
+    parser.add_argument("--after", default=None, help="从该 user_id 之后开始（中断后继续）")
+    args = parser.parse_args()
+
+    client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    started = time.perf_counter()
+    after_user_id = args.after
+    users = 0
+    days = 0
+
+    while True:
+        result = client.rpc('rebuild_user_summaries', {
+            'p_after_user_id': after_user_id,
+            'p_limit': args.batch_size
+        }).execute().data[0]
+        if not result['users']:
+            break
+
+        after_user_id = result['last_user_id']
+        users += result['users']
+        days += result['days']
+        print(f"   已处理 {users} 个用户，重算 {days} 天（最后 user_id {after_user_id}）", end="\r")
+
+    print(f"\n✅ 回填完成：{users} 个用户，{days} 天，用时 {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
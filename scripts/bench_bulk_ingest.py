@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+批量导入吞吐基准：同样数量的合成记录，分别用逐条 POST /records/ 与分批 POST /records/bulk 写入，
+输出每种方式的 records/s。会在目标账号下真实创建记录，请使用测试账号。
+
+用法:
+    python scripts/bench_bulk_ingest.py --token <access_token> --records 500 --batch-size 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+API_PREFIX = "/api/v1/records"
+
+
+def make_records(count: int, form_type: str, run_id: str) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "form_type": form_type,
+            "title": f"bench {run_id} #{i}",
+            "body_md": "benchmark record",
+            "occurred_at": (now - timedelta(minutes=i)).isoformat(),
+            "duration_min": random.randint(5, 120),
+            "difficulty": random.randint(1, 5),
+            "focus": random.randint(1, 5),
+            "resource_title": f"bench resource {run_id} {i % 20}",
+            "tags": [f"bench-{i % 7}", f"bench-{i % 11}", "bench"],
+        }
+        for i in range(count)
+    ]
+
+
+async def bench_single(client: httpx.AsyncClient, records: list, concurrency: int) -> tuple:
+    errors = 0
+    remaining = iter(records)
+
+    async def worker():
+        nonlocal errors
+        for record in remaining:
+            response = await client.post(f"{API_PREFIX}/", json=record)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return time.perf_counter() - started, errors
+
+
+async def bench_bulk(client: httpx.AsyncClient, records: list, batch_size: int) -> tuple:
+    errors = 0
+    started = time.perf_counter()
+    for start in range(0, len(records), batch_size):
+        response = await client.post(f"{API_PREFIX}/bulk", json={"records": records[start:start + batch_size]})
+        response.raise_for_status()
+        errors += response.json()["failed"]
+    return time.perf_counter() - started, errors
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {args.token}"}
+    run_id = datetime.utcnow().strftime("%H%M%S")
+
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=120.0) as client:
+        if not args.skip_single:
+            elapsed, errors = await bench_single(client, make_records(args.records, args.form_type, f"{run_id}-s"), args.concurrency)
+            print(f"📮 逐条 POST /records/  并发={args.concurrency}")
+            print(f"   {args.records} 条 / {elapsed:.2f}s = {args.records / elapsed:.1f} records/s  失败: {errors}")
+
+        elapsed, errors = await bench_bulk(client, make_records(args.records, args.form_type, f"{run_id}-b"), args.batch_size)
+        print(f"📦 POST /records/bulk  每批={args.batch_size}")
+        print(f"   {args.records} 条 / {elapsed:.2f}s = {args.records / elapsed:.1f} records/s  失败: {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy 批量导入吞吐基准")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Supabase access token（测试账号）")
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4, help="逐条写入时的并发数")
+    parser.add_argument("--form-type", default="video")
+    parser.add_argument("--skip-single", action="store_true", help="只测批量接口")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
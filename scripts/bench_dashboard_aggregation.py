@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+仪表盘聚合基准（进程内，无需启动服务）：同一批合成记录，对比
+- 逐行聚合：sql/019 之前 /summaries/dashboard 与 /summaries/init 的做法，取回区间内全部记录，
+  每行解析 occurred_at 并换算本地日期（今日统计再算一遍），Python 循环求和/分组；
+- 汇总行：sql/019 之后的做法，只读取区间内的 daily 汇总行（一般 60 行），由 summarize_period 合并。
+汇总行在数据库里随写入增量维护，这里预先算好，不计入耗时。两种方式的结果会先做一致性校验。
+
+用法:
+    python scripts/bench_dashboard_aggregation.py --rows 10000 100000 --days 30 --rounds 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from app.services.rollups import USER_TIMEZONE, local_today, merge_metrics, streak_days, summarize_period
+
+FORM_TYPES = ["video", "book", "course", "podcast", "article", "exercise", "project", "workshop", "other"]
+
+
+def make_records(count: int, days: int) -> list:
+    """记录均匀分布在最近 days 个本地自然日内（到当前时刻为止）"""
+    now = datetime.now(timezone.utc)
+    start = USER_TIMEZONE.localize(datetime.combine(local_today() - timedelta(days=days - 1), datetime.min.time()))
+    span = int((now - start).total_seconds())
+    records = []
+    for _ in range(count):
+        occurred_at = now - timedelta(seconds=random.randint(0, span))
+        records.append({
+            "occurred_at": occurred_at.isoformat(),
+            "duration_min": random.choice([None, random.randint(5, 120)]),
+            "form_type": random.choice(FORM_TYPES),
+            "difficulty": random.choice([None, random.randint(1, 5)]),
+            "focus": random.choice([None, random.randint(1, 5)]),
+        })
+    return records
+
+
+def local_date(occurred_at: str):
+    return datetime.fromisoformat(occurred_at).astimezone(USER_TIMEZONE).date()
+
+
+def legacy_summary(records: list) -> dict:
+    """逐行聚合（sql/019 之前的接口逻辑；区间过滤由数据库完成，这里的记录都在区间内）"""
+    today = local_today()
+    total_duration = sum(r.get('duration_min', 0) or 0 for r in records)
+    learning_dates = {local_date(r['occurred_at']) for r in records if r.get('occurred_at')}
+    valid_difficulty = [r['difficulty'] for r in records if r.get('difficulty') is not None]
+    valid_focus = [r['focus'] for r in records if r.get('focus') is not None]
+
+    type_stats = {}
+    for record in records:
+        stat = type_stats.setdefault(record.get('form_type', 'other'), {'count': 0, 'duration': 0})
+        stat['count'] += 1
+        stat['duration'] += record.get('duration_min', 0) or 0
+
+    today_records = [r for r in records if local_date(r['occurred_at']) == today]
+    return {
+        "total_records": len(records),
+        "total_minutes": total_duration,
+        "learning_days": len(learning_dates),
+        "avg_difficulty": round(sum(valid_difficulty) / len(valid_difficulty), 1) if valid_difficulty else 0,
+        "avg_focus": round(sum(valid_focus) / len(valid_focus), 1) if valid_focus else 0,
+        "types": {k: v['count'] for k, v in type_stats.items()},
+        "streak_days": streak_days(learning_dates, today),
+        "today_count": len(today_records),
+    }
+
+
+def build_daily(records: list) -> dict:
+    """按本地日期预先算好 daily 汇总行（数据库中由 sql/019 的触发器维护）"""
+    daily = {}
+    for record in records:
+        day = local_date(record['occurred_at'])
+        metrics = {
+            'count': 1,
+            'minutes': record['duration_min'] or 0,
+            'days': 1,
+            'difficulty_sum': record['difficulty'] or 0,
+            'difficulty_count': int(record['difficulty'] is not None),
+            'focus_sum': record['focus'] or 0,
+            'focus_count': int(record['focus'] is not None),
+            'form_types': {record['form_type']: {'count': 1, 'minutes': record['duration_min'] or 0}},
+        }
+        merged = merge_metrics([daily[day], metrics]) if day in daily else metrics
+        merged['days'] = 1
+        daily[day] = merged
+    return daily
+
+
+def rollup_summary(daily: dict, days: int) -> dict:
+    """汇总行（sql/019 之后的接口逻辑）"""
+    today = local_today()
+    summary = summarize_period(daily, today - timedelta(days=days - 1), today)
+    today_metrics = daily.get(today) or {}
+    return {
+        "total_records": summary['total_records'],
+        "total_minutes": round(summary['total_duration_hours'] * 60),
+        "learning_days": summary['learning_days'],
+        "avg_difficulty": summary['avg_difficulty'],
+        "avg_focus": summary['avg_focus'],
+        "types": {t['type']: t['count'] for t in summary['type_distribution']},
+        "streak_days": streak_days(daily, today),
+        "today_count": today_metrics.get('count', 0),
+    }
+
+
+def timed(func, rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return (time.perf_counter() - started) / rounds * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy 仪表盘聚合基准")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000], help="记录数（可多个）")
+    parser.add_argument("--days", type=int, default=30, help="统计最近N天（记录均匀分布在这几个自然日内）")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    for count in args.rows:
+        records = make_records(count, args.days)
+        daily = build_daily(records)
+
+        legacy_ms, expected = timed(lambda: legacy_summary(records), args.rounds)
+        rollup_ms, actual = timed(lambda: rollup_summary(daily, args.days), args.rounds)
+
+        # total_duration_hours 只保留一位小数，分钟数按 6 分钟精度比较
+        assert abs(expected.pop('total_minutes') - actual.pop('total_minutes')) <= 3, "累计时长不一致"
+        assert expected == actual, f"结果不一致:\n{expected}\n{actual}"
+
+        print(f"\n📊 {count} 条记录 / {args.days} 天（{len(daily)} 个 daily 行）")
+        print(f"   逐行聚合: {legacy_ms:9.2f}ms")
+        print(f"   汇总行:   {rollup_ms:9.3f}ms   ({legacy_ms / rollup_ms:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
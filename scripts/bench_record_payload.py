@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+记录列表负载对比：同一页记录分别以默认精简列表与 fields=*（含完整正文/附件）请求，
+输出响应字节数、请求耗时与客户端 JSON 解析耗时。
+
+用法:
+    python scripts/bench_record_payload.py --token <access_token> --limit 1000 --rounds 10
+"""
+import argparse
+import json
+import time
+
+import httpx
+
+API_PREFIX = "/api/v1/records"
+
+VARIANTS = [
+    ("精简列表(默认)", {}),
+    ("全部字段(fields=*)", {"fields": "*"}),
+]
+
+
+def percentile(samples: list, p: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+
+def measure(client: httpx.Client, params: dict, rounds: int) -> tuple:
+    latencies, parse_times, sizes = [], [], []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        # 不带 Accept-Encoding，比较未压缩的字节数
+        response = client.get(f"{API_PREFIX}/", params=params, headers={"Accept-Encoding": "identity"})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        sizes.append(len(response.content))
+
+        started = time.perf_counter()
+        json.loads(response.content)
+        parse_times.append(time.perf_counter() - started)
+    return latencies, parse_times, sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy 记录列表负载对比")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Supabase access token（测试账号）")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"}
+    with httpx.Client(base_url=args.base_url, headers=headers, timeout=60.0) as client:
+        for label, extra in VARIANTS:
+            latencies, parse_times, sizes = measure(client, {"limit": args.limit, **extra}, args.rounds)
+            print(f"📦 {label:<16} {sizes[-1] / 1024:8.1f} KB  "
+                  f"p50={percentile(latencies, 0.5):.1f}ms p95={percentile(latencies, 0.95):.1f}ms  "
+                  f"解析={percentile(parse_times, 0.5):.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+响应编码基准（进程内，无需启动服务）：用合成的记录列表 / 首页聚合数据，
+对比标准库 JSONResponse 与 ORJSONResponse 的序列化耗时，以及 gzip / br 压缩后的字节数与耗时。
+
+用法:
+    python scripts/bench_response_encoding.py --records 1000 --rounds 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from fastapi.responses import JSONResponse
+
+from app.core.compression import _BrotliCompressor, _GzipCompressor, brotli
+from app.core.responses import ORJSONResponse
+
+WORDS = ["线性代数", "机器学习", "读书笔记", "python", "fastapi", "数据结构", "英语听力", "健身", "复习", "总结"]
+
+
+def make_record(i: int, full: bool) -> dict:
+    occurred_at = datetime.now(timezone.utc) - timedelta(minutes=i * 37)
+    record = {
+        "record_id": 100000 + i,
+        "resource_id": random.randint(1, 300),
+        "form_type": random.choice(["video", "book", "course", "podcast"]),
+        "title": f"{random.choice(WORDS)} 第{i}次",
+        "excerpt": " ".join(random.choices(WORDS, k=20))[:120],
+        "occurred_at": occurred_at.isoformat(),
+        "duration_min": random.randint(5, 120),
+        "difficulty": random.randint(1, 5),
+        "focus": random.randint(1, 5),
+        "mood": "",
+        "tags": ",".join(random.sample(WORDS, 3)),
+    }
+    if full:
+        record.update({
+            "user_id": "6d45fa47-7935-4673-ac25-bc39ca3f3481",
+            "body_md": "\n".join(" ".join(random.choices(WORDS, k=30)) for _ in range(8)),
+            "effective_duration_min": None,
+            "energy": random.randint(1, 5),
+            "privacy": "private",
+            "auto_confidence": None,
+            "assets": [{"type": "image", "url": f"https://example.com/{i}.png"}],
+            "created_at": occurred_at.isoformat(),
+            "updated_at": occurred_at.isoformat(),
+        })
+    return record
+
+
+def make_payloads(count: int) -> dict:
+    return {
+        f"records 精简 x{count}": {"records": [make_record(i, False) for i in range(count)], "total": count},
+        f"records 全部字段 x{count}": {"records": [make_record(i, True) for i in range(count)], "total": count},
+        "summaries/init": {
+            "dashboard": {"week": {"total_records": 42, "type_distribution": [{"type": "video", "count": 20}]}},
+            "recent_records": {"records": [make_record(i, False) for i in range(20)], "total": 20},
+            "form_types": [{"type_id": i, "type_code": f"t{i}", "type_name": WORDS[i % len(WORDS)]} for i in range(10)],
+        },
+    }
+
+
+def timed(func, rounds: int):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return (time.perf_counter() - started) / rounds * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy 响应编码基准")
+    parser.add_argument("--records", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    for label, payload in make_payloads(args.records).items():
+        std_ms, std_body = timed(lambda: JSONResponse(payload).body, args.rounds)
+        orjson_ms, body = timed(lambda: ORJSONResponse(payload).body, args.rounds)
+        print(f"\n📦 {label}")
+        print(f"   序列化  json: {std_ms:7.2f}ms {len(std_body) / 1024:8.1f} KB   "
+              f"orjson: {orjson_ms:7.2f}ms {len(body) / 1024:8.1f} KB   ({std_ms / orjson_ms:.1f}x)")
+
+        def compress(compressor):
+            return compressor.compress(body) + compressor.finish()
+
+        gzip_ms, gzipped = timed(lambda: compress(_GzipCompressor(4)), args.rounds)
+        print(f"   gzip-4:  {gzip_ms:7.2f}ms {len(gzipped) / 1024:8.1f} KB ({len(gzipped) / len(body):.0%})")
+        if brotli is not None:
+            br_ms, compressed = timed(lambda: compress(_BrotliCompressor(4)), args.rounds)
+            print(f"   br-4:    {br_ms:7.2f}ms {len(compressed) / 1024:8.1f} KB ({len(compressed) / len(body):.0%})")
+
+
+if __name__ == "__main__":
+    main()
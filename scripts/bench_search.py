@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+记录搜索延迟基准：可选先通过 POST /records/bulk 给测试账号灌入大量记录（如 10 万条），
+再对 GET /records/search 的若干典型查询（英文词、中文词、短词、带过滤、翻页）测量延迟分位数。
+
+用法:
+    # 灌数据（只需一次）+ 测试
+    python scripts/bench_search.py --token <access_token> --seed 100000
+    # 仅测试
+    python scripts/bench_search.py --token <access_token> --rounds 50
+
+配合 sql/014 末尾的 EXPLAIN 语句确认查询走 GIN 索引；灌入的记录由后端写入时分词，旧数据先运行 backfill_search_text.py。
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+API_PREFIX = "/api/v1/records"
+
+WORDS = [
+    "python", "algorithm", "database", "index", "react", "fastapi", "postgres", "linux",
+    "机器学习", "线性代数", "数据结构", "英语听力", "读书笔记", "健身", "吉他", "摄影",
+]
+
+QUERIES = [
+    ("英文词", {"q": "postgres"}),
+    ("中文词", {"q": "线性代数"}),
+    ("短词", {"q": "笔记"}),
+    ("多词", {"q": "python algorithm"}),
+    ("按类型过滤", {"q": "database", "form_type": "video"}),
+    ("按时间过滤", {"q": "react", "date_from": (datetime.utcnow() - timedelta(days=90)).isoformat()}),
+]
+
+
+def make_record(i: int, form_type: str) -> dict:
+    words = random.sample(WORDS, 3)
+    return {
+        "form_type": form_type,
+        "title": f"{words[0]} {words[1]} #{i}",
+        "body_md": " ".join(random.choices(WORDS, k=40)),
+        "occurred_at": (datetime.utcnow() - timedelta(minutes=i * 7)).isoformat(),
+        "duration_min": random.randint(5, 120),
+        "resource_title": f"seed {words[0]}",
+    }
+
+
+async def seed(client: httpx.AsyncClient, count: int, form_type: str, batch_size: int):
+    started = time.perf_counter()
+    for start in range(0, count, batch_size):
+        batch = [make_record(i, form_type) for i in range(start, min(start + batch_size, count))]
+        response = await client.post(f"{API_PREFIX}/bulk", json={"records": batch})
+        response.raise_for_status()
+        print(f"   已写入 {min(start + batch_size, count)}/{count}", end="\r")
+    print(f"\n🌱 灌入 {count} 条用时 {time.perf_counter() - started:.1f}s")
+
+
+def percentile(samples: list, p: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+
+async def measure(client: httpx.AsyncClient, label: str, params: dict, rounds: int):
+    latencies = []
+    hits = 0
+    next_cursor = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        response = await client.get(f"{API_PREFIX}/search", params=params)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        data = response.json()
+        hits = data["total"]
+        next_cursor = data["next_cursor"] or next_cursor
+    latencies.sort()
+    print(f"🔎 {label:<8} 命中={hits:<3} p50={percentile(latencies, 0.5):.1f}ms "
+          f"p95={percentile(latencies, 0.95):.1f}ms p99={percentile(latencies, 0.99):.1f}ms")
+    return next_cursor
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=120.0) as client:
+        if args.seed:
+            await seed(client, args.seed, args.form_type, args.batch_size)
+
+        for label, params in QUERIES:
+            next_cursor = await measure(client, label, params, args.rounds)
+            if label == "英文词" and next_cursor:
+                await measure(client, "第二页", {**params, "cursor": next_cursor}, args.rounds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy 记录搜索延迟基准")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Supabase access token（测试账号）")
+    parser.add_argument("--seed", type=int, default=0, help="先灌入N条测试记录")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--form-type", default="video")
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
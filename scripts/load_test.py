@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+简单的并发压测脚本：对一个 API 端点发起并发请求，输出吞吐与延迟分位数，
+并在压测前后读取 /health 中的事件循环延迟（event_loop_lag）。
+
+用法:
+    python scripts/load_test.py --token <access_token> \
+        --path /api/v1/summaries/init --concurrency 20 --requests 400
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run(base_url: str, path: str, token: str, concurrency: int, total: int):
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=30.0) as client:
+        before = (await client.get("/health")).json().get("event_loop_lag")
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+        after = (await client.get("/health")).json().get("event_loop_lag")
+
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    print(f"📡 {path}  并发={concurrency}  请求数={total}")
+    print(f"   吞吐: {total / elapsed:.1f} req/s  错误: {errors}")
+    print(f"   延迟: mean={statistics.mean(latencies) * 1000:.1f}ms "
+          f"p50={percentile(0.50):.1f}ms p95={percentile(0.95):.1f}ms p99={percentile(0.99):.1f}ms")
+    print(f"   事件循环延迟 (压测前): {before}")
+    print(f"   事件循环延迟 (压测后): {after}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy API 并发压测")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/api/v1/summaries/init")
+    parser.add_argument("--token", default="", help="Supabase access token")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=400)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.base_url, args.path, args.token, args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
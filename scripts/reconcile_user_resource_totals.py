@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+重算 user_resources.total_duration_min / last_interaction_at（配合 sql/017 使用）。
+按 user_id 顺序分批调用 reconcile_user_resource_totals：补齐缺失的用户-资源关系，按 records 重算两列，只写入有差异的行。
+首次上线 sql/017 时执行一次回填；之后可随时执行校对，可随时中断（--after 从指定用户之后继续）。
+
+用法:
+    python scripts/reconcile_user_resource_totals.py --batch-size 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+
+from supabase import create_client
+
+from app.core.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Study Buddy 用户资源累计时长对账")
+    parser.add_argument("--batch-size", type=int, default=200, help="每批处理的用户数")
+    parser.add_argument("--after", default=None, help="从该 user_id 之后开始（中断后继续）")
+    args = parser.parse_args()
+
+    client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    started = time.perf_counter()
+    after_user_id = args.after
+    users = 0
+    updated = 0
+
+    while True:
+        result = client.rpc('reconcile_user_resource_totals', {
+            'p_after_user_id': after_user_id,
+            'p_limit': args.batch_size
+        }).execute().data[0]
+        if not result['users']:
+            break
+
+        after_user_id = result['last_user_id']
+        users += result['users']
+        updated += result['updated']
+        print(f"   已处理 {users} 个用户，修正 {updated} 行（最后 user_id {after_user_id}）", end="\r")
+
+    print(f"\n✅ 对账完成：{users} 个用户，修正 {updated} 行，用时 {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+-- Migration: Single round-trip record / template detail
+-- Description: 记录详情与模板详情以一个 JSON 文档返回（记录 + resource + user_resource + 标签），
+--              替代后端对 records/resources/user_resources/resource_tags/tags 的五次顺序查询
+
+-- 记录详情：tags 为完整标签行
+CREATE OR REPLACE FUNCTION public.get_record_detail(p_user_id UUID, p_record_id BIGINT)
+RETURNS TABLE (detail JSONB)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT to_jsonb(r) || jsonb_build_object(
+    'resource', (
+      SELECT to_jsonb(res) FROM public.resources res
+      WHERE res.resource_id = r.resource_id
+    ),
+    'user_resource', (
+      SELECT to_jsonb(ur) FROM public.user_resources ur
+      WHERE ur.user_id = p_user_id AND ur.resource_id = r.resource_id
+    ),
+    'tags', COALESCE((
+      SELECT jsonb_agg(to_jsonb(t) ORDER BY t.tag_id)
+      FROM public.resource_tags rt
+      JOIN public.tags t ON t.tag_id = rt.tag_id
+      WHERE rt.user_id = p_user_id AND rt.resource_id = r.resource_id
+    ), '[]'::jsonb)
+  )
+  FROM public.records r
+  WHERE r.record_id = p_record_id AND r.user_id = p_user_id;
+$$;
+
+-- 模板详情：tags 为标签名列表
+CREATE OR REPLACE FUNCTION public.get_record_template_detail(p_user_id UUID, p_template_id BIGINT)
+RETURNS TABLE (detail JSONB)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT to_jsonb(tpl) || jsonb_build_object(
+    'resource', (
+      SELECT to_jsonb(res) FROM public.resources res
+      WHERE res.resource_id = tpl.resource_id
+    ),
+    'user_resource', (
+      SELECT to_jsonb(ur) FROM public.user_resources ur
+      WHERE ur.user_id = p_user_id AND ur.resource_id = tpl.resource_id
+    ),
+    'tags', COALESCE((
+      SELECT jsonb_agg(t.tag_name ORDER BY t.tag_id)
+      FROM public.resource_tags rt
+      JOIN public.tags t ON t.tag_id = rt.tag_id
+      WHERE rt.user_id = p_user_id AND rt.resource_id = tpl.resource_id
+    ), '[]'::jsonb)
+  )
+  FROM public.record_templates tpl
+  WHERE tpl.template_id = p_template_id AND tpl.user_id = p_user_id;
+$$;
+
+COMMENT ON FUNCTION public.get_record_detail IS '记录详情（含资源、用户资源关系与标签）单次查询';
+COMMENT ON FUNCTION public.get_record_template_detail IS '模板详情（含资源、用户资源关系与标签名）单次查询';
+
+-- 函数以参数指定用户，只允许后端（service_role）调用
+REVOKE EXECUTE ON FUNCTION public.get_record_detail(UUID, BIGINT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.get_record_template_detail(UUID, BIGINT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_record_detail(UUID, BIGINT) TO service_role;
+GRANT EXECUTE ON FUNCTION public.get_record_template_detail(UUID, BIGINT) TO service_role;
@@ -0,0 +1,132 @@
+-- Migration: Transactional single-call record creation
+-- Description: 一次 RPC 在同一事务内完成 学习形式校验 → 资源查找/创建 → 插入记录 → 标签 → 用户资源关系，
+--              并直接返回带 tags 字符串的记录（与 GET /records 列表项格式一致）。
+--              中途失败整体回滚，不再留下只建了一半的资源/标签。
+--
+-- p_payload 结构（由后端根据 RecordCreate 组装）:
+-- {
+--   "resource_id": 12 | null,
+--   "resource": {"title", "type", "author", "url", "platform", "isbn", "description"} | null,
+--   "record": {"form_type", "title", "body_md", "occurred_at", "duration_min", "effective_duration_min",
+--              "mood", "difficulty", "focus", "energy", "privacy", "assets"},
+--   "tags": ["python", "算法"],
+--   "user_resource": {"status", "rating", "review_short", "is_favorite"} | null
+-- }
+
+CREATE OR REPLACE FUNCTION public.create_record_with_tags(p_user_id UUID, p_payload JSONB)
+RETURNS TABLE (created_record JSONB)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  v_record_data JSONB := p_payload -> 'record';
+  v_resource JSONB := NULLIF(p_payload -> 'resource', 'null'::jsonb);
+  v_user_resource JSONB := NULLIF(p_payload -> 'user_resource', 'null'::jsonb);
+  v_resource_id BIGINT := (p_payload ->> 'resource_id')::BIGINT;
+  v_tag_names TEXT[];
+  v_row public.records;
+BEGIN
+  -- 1. 校验学习形式（22023 → PostgREST 返回 400）
+  IF NOT public.validate_form_type(p_user_id, v_record_data ->> 'form_type') THEN
+    RAISE EXCEPTION 'Invalid form_type ''%'' for user', v_record_data ->> 'form_type'
+      USING ERRCODE = '22023';
+  END IF;
+
+  -- 2. 查找或创建资源（按标题 + 类型匹配）
+  IF v_resource_id IS NULL AND v_resource IS NOT NULL THEN
+    SELECT res.resource_id INTO v_resource_id
+    FROM public.resources res
+    WHERE res.title = v_resource ->> 'title'
+      AND res.type = (v_resource ->> 'type')::resource_type
+    LIMIT 1;
+
+    IF v_resource_id IS NULL THEN
+      INSERT INTO public.resources (type, title, author, url, platform, isbn, description, created_by)
+      VALUES (
+        (v_resource ->> 'type')::resource_type,
+        v_resource ->> 'title',
+        NULLIF(v_resource ->> 'author', ''),
+        NULLIF(v_resource ->> 'url', ''),
+        NULLIF(v_resource ->> 'platform', ''),
+        NULLIF(v_resource ->> 'isbn', ''),
+        NULLIF(v_resource ->> 'description', ''),
+        p_user_id
+      )
+      RETURNING resources.resource_id INTO v_resource_id;
+    END IF;
+  END IF;
+
+  -- 3. 插入记录（直接使用 RETURNING 的行，不再回查）
+  INSERT INTO public.records (
+    user_id, resource_id, form_type, title, body_md, occurred_at,
+    duration_min, effective_duration_min, mood, difficulty, focus, energy, privacy, assets
+  )
+  VALUES (
+    p_user_id,
+    v_resource_id,
+    v_record_data ->> 'form_type',
+    v_record_data ->> 'title',
+    v_record_data ->> 'body_md',
+    COALESCE((v_record_data ->> 'occurred_at')::TIMESTAMPTZ, NOW()),
+    (v_record_data ->> 'duration_min')::INTEGER,
+    (v_record_data ->> 'effective_duration_min')::INTEGER,
+    v_record_data ->> 'mood',
+    (v_record_data ->> 'difficulty')::SMALLINT,
+    (v_record_data ->> 'focus')::SMALLINT,
+    (v_record_data ->> 'energy')::SMALLINT,
+    COALESCE(v_record_data ->> 'privacy', 'private')::privacy_level,
+    NULLIF(v_record_data -> 'assets', 'null'::jsonb)
+  )
+  RETURNING * INTO v_row;
+
+  -- 4. 标签：批量 upsert 标签并关联到资源（不随标签数量增加往返次数）
+  SELECT array_agg(DISTINCT btrim(n.tag)) INTO v_tag_names
+  FROM jsonb_array_elements_text(COALESCE(p_payload -> 'tags', '[]'::jsonb)) AS n(tag)
+  WHERE btrim(n.tag) <> '';
+
+  IF v_resource_id IS NOT NULL AND v_tag_names IS NOT NULL THEN
+    INSERT INTO public.tags (tag_name, tag_type, created_by)
+    SELECT n.tag, 'category', p_user_id FROM unnest(v_tag_names) AS n(tag)
+    ON CONFLICT (tag_name, COALESCE(created_by, '00000000-0000-0000-0000-000000000000'::uuid)) DO NOTHING;
+
+    INSERT INTO public.resource_tags (user_id, resource_id, tag_id)
+    SELECT p_user_id, v_resource_id, t.tag_id
+    FROM public.tags t
+    WHERE t.created_by = p_user_id AND t.tag_name = ANY (v_tag_names)
+    ON CONFLICT (user_id, resource_id, tag_id) DO NOTHING;
+  END IF;
+
+  -- 5. 用户资源关系（只更新提供了的字段）
+  IF v_resource_id IS NOT NULL AND v_user_resource IS NOT NULL AND v_user_resource <> '{}'::jsonb THEN
+    INSERT INTO public.user_resources (user_id, resource_id, status, rating, review_short, is_favorite)
+    VALUES (
+      p_user_id,
+      v_resource_id,
+      COALESCE(v_user_resource ->> 'status', 'learning')::resource_status,
+      (v_user_resource ->> 'rating')::SMALLINT,
+      v_user_resource ->> 'review_short',
+      COALESCE((v_user_resource ->> 'is_favorite')::BOOLEAN, FALSE)
+    )
+    ON CONFLICT (user_id, resource_id) DO UPDATE SET
+      status = CASE WHEN v_user_resource ? 'status' THEN EXCLUDED.status ELSE user_resources.status END,
+      rating = CASE WHEN v_user_resource ? 'rating' THEN EXCLUDED.rating ELSE user_resources.rating END,
+      review_short = CASE WHEN v_user_resource ? 'review_short' THEN EXCLUDED.review_short ELSE user_resources.review_short END,
+      is_favorite = CASE WHEN v_user_resource ? 'is_favorite' THEN EXCLUDED.is_favorite ELSE user_resources.is_favorite END;
+  END IF;
+
+  -- 6. 返回记录 + 资源上该用户的全部标签（逗号分隔，与列表接口一致）
+  RETURN QUERY
+  SELECT to_jsonb(v_row) || jsonb_build_object('tags', COALESCE((
+    SELECT string_agg(t.tag_name, ',' ORDER BY t.tag_id)
+    FROM public.resource_tags rt
+    JOIN public.tags t ON t.tag_id = rt.tag_id
+    WHERE rt.user_id = p_user_id AND rt.resource_id = v_resource_id
+  ), ''));
+END;
+$$;
+
+COMMENT ON FUNCTION public.create_record_with_tags IS '事务内创建学习记录（资源、标签、用户资源关系），返回带标签的记录';
+
+-- 函数以参数指定用户，只允许后端（service_role）调用
+REVOKE EXECUTE ON FUNCTION public.create_record_with_tags(UUID, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.create_record_with_tags(UUID, JSONB) TO service_role;
@@ -0,0 +1,159 @@
+-- Migration: Set-based tag synchronization
+-- Description: 一次调用完成 标签名解析（批量 upsert，依赖 uq_tags_name_creator）→ 与现有 resource_tags 求差集
+--              → 只插入新增、只删除移除的关联。替代后端逐个标签 select + insert 的循环（10个标签约40次往返）。
+--              同一 (用户, 资源) 的并发同步用事务级 advisory lock 串行化，标签本身的并发创建由 ON CONFLICT 兜底。
+
+CREATE OR REPLACE FUNCTION public.sync_resource_tags(
+  p_user_id UUID,
+  p_resource_id BIGINT,
+  p_tag_names TEXT[],
+  p_replace BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE (tag_id BIGINT, tag_name TEXT)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  v_names TEXT[];
+  v_tag_ids BIGINT[];
+BEGIN
+  SELECT COALESCE(array_agg(DISTINCT btrim(n.tag)), '{}') INTO v_names
+  FROM unnest(COALESCE(p_tag_names, '{}')) AS n(tag)
+  WHERE btrim(n.tag) <> '';
+
+  PERFORM pg_advisory_xact_lock(hashtext('resource_tags'), hashtext(p_user_id::text || ':' || p_resource_id));
+
+  -- 1. 批量解析标签：不存在的一次性创建
+  INSERT INTO public.tags (tag_name, tag_type, created_by)
+  SELECT n.tag, 'category', p_user_id FROM unnest(v_names) AS n(tag)
+  ON CONFLICT (tag_name, COALESCE(created_by, '00000000-0000-0000-0000-000000000000'::uuid)) DO NOTHING;
+
+  SELECT COALESCE(array_agg(t.tag_id), '{}') INTO v_tag_ids
+  FROM public.tags t
+  WHERE t.created_by = p_user_id AND t.tag_name = ANY (v_names);
+
+  -- 2. 替换模式：删除不再需要的关联
+  IF p_replace THEN
+    DELETE FROM public.resource_tags rt
+    WHERE rt.user_id = p_user_id
+      AND rt.resource_id = p_resource_id
+      AND rt.tag_id <> ALL (v_tag_ids);
+  END IF;
+
+  -- 3. 只插入缺失的关联
+  INSERT INTO public.resource_tags (user_id, resource_id, tag_id)
+  SELECT p_user_id, p_resource_id, new_tag.id FROM unnest(v_tag_ids) AS new_tag(id)
+  ON CONFLICT (user_id, resource_id, tag_id) DO NOTHING;
+
+  RETURN QUERY
+  SELECT t.tag_id, t.tag_name
+  FROM public.resource_tags rt
+  JOIN public.tags t ON t.tag_id = rt.tag_id
+  WHERE rt.user_id = p_user_id AND rt.resource_id = p_resource_id
+  ORDER BY t.tag_id;
+END;
+$$;
+
+COMMENT ON FUNCTION public.sync_resource_tags IS '批量同步用户在资源上的标签（p_replace=false 时只追加），返回同步后的标签';
+
+REVOKE EXECUTE ON FUNCTION public.sync_resource_tags(UUID, BIGINT, TEXT[], BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.sync_resource_tags(UUID, BIGINT, TEXT[], BOOLEAN) TO service_role;
+
+-- create_record_with_tags 改为复用标签同步（追加模式），其余逻辑与 010 相同
+CREATE OR REPLACE FUNCTION public.create_record_with_tags(p_user_id UUID, p_payload JSONB)
+RETURNS TABLE (created_record JSONB)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  v_record_data JSONB := p_payload -> 'record';
+  v_resource JSONB := NULLIF(p_payload -> 'resource', 'null'::jsonb);
+  v_user_resource JSONB := NULLIF(p_payload -> 'user_resource', 'null'::jsonb);
+  v_resource_id BIGINT := (p_payload ->> 'resource_id')::BIGINT;
+  v_tag_names TEXT[];
+  v_row public.records;
+BEGIN
+  IF NOT public.validate_form_type(p_user_id, v_record_data ->> 'form_type') THEN
+    RAISE EXCEPTION 'Invalid form_type ''%'' for user', v_record_data ->> 'form_type'
+      USING ERRCODE = '22023';
+  END IF;
+
+  IF v_resource_id IS NULL AND v_resource IS NOT NULL THEN
+    SELECT res.resource_id INTO v_resource_id
+    FROM public.resources res
+    WHERE res.title = v_resource ->> 'title'
+      AND res.type = (v_resource ->> 'type')::resource_type
+    LIMIT 1;
+
+    IF v_resource_id IS NULL THEN
+      INSERT INTO public.resources (type, title, author, url, platform, isbn, description, created_by)
+      VALUES (
+        (v_resource ->> 'type')::resource_type,
+        v_resource ->> 'title',
+        NULLIF(v_resource ->> 'author', ''),
+        NULLIF(v_resource ->> 'url', ''),
+        NULLIF(v_resource ->> 'platform', ''),
+        NULLIF(v_resource ->> 'isbn', ''),
+        NULLIF(v_resource ->> 'description', ''),
+        p_user_id
+      )
+      RETURNING resources.resource_id INTO v_resource_id;
+    END IF;
+  END IF;
+
+  INSERT INTO public.records (
+    user_id, resource_id, form_type, title, body_md, occurred_at,
+    duration_min, effective_duration_min, mood, difficulty, focus, energy, privacy, assets
+  )
+  VALUES (
+    p_user_id,
+    v_resource_id,
+    v_record_data ->> 'form_type',
+    v_record_data ->> 'title',
+    v_record_data ->> 'body_md',
+    COALESCE((v_record_data ->> 'occurred_at')::TIMESTAMPTZ, NOW()),
+    (v_record_data ->> 'duration_min')::INTEGER,
+    (v_record_data ->> 'effective_duration_min')::INTEGER,
+    v_record_data ->> 'mood',
+    (v_record_data ->> 'difficulty')::SMALLINT,
+    (v_record_data ->> 'focus')::SMALLINT,
+    (v_record_data ->> 'energy')::SMALLINT,
+    COALESCE(v_record_data ->> 'privacy', 'private')::privacy_level,
+    NULLIF(v_record_data -> 'assets', 'null'::jsonb)
+  )
+  RETURNING * INTO v_row;
+
+  SELECT array_agg(n.tag) INTO v_tag_names
+  FROM jsonb_array_elements_text(COALESCE(p_payload -> 'tags', '[]'::jsonb)) AS n(tag);
+
+  IF v_resource_id IS NOT NULL AND v_tag_names IS NOT NULL THEN
+    PERFORM public.sync_resource_tags(p_user_id, v_resource_id, v_tag_names, FALSE);
+  END IF;
+
+  IF v_resource_id IS NOT NULL AND v_user_resource IS NOT NULL AND v_user_resource <> '{}'::jsonb THEN
+    INSERT INTO public.user_resources (user_id, resource_id, status, rating, review_short, is_favorite)
+    VALUES (
+      p_user_id,
+      v_resource_id,
+      COALESCE(v_user_resource ->> 'status', 'learning')::resource_status,
+      (v_user_resource ->> 'rating')::SMALLINT,
+      v_user_resource ->> 'review_short',
+      COALESCE((v_user_resource ->> 'is_favorite')::BOOLEAN, FALSE)
+    )
+    ON CONFLICT (user_id, resource_id) DO UPDATE SET
+      status = CASE WHEN v_user_resource ? 'status' THEN EXCLUDED.status ELSE user_resources.status END,
+      rating = CASE WHEN v_user_resource ? 'rating' THEN EXCLUDED.rating ELSE user_resources.rating END,
+      review_short = CASE WHEN v_user_resource ? 'review_short' THEN EXCLUDED.review_short ELSE user_resources.review_short END,
+      is_favorite = CASE WHEN v_user_resource ? 'is_favorite' THEN EXCLUDED.is_favorite ELSE user_resources.is_favorite END;
+  END IF;
+
+  RETURN QUERY
+  SELECT to_jsonb(v_row) || jsonb_build_object('tags', COALESCE((
+    SELECT string_agg(t.tag_name, ',' ORDER BY t.tag_id)
+    FROM public.resource_tags rt
+    JOIN public.tags t ON t.tag_id = rt.tag_id
+    WHERE rt.user_id = p_user_id AND rt.resource_id = v_resource_id
+  ), ''));
+END;
+$$;
@@ -0,0 +1,119 @@
+-- Migration: Bulk record ingestion helpers
+-- Description: POST /records/bulk 使用的批量函数：
+--              resolve_resources       按 (title, type) 去重后批量查找/创建资源
+--              sync_resource_tags_bulk 一次调用为多个资源追加标签（逐个复用 sync_resource_tags）
+--              upsert_user_resources_bulk 一次调用写入多个资源的用户资源关系（status / rating / review_short / is_favorite）
+
+-- p_resources: [{"title", "type", "author", "url", "platform", "isbn", "description"}, ...]
+CREATE OR REPLACE FUNCTION public.resolve_resources(p_user_id UUID, p_resources JSONB)
+RETURNS TABLE (title TEXT, type TEXT, resource_id BIGINT)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+#variable_conflict use_column
+BEGIN
+  -- 只创建不存在的资源；与 ISBN/URL 等唯一索引冲突的跳过（该条记录不绑定资源）
+  INSERT INTO public.resources (type, title, author, url, platform, isbn, description, created_by)
+  SELECT DISTINCT ON (w.title, w.type)
+    w.type::resource_type,
+    w.title,
+    NULLIF(w.author, ''),
+    NULLIF(w.url, ''),
+    NULLIF(w.platform, ''),
+    NULLIF(w.isbn, ''),
+    NULLIF(w.description, ''),
+    p_user_id
+  FROM jsonb_to_recordset(p_resources)
+    AS w(title TEXT, type TEXT, author TEXT, url TEXT, platform TEXT, isbn TEXT, description TEXT)
+  WHERE NOT EXISTS (
+    SELECT 1 FROM public.resources res
+    WHERE res.title = w.title AND res.type = w.type::resource_type
+  )
+  ORDER BY w.title, w.type
+  ON CONFLICT DO NOTHING;
+
+  RETURN QUERY
+  SELECT w.title, w.type, (
+    SELECT min(res.resource_id) FROM public.resources res
+    WHERE res.title = w.title AND res.type = w.type::resource_type
+  )
+  FROM (
+    SELECT DISTINCT x.title, x.type
+    FROM jsonb_to_recordset(p_resources) AS x(title TEXT, type TEXT)
+  ) w;
+END;
+$$;
+
+-- p_items: [{"resource_id": 1, "tags": ["a", "b"]}, ...]
+CREATE OR REPLACE FUNCTION public.sync_resource_tags_bulk(p_user_id UUID, p_items JSONB)
+RETURNS TABLE (resource_id BIGINT, tag_count INTEGER)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  v_item RECORD;
+BEGIN
+  FOR v_item IN
+    SELECT (i.value ->> 'resource_id')::BIGINT AS item_resource_id,
+           ARRAY(SELECT jsonb_array_elements_text(i.value -> 'tags')) AS item_tags
+    FROM jsonb_array_elements(p_items) AS i
+    ORDER BY 1  -- 固定加锁顺序，避免并发批量写入互相死锁
+  LOOP
+    resource_id := v_item.item_resource_id;
+    SELECT count(*) INTO tag_count
+    FROM public.sync_resource_tags(p_user_id, v_item.item_resource_id, v_item.item_tags, FALSE);
+    RETURN NEXT;
+  END LOOP;
+END;
+$$;
+
+-- p_items: [{"resource_id": 1, "user_resource": {"status", "rating", "review_short", "is_favorite"}}, ...]
+-- 每个资源一项（同一资源多条记录的字段由后端按输入顺序合并），只更新提供了的字段（与 create_record_with_tags 一致）
+CREATE OR REPLACE FUNCTION public.upsert_user_resources_bulk(p_user_id UUID, p_items JSONB)
+RETURNS TABLE (resource_id BIGINT)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  v_item RECORD;
+BEGIN
+  FOR v_item IN
+    SELECT (i.value ->> 'resource_id')::BIGINT AS item_resource_id,
+           i.value -> 'user_resource' AS item_fields
+    FROM jsonb_array_elements(p_items) AS i
+    WHERE jsonb_typeof(i.value -> 'user_resource') = 'object' AND i.value -> 'user_resource' <> '{}'::jsonb
+    ORDER BY 1  -- 固定加锁顺序，避免并发批量写入互相死锁
+  LOOP
+    INSERT INTO public.user_resources (user_id, resource_id, status, rating, review_short, is_favorite)
+    VALUES (
+      p_user_id,
+      v_item.item_resource_id,
+      COALESCE(v_item.item_fields ->> 'status', 'learning')::resource_status,
+      (v_item.item_fields ->> 'rating')::SMALLINT,
+      v_item.item_fields ->> 'review_short',
+      COALESCE((v_item.item_fields ->> 'is_favorite')::BOOLEAN, FALSE)
+    )
+    ON CONFLICT (user_id, resource_id) DO UPDATE SET
+      status = CASE WHEN v_item.item_fields ? 'status' THEN EXCLUDED.status ELSE user_resources.status END,
+      rating = CASE WHEN v_item.item_fields ? 'rating' THEN EXCLUDED.rating ELSE user_resources.rating END,
+      review_short = CASE WHEN v_item.item_fields ? 'review_short' THEN EXCLUDED.review_short ELSE user_resources.review_short END,
+      is_favorite = CASE WHEN v_item.item_fields ? 'is_favorite' THEN EXCLUDED.is_favorite ELSE user_resources.is_favorite END;
+
+    resource_id := v_item.item_resource_id;
+    RETURN NEXT;
+  END LOOP;
+END;
+$$;
+
+COMMENT ON FUNCTION public.resolve_resources IS '批量查找或创建资源（按标题+类型），返回每个键对应的 resource_id';
+COMMENT ON FUNCTION public.sync_resource_tags_bulk IS '批量为多个资源追加标签';
+COMMENT ON FUNCTION public.upsert_user_resources_bulk IS '批量写入多个资源的用户资源关系（只更新提供了的字段）';
+
+REVOKE EXECUTE ON FUNCTION public.resolve_resources(UUID, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.sync_resource_tags_bulk(UUID, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.upsert_user_resources_bulk(UUID, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.resolve_resources(UUID, JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION public.sync_resource_tags_bulk(UUID, JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION public.upsert_user_resources_bulk(UUID, JSONB) TO service_role;
@@ -0,0 +1,141 @@
+-- Migration: Ranked full-text / trigram record search
+-- Description: GET /records/search 使用的搜索函数，命中 001 中已有的三个 GIN 索引：
+--              idx_records_search_expr  to_tsvector('simple', title || ' ' || body_md)  （分词全文匹配）
+--              idx_records_title_trgm / idx_records_body_trgm                           （子串匹配，中文也可用）
+--
+-- 写法要点（保证规划器真正走索引）：
+-- 1. 全文条件与索引表达式逐字一致；三个条件用 OR 连接，规划器可组合为 BitmapOr。
+-- 2. search_records 是 LANGUAGE sql + STABLE、不带 SET/SECURITY DEFINER，可被内联，
+--    参数以常量进入规划，ILIKE 模式和 tsquery 都能用于索引条件。
+-- 3. ts_headline 代价高，只对当前页（LIMIT 之后）的行计算。
+-- 4. 分页按 (rank, record_id) 倒序做 keyset，不用 OFFSET。
+
+-- LIKE 通配符转义（用户输入中的 % _ \ 按字面匹配）
+CREATE OR REPLACE FUNCTION public.escape_like(p_text TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT replace(replace(replace(p_text, '\', '\\'), '%', '\%'), '_', '\_');
+$$;
+
+-- 片段中的原文做 HTML 转义，只保留 <mark> 高亮标签
+CREATE OR REPLACE FUNCTION public.escape_html(p_text TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT replace(replace(replace(p_text, '&', '&amp;'), '<', '&lt;'), '>', '&gt;');
+$$;
+
+-- 正文片段：分词命中用 ts_headline；仅子串命中（如中文词语）时截取首个命中位置附近的文字
+CREATE OR REPLACE FUNCTION public.search_snippet(p_body TEXT, p_query TEXT)
+RETURNS TEXT
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_tsq TSQUERY := websearch_to_tsquery('simple', p_query);
+  v_pos INTEGER;
+  v_start INTEGER;
+BEGIN
+  IF p_body IS NULL OR p_body = '' THEN
+    RETURN '';
+  END IF;
+
+  IF to_tsvector('simple', p_body) @@ v_tsq THEN
+    RETURN ts_headline('simple', public.escape_html(p_body), v_tsq,
+      'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10, MaxFragments=2, FragmentDelimiter=" … "');
+  END IF;
+
+  v_pos := strpos(lower(p_body), lower(p_query));
+  IF v_pos = 0 THEN
+    RETURN public.escape_html(left(p_body, 120));
+  END IF;
+
+  v_start := greatest(v_pos - 40, 1);
+  RETURN CASE WHEN v_start > 1 THEN '…' ELSE '' END
+    || public.escape_html(substr(p_body, v_start, v_pos - v_start))
+    || '<mark>' || public.escape_html(substr(p_body, v_pos, length(p_query))) || '</mark>'
+    || public.escape_html(substr(p_body, v_pos + length(p_query), 80))
+    || CASE WHEN v_pos + length(p_query) + 80 <= length(p_body) THEN '…' ELSE '' END;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.search_records(
+  p_user_id UUID,
+  p_query TEXT,
+  p_form_type TEXT DEFAULT NULL,
+  p_date_from TIMESTAMPTZ DEFAULT NULL,
+  p_date_to TIMESTAMPTZ DEFAULT NULL,
+  p_limit INTEGER DEFAULT 20,
+  p_cursor_rank DOUBLE PRECISION DEFAULT NULL,
+  p_cursor_id BIGINT DEFAULT NULL
+)
+RETURNS TABLE (
+  record_id BIGINT,
+  resource_id BIGINT,
+  form_type VARCHAR,
+  title TEXT,
+  occurred_at TIMESTAMPTZ,
+  duration_min INTEGER,
+  rank DOUBLE PRECISION,
+  title_highlight TEXT,
+  snippet TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH matches AS (
+    SELECT
+      r.record_id, r.resource_id, r.form_type, r.title, r.body_md, r.occurred_at, r.duration_min,
+      (
+        ts_rank(to_tsvector('simple', coalesce(r.title, '') || ' ' || coalesce(r.body_md, '')),
+                websearch_to_tsquery('simple', p_query))
+        + similarity(r.title, p_query)
+        + CASE WHEN r.title ILIKE '%' || public.escape_like(p_query) || '%' THEN 0.5 ELSE 0 END
+      )::DOUBLE PRECISION AS rank
+    FROM public.records r
+    WHERE r.user_id = p_user_id
+      AND (
+        to_tsvector('simple', coalesce(r.title, '') || ' ' || coalesce(r.body_md, ''))
+          @@ websearch_to_tsquery('simple', p_query)
+        OR r.title ILIKE '%' || public.escape_like(p_query) || '%'
+        OR r.body_md ILIKE '%' || public.escape_like(p_query) || '%'
+      )
+      AND (p_form_type IS NULL OR r.form_type = p_form_type)
+      AND (p_date_from IS NULL OR r.occurred_at >= p_date_from)
+      AND (p_date_to IS NULL OR r.occurred_at < p_date_to)
+  ),
+  page AS (
+    SELECT m.*
+    FROM matches m
+    WHERE p_cursor_rank IS NULL OR (m.rank, m.record_id) < (p_cursor_rank, p_cursor_id)
+    ORDER BY m.rank DESC, m.record_id DESC
+    LIMIT p_limit
+  )
+  SELECT
+    page.record_id, page.resource_id, page.form_type, page.title, page.occurred_at, page.duration_min,
+    page.rank,
+    CASE
+      WHEN to_tsvector('simple', page.title) @@ websearch_to_tsquery('simple', p_query)
+        THEN ts_headline('simple', public.escape_html(page.title), websearch_to_tsquery('simple', p_query),
+                         'StartSel=<mark>, StopSel=</mark>, HighlightAll=true')
+      ELSE public.escape_html(page.title)
+    END,
+    public.search_snippet(page.body_md, p_query)
+  FROM page
+  ORDER BY page.rank DESC, page.record_id DESC;
+$$;
+
+COMMENT ON FUNCTION public.search_records IS '记录全文/子串搜索（排序 + 高亮片段 + keyset 分页）';
+
+REVOKE EXECUTE ON FUNCTION public.search_records(UUID, TEXT, TEXT, TIMESTAMPTZ, TIMESTAMPTZ, INTEGER, DOUBLE PRECISION, BIGINT)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.search_records(UUID, TEXT, TEXT, TIMESTAMPTZ, TIMESTAMPTZ, INTEGER, DOUBLE PRECISION, BIGINT)
+  TO service_role;
+
+-- 验证索引使用（在 SQL Editor 中以具体参数执行）:
+-- EXPLAIN (ANALYZE, BUFFERS)
+-- SELECT * FROM public.search_records('<user-uuid>', 'python', NULL, NULL, NULL, 20, NULL, NULL);
+-- 期望看到 BitmapOr 下的 idx_records_search_expr / idx_records_title_trgm / idx_records_body_trgm。
@@ -0,0 +1,344 @@
+-- Migration: Chinese word segmentation for record search
+-- Description: to_tsvector('simple', ...) 把一整段连续汉字当成一个词，中文只能退回 %like% 扫描。
+--              改为由后端在写入时用 jieba 分词（backend/app/services/segmentation.py），
+--              分好的词以空格分隔写入 records.search_text，数据库生成 search_tsv 并建 GIN 索引；
+--              查询侧用同一词典把关键词切分成 tsquery 传入 search_records。
+--
+-- 执行顺序：
+-- 1. 执行本迁移（ADD COLUMN ... STORED 会重写 records 表，请在低峰期执行）
+-- 2. 部署后端
+-- 3. 回填存量记录：python scripts/backfill_search_text.py
+--    回填完成前（以及后台分词任务处理之前），search_text 为空的记录仍按 013 的方式匹配
+--    （全文表达式 + 标题/正文子串），所以保留 idx_records_search_expr
+--    回填只写 search_text，不会改动记录的 updated_at
+
+ALTER TABLE public.records ADD COLUMN IF NOT EXISTS search_text TEXT;
+ALTER TABLE public.records ADD COLUMN IF NOT EXISTS search_tsv TSVECTOR
+  GENERATED ALWAYS AS (to_tsvector('simple', coalesce(search_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_records_search_tsv
+  ON public.records USING GIN (search_tsv);
+
+-- 整段表达式索引 idx_records_search_expr（001）保留：search_text 为空的记录仍由它与 trigram 索引匹配。
+-- 回填完成后可换成只覆盖未分词记录的部分索引，减少写入开销：
+--   DROP INDEX IF EXISTS public.idx_records_search_expr;
+--   CREATE INDEX idx_records_search_expr ON public.records
+--     USING GIN (to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(body_md, '')))
+--     WHERE search_text IS NULL;
+
+-- 行的用户可见内容：去掉派生列（分词 search_text/search_tsv）与簿记列（updated_at）。
+-- 触发器用它判断一次 UPDATE 是否真的改了用户数据；BEFORE 触发器中 NEW 的生成列尚未计算，也必须排除。
+-- 之后新增派生/簿记列的迁移在同一处重新定义本函数（016 加 excerpt，018 加 sync_version）
+CREATE OR REPLACE FUNCTION public.row_payload(p_row JSONB)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+  SELECT p_row - ARRAY['search_text', 'search_tsv', 'updated_at'];
+$$;
+
+-- 分词列是派生数据：只改了分词列（回填、重建索引）时不刷新用户可见的 updated_at
+CREATE OR REPLACE FUNCTION public.set_records_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF public.row_payload(to_jsonb(NEW)) IS DISTINCT FROM public.row_payload(to_jsonb(OLD)) THEN
+    NEW.updated_at = NOW();
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_records_updated ON public.records;
+CREATE TRIGGER trg_records_updated
+  BEFORE UPDATE ON public.records
+  FOR EACH ROW EXECUTE FUNCTION public.set_records_updated_at();
+
+-- 回填/重建分词结果，p_items: [{"record_id": 1, "search_text": "线性 代数 ..."}, ...]
+-- 分词结果没有变化的记录不写入（不产生行更新，也就不触发任何触发器）
+CREATE OR REPLACE FUNCTION public.set_record_search_text(p_items JSONB)
+RETURNS TABLE (updated INTEGER)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE public.records r
+  SET search_text = i.search_text
+  FROM jsonb_to_recordset(p_items) AS i(record_id BIGINT, search_text TEXT)
+  WHERE r.record_id = i.record_id
+    AND r.search_text IS DISTINCT FROM i.search_text;
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN NEXT;
+END;
+$$;
+
+-- 记录详情与创建记录的返回值不带分词列，其余与 009 / 011 相同
+CREATE OR REPLACE FUNCTION public.get_record_detail(p_user_id UUID, p_record_id BIGINT)
+RETURNS TABLE (detail JSONB)
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT (to_jsonb(r) - 'search_text' - 'search_tsv') || jsonb_build_object(
+    'resource', (
+      SELECT to_jsonb(res) FROM public.resources res
+      WHERE res.resource_id = r.resource_id
+    ),
+    'user_resource', (
+      SELECT to_jsonb(ur) FROM public.user_resources ur
+      WHERE ur.user_id = p_user_id AND ur.resource_id = r.resource_id
+    ),
+    'tags', COALESCE((
+      SELECT jsonb_agg(to_jsonb(t) ORDER BY t.tag_id)
+      FROM public.resource_tags rt
+      JOIN public.tags t ON t.tag_id = rt.tag_id
+      WHERE rt.user_id = p_user_id AND rt.resource_id = r.resource_id
+    ), '[]'::jsonb)
+  )
+  FROM public.records r
+  WHERE r.record_id = p_record_id AND r.user_id = p_user_id;
+$$;
+
+-- create_record_with_tags 写入后端分好的 search_text
+CREATE OR REPLACE FUNCTION public.create_record_with_tags(p_user_id UUID, p_payload JSONB)
+RETURNS TABLE (created_record JSONB)
+LANGUAGE plpgsql
+SET search_path = public
+AS $$
+DECLARE
+  v_record_data JSONB := p_payload -> 'record';
+  v_resource JSONB := NULLIF(p_payload -> 'resource', 'null'::jsonb);
+  v_user_resource JSONB := NULLIF(p_payload -> 'user_resource', 'null'::jsonb);
+  v_resource_id BIGINT := (p_payload ->> 'resource_id')::BIGINT;
+  v_tag_names TEXT[];
+  v_row public.records;
+BEGIN
+  IF NOT public.validate_form_type(p_user_id, v_record_data ->> 'form_type') THEN
+    RAISE EXCEPTION 'Invalid form_type ''%'' for user', v_record_data ->> 'form_type'
+      USING ERRCODE = '22023';
+  END IF;
+
+  IF v_resource_id IS NULL AND v_resource IS NOT NULL THEN
+    SELECT res.resource_id INTO v_resource_id
+    FROM public.resources res
+    WHERE res.title = v_resource ->> 'title'
+      AND res.type = (v_resource ->> 'type')::resource_type
+    LIMIT 1;
+
+    IF v_resource_id IS NULL THEN
+      INSERT INTO public.resources (type, title, author, url, platform, isbn, description, created_by)
+      VALUES (
+        (v_resource ->> 'type')::resource_type,
+        v_resource ->> 'title',
+        NULLIF(v_resource ->> 'author', ''),
+        NULLIF(v_resource ->> 'url', ''),
+        NULLIF(v_resource ->> 'platform', ''),
+        NULLIF(v_resource ->> 'isbn', ''),
+        NULLIF(v_resource ->> 'description', ''),
+        p_user_id
+      )
+      RETURNING resources.resource_id INTO v_resource_id;
+    END IF;
+  END IF;
+
+  INSERT INTO public.records (
+    user_id, resource_id, form_type, title, body_md, occurred_at,
+    duration_min, effective_duration_min, mood, difficulty, focus, energy, privacy, assets, search_text
+  )
+  VALUES (
+    p_user_id,
+    v_resource_id,
+    v_record_data ->> 'form_type',
+    v_record_data ->> 'title',
+    v_record_data ->> 'body_md',
+    COALESCE((v_record_data ->> 'occurred_at')::TIMESTAMPTZ, NOW()),
+    (v_record_data ->> 'duration_min')::INTEGER,
+    (v_record_data ->> 'effective_duration_min')::INTEGER,
+    v_record_data ->> 'mood',
+    (v_record_data ->> 'difficulty')::SMALLINT,
+    (v_record_data ->> 'focus')::SMALLINT,
+    (v_record_data ->> 'energy')::SMALLINT,
+    COALESCE(v_record_data ->> 'privacy', 'private')::privacy_level,
+    NULLIF(v_record_data -> 'assets', 'null'::jsonb),
+    v_record_data ->> 'search_text'
+  )
+  RETURNING * INTO v_row;
+
+  SELECT array_agg(n.tag) INTO v_tag_names
+  FROM jsonb_array_elements_text(COALESCE(p_payload -> 'tags', '[]'::jsonb)) AS n(tag);
+
+  IF v_resource_id IS NOT NULL AND v_tag_names IS NOT NULL THEN
+    PERFORM public.sync_resource_tags(p_user_id, v_resource_id, v_tag_names, FALSE);
+  END IF;
+
+  IF v_resource_id IS NOT NULL AND v_user_resource IS NOT NULL AND v_user_resource <> '{}'::jsonb THEN
+    INSERT INTO public.user_resources (user_id, resource_id, status, rating, review_short, is_favorite)
+    VALUES (
+      p_user_id,
+      v_resource_id,
+      COALESCE(v_user_resource ->> 'status', 'learning')::resource_status,
+      (v_user_resource ->> 'rating')::SMALLINT,
+      v_user_resource ->> 'review_short',
+      COALESCE((v_user_resource ->> 'is_favorite')::BOOLEAN, FALSE)
+    )
+    ON CONFLICT (user_id, resource_id) DO UPDATE SET
+      status = CASE WHEN v_user_resource ? 'status' THEN EXCLUDED.status ELSE user_resources.status END,
+      rating = CASE WHEN v_user_resource ? 'rating' THEN EXCLUDED.rating ELSE user_resources.rating END,
+      review_short = CASE WHEN v_user_resource ? 'review_short' THEN EXCLUDED.review_short ELSE user_resources.review_short END,
+      is_favorite = CASE WHEN v_user_resource ? 'is_favorite' THEN EXCLUDED.is_favorite ELSE user_resources.is_favorite END;
+  END IF;
+
+  RETURN QUERY
+  SELECT (to_jsonb(v_row) - 'search_text' - 'search_tsv') || jsonb_build_object('tags', COALESCE((
+    SELECT string_agg(t.tag_name, ',' ORDER BY t.tag_id)
+    FROM public.resource_tags rt
+    JOIN public.tags t ON t.tag_id = rt.tag_id
+    WHERE rt.user_id = p_user_id AND rt.resource_id = v_resource_id
+  ), ''));
+END;
+$$;
+
+-- 高亮：命中词包上 <mark>，其余原文做 HTML 转义（先用控制字符占位，避免转义后的实体被误匹配）
+CREATE OR REPLACE FUNCTION public.highlight_terms(p_text TEXT, p_terms TEXT[])
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT replace(replace(public.escape_html(
+    CASE
+      WHEN pattern.alternatives IS NULL THEN coalesce(p_text, '')
+      ELSE regexp_replace(coalesce(p_text, ''), '(' || pattern.alternatives || ')', chr(1) || '\1' || chr(2), 'gi')
+    END
+  ), chr(1), '<mark>'), chr(2), '</mark>')
+  FROM (
+    -- 长词优先，正则元字符转义
+    SELECT string_agg(regexp_replace(t, '([]^$*+?(){}|.[\\-])', '\\\1', 'g'), '|' ORDER BY length(t) DESC) AS alternatives
+    FROM unnest(p_terms) AS t
+    WHERE t <> ''
+  ) pattern;
+$$;
+
+-- 正文片段：截取首个命中词附近约160个字符并高亮
+CREATE OR REPLACE FUNCTION public.search_snippet(p_body TEXT, p_terms TEXT[])
+RETURNS TEXT
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+  v_pos INTEGER;
+  v_start INTEGER;
+BEGIN
+  IF p_body IS NULL OR p_body = '' THEN
+    RETURN '';
+  END IF;
+
+  SELECT min(strpos(lower(p_body), t)) INTO v_pos
+  FROM unnest(p_terms) AS t
+  WHERE t <> '' AND strpos(lower(p_body), t) > 0;
+
+  v_start := greatest(coalesce(v_pos, 1) - 40, 1);
+  RETURN CASE WHEN v_start > 1 THEN '…' ELSE '' END
+    || public.highlight_terms(substr(p_body, v_start, 160), p_terms)
+    || CASE WHEN v_start + 160 <= length(p_body) THEN '…' ELSE '' END;
+END;
+$$;
+
+-- search_records 改为匹配 search_tsv（p_ts_query 由后端分词生成，可为 NULL）；
+-- 标题子串匹配在关键词不少于3个字符（可用 trigram 索引）或包含中日韩文字时启用：
+-- 1~2 个汉字是最常见的中文关键词，jieba 对标题的切分不一定与关键词一致，不能只靠分词命中。
+-- search_text 为空（尚未回填/分词）的记录沿用 013 的匹配：全文表达式 + 标题/正文子串。
+-- 仍是可内联的 LANGUAGE sql STABLE 函数，规划器可组合 idx_records_search_tsv、idx_records_search_expr 与 trigram 索引。
+DROP FUNCTION IF EXISTS public.search_records(UUID, TEXT, TEXT, TIMESTAMPTZ, TIMESTAMPTZ, INTEGER, DOUBLE PRECISION, BIGINT);
+DROP FUNCTION IF EXISTS public.search_snippet(TEXT, TEXT);
+
+CREATE OR REPLACE FUNCTION public.search_records(
+  p_user_id UUID,
+  p_query TEXT,
+  p_ts_query TEXT,
+  p_terms TEXT[],
+  p_form_type TEXT DEFAULT NULL,
+  p_date_from TIMESTAMPTZ DEFAULT NULL,
+  p_date_to TIMESTAMPTZ DEFAULT NULL,
+  p_limit INTEGER DEFAULT 20,
+  p_cursor_rank DOUBLE PRECISION DEFAULT NULL,
+  p_cursor_id BIGINT DEFAULT NULL
+)
+RETURNS TABLE (
+  record_id BIGINT,
+  resource_id BIGINT,
+  form_type VARCHAR,
+  title TEXT,
+  occurred_at TIMESTAMPTZ,
+  duration_min INTEGER,
+  rank DOUBLE PRECISION,
+  title_highlight TEXT,
+  snippet TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+  WITH matches AS (
+    SELECT
+      r.record_id, r.resource_id, r.form_type, r.title, r.body_md, r.occurred_at, r.duration_min,
+      (
+        coalesce(ts_rank(r.search_tsv, to_tsquery('simple', p_ts_query)), 0)
+        + similarity(r.title, p_query)
+        + CASE WHEN r.title ILIKE '%' || public.escape_like(p_query) || '%' THEN 0.5 ELSE 0 END
+      )::DOUBLE PRECISION AS rank
+    FROM public.records r
+    WHERE r.user_id = p_user_id
+      AND (
+        r.search_tsv @@ to_tsquery('simple', p_ts_query)
+        OR (
+          (length(p_query) >= 3 OR p_query ~ '[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]')
+          AND r.title ILIKE '%' || public.escape_like(p_query) || '%'
+        )
+        OR (
+          r.search_text IS NULL
+          AND (
+            to_tsvector('simple', coalesce(r.title, '') || ' ' || coalesce(r.body_md, ''))
+              @@ websearch_to_tsquery('simple', p_query)
+            OR r.title ILIKE '%' || public.escape_like(p_query) || '%'
+            OR r.body_md ILIKE '%' || public.escape_like(p_query) || '%'
+          )
+        )
+      )
+      AND (p_form_type IS NULL OR r.form_type = p_form_type)
+      AND (p_date_from IS NULL OR r.occurred_at >= p_date_from)
+      AND (p_date_to IS NULL OR r.occurred_at < p_date_to)
+  ),
+  page AS (
+    SELECT m.*
+    FROM matches m
+    WHERE p_cursor_rank IS NULL OR (m.rank, m.record_id) < (p_cursor_rank, p_cursor_id)
+    ORDER BY m.rank DESC, m.record_id DESC
+    LIMIT p_limit
+  )
+  SELECT
+    page.record_id, page.resource_id, page.form_type, page.title, page.occurred_at, page.duration_min,
+    page.rank,
+    public.highlight_terms(page.title, p_terms),
+    public.search_snippet(page.body_md, p_terms)
+  FROM page
+  ORDER BY page.rank DESC, page.record_id DESC;
+$$;
+
+COMMENT ON FUNCTION public.set_record_search_text IS '批量写入记录的分词结果（回填用）';
+COMMENT ON FUNCTION public.search_records IS '记录分词全文/标题子串搜索，未分词记录按全文表达式/子串匹配（排序 + 高亮片段 + keyset 分页）';
+
+REVOKE EXECUTE ON FUNCTION public.set_record_search_text(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.search_records(UUID, TEXT, TEXT, TEXT[], TEXT, TIMESTAMPTZ, TIMESTAMPTZ, INTEGER, DOUBLE PRECISION, BIGINT)
+  FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.set_record_search_text(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION public.search_records(UUID, TEXT, TEXT, TEXT[], TEXT, TIMESTAMPTZ, TIMESTAMPTZ, INTEGER, DOUBLE PRECISION, BIGINT)
+  TO service_role;
+
+-- 验证索引使用（在 SQL Editor 中以具体参数执行）:
+-- EXPLAIN (ANALYZE, BUFFERS)
+-- SELECT * FROM public.search_records('<user-uuid>', '线性代数', '''线性代数'' | (''线性'' & ''代数'')',
+--                                     ARRAY['线性代数', '线性', '代数'], NULL, NULL, NULL, 20, NULL, NULL);
+-- 期望看到 Bitmap Index Scan on idx_records_search_tsv，与 idx_records_search_expr / trigram 索引组成 BitmapOr
+-- （1~2 个汉字的标题子串用不上 trigram 索引，按 user_id 范围内过滤）。
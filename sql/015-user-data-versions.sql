@@ -0,0 +1,149 @@
+-- Migration: Per-user data version counters
+-- Description: 每个用户一个单调递增的数据版本号。用户的记录、模板、学习形式、标签、资源关系、资料
+--              任何一次写入都会在同一事务内把版本号 +1（UPDATE 只在用户可见内容确实变化时计数）。
+--              读接口用 (版本号, 请求参数) 计算 ETag，If-None-Match 命中时只查这一行就返回 304，
+--              不再执行列表/汇总查询（见 backend/app/core/http_cache.py）。
+--
+-- 触发器是语句级的（REFERENCING 过渡表），批量写入 N 行也只更新每个用户的版本行一次。
+
+CREATE TABLE IF NOT EXISTS public.user_data_versions (
+  user_id UUID PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE public.user_data_versions ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "user_data_versions_owner_read" ON public.user_data_versions;
+CREATE POLICY "user_data_versions_owner_read"
+  ON public.user_data_versions
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+CREATE OR REPLACE FUNCTION public.bump_user_data_versions(p_user_ids UUID[])
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  -- 去重并按 user_id 排序加锁，避免并发事务互相死锁
+  INSERT INTO public.user_data_versions (user_id, version, updated_at)
+  SELECT DISTINCT u.user_id, 1, NOW()
+  FROM unnest(p_user_ids) AS u(user_id)
+  WHERE u.user_id IS NOT NULL
+    -- 删除用户时级联删除其数据，此时不能再插入版本行
+    AND EXISTS (SELECT 1 FROM auth.users au WHERE au.id = u.user_id)
+  ORDER BY u.user_id
+  ON CONFLICT (user_id) DO UPDATE
+    SET version = user_data_versions.version + 1,
+        updated_at = NOW();
+$$;
+
+-- 带 user_id 列的表：受影响行的 user_id
+CREATE OR REPLACE FUNCTION public.trg_bump_user_data_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM public.bump_user_data_versions(ARRAY(SELECT n.user_id FROM new_rows n));
+  ELSIF TG_OP = 'UPDATE' THEN
+    -- 只有用户可见内容（row_payload，见 sql/014）变化的行才推进版本：
+    -- 无变化的 UPDATE、分词回填、updated_at / sync_version 等簿记写入都不会让 ETag 失效。
+    -- 新旧两侧求对称差，改了 user_id 的行两个用户都会推进
+    PERFORM public.bump_user_data_versions(ARRAY(
+      SELECT (c.payload ->> 'user_id')::UUID
+      FROM (
+        (SELECT public.row_payload(to_jsonb(n)) FROM new_rows n
+         EXCEPT
+         SELECT public.row_payload(to_jsonb(o)) FROM old_rows o)
+        UNION
+        (SELECT public.row_payload(to_jsonb(o)) FROM old_rows o
+         EXCEPT
+         SELECT public.row_payload(to_jsonb(n)) FROM new_rows n)
+      ) AS c(payload)
+    ));
+  ELSE
+    PERFORM public.bump_user_data_versions(ARRAY(SELECT o.user_id FROM old_rows o));
+  END IF;
+  RETURN NULL;
+END;
+$$;
+
+-- 资源是共享的：资源信息变化时，记录或资源关系引用了它的用户都要失效
+CREATE OR REPLACE FUNCTION public.trg_bump_resource_users_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  PERFORM public.bump_user_data_versions(ARRAY(
+    SELECT r.user_id FROM public.records r JOIN new_rows n ON n.resource_id = r.resource_id
+    UNION
+    SELECT ur.user_id FROM public.user_resources ur JOIN new_rows n ON n.resource_id = ur.resource_id
+  ));
+  RETURN NULL;
+END;
+$$;
+
+-- 标签改名：给资源打了这个标签的用户都要失效
+CREATE OR REPLACE FUNCTION public.trg_bump_tag_users_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  PERFORM public.bump_user_data_versions(ARRAY(
+    SELECT rt.user_id FROM public.resource_tags rt JOIN new_rows n ON n.tag_id = rt.tag_id
+  ));
+  RETURN NULL;
+END;
+$$;
+
+-- 过渡表触发器只能监听单一事件，每张表按 INSERT / UPDATE / DELETE 各建一个
+DO $$
+DECLARE
+  v_table TEXT;
+BEGIN
+  FOREACH v_table IN ARRAY ARRAY['records', 'record_templates', 'user_form_types', 'resource_tags', 'user_resources', 'profiles']
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_version_ins ON public.%1$I', v_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_version_upd ON public.%1$I', v_table);
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_version_del ON public.%1$I', v_table);
+
+    EXECUTE format(
+      'CREATE TRIGGER trg_%1$s_version_ins AFTER INSERT ON public.%1$I
+         REFERENCING NEW TABLE AS new_rows
+         FOR EACH STATEMENT EXECUTE FUNCTION public.trg_bump_user_data_version()', v_table);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%1$s_version_upd AFTER UPDATE ON public.%1$I
+         REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+         FOR EACH STATEMENT EXECUTE FUNCTION public.trg_bump_user_data_version()', v_table);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%1$s_version_del AFTER DELETE ON public.%1$I
+         REFERENCING OLD TABLE AS old_rows
+         FOR EACH STATEMENT EXECUTE FUNCTION public.trg_bump_user_data_version()', v_table);
+  END LOOP;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_resources_version_upd ON public.resources;
+CREATE TRIGGER trg_resources_version_upd
+  AFTER UPDATE ON public.resources
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_bump_resource_users_version();
+
+DROP TRIGGER IF EXISTS trg_tags_version_upd ON public.tags;
+CREATE TRIGGER trg_tags_version_upd
+  AFTER UPDATE ON public.tags
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_bump_tag_users_version();
+
+COMMENT ON TABLE public.user_data_versions IS '用户数据版本号（任一用户数据写入即 +1，用于 ETag / 304）';
+
+REVOKE EXECUTE ON FUNCTION public.bump_user_data_versions(UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.bump_user_data_versions(UUID[]) TO service_role;
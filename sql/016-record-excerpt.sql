@@ -0,0 +1,28 @@
+-- Migration: Precomputed record excerpt for lean list payloads
+-- Description: 记录列表默认不再返回完整的 body_md / assets，只带一段纯文本摘要。
+--              excerpt 由数据库从 body_md 生成（去掉 Markdown 标记与多余空白，保留链接文字，前 120 个字符），
+--              写入时计算一次，列表查询直接读取。
+--              ADD COLUMN ... STORED 会重写 records 表，请在低峰期执行。
+
+ALTER TABLE public.records ADD COLUMN IF NOT EXISTS excerpt TEXT
+  GENERATED ALWAYS AS (
+    left(
+      btrim(regexp_replace(
+        regexp_replace(coalesce(body_md, ''), '!?\[([^\]]*)\]\([^)]*\)', '\1', 'g'),
+        '[\s#>*`_~|]+', ' ', 'g'
+      )),
+      120
+    )
+  ) STORED;
+
+COMMENT ON COLUMN public.records.excerpt IS '正文纯文本摘要（前120字，列表接口使用）';
+
+-- excerpt 是派生列，不算用户可见内容的变化（row_payload 见 sql/014）
+CREATE OR REPLACE FUNCTION public.row_payload(p_row JSONB)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+  SELECT p_row - ARRAY['search_text', 'search_tsv', 'updated_at', 'excerpt'];
+$$;
@@ -0,0 +1,208 @@
+-- Migration: Incremental user_resources totals
+-- Description: user_resources.total_duration_min（累计时长）与 last_interaction_at（最后学习时间）
+--              由 records 上的触发器增量维护：新增/删除记录、修改时长/发生时间/关联资源时，
+--              在同一事务内把差值累加到对应的 (user_id, resource_id) 行，不再需要 SUM 聚合查询。
+--              记录关联了资源而用户还没有这条用户-资源关系时自动创建（状态默认 learning）。
+--
+--              触发器是语句级的（REFERENCING 过渡表），批量导入 N 条记录时每个 (用户, 资源) 只更新一次。
+--              只有删除/移走的记录恰好是最后一次学习时，才按索引重新取 max(occurred_at)。
+--
+--              已有数据执行一次 scripts/reconcile_user_resource_totals.py 按用户分批重算；
+--              之后也可以随时执行该脚本校对。
+
+-- 触发器重算 last_interaction_at 与对账脚本按 (user_id, resource_id) 聚合时使用
+CREATE INDEX IF NOT EXISTS idx_records_user_resource_time
+  ON public.records (user_id, resource_id, occurred_at DESC);
+
+-- “学得最多的资源”：按累计时长倒序直接走索引
+CREATE INDEX IF NOT EXISTS idx_user_resources_user_duration
+  ON public.user_resources (user_id, total_duration_min DESC);
+
+-- 把记录变化（sign = 1 新值 / -1 旧值）汇总到 user_resources
+CREATE OR REPLACE FUNCTION public.apply_user_resource_changes(p_changes JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_changes IS NULL THEN
+    RETURN;
+  END IF;
+
+  -- 新关联的资源先补齐关系行（并发插入时 DO NOTHING 会等待对方提交，随后的 UPDATE 一定能命中）
+  INSERT INTO public.user_resources (user_id, resource_id)
+  SELECT DISTINCT c.user_id, c.resource_id
+  FROM jsonb_to_recordset(p_changes) AS c(user_id UUID, resource_id BIGINT, sign INTEGER)
+  WHERE c.sign = 1
+  ORDER BY c.user_id, c.resource_id
+  ON CONFLICT (user_id, resource_id) DO NOTHING;
+
+  WITH ch AS (
+    SELECT
+      c.user_id,
+      c.resource_id,
+      SUM(c.sign * c.duration) AS delta,
+      MAX(c.occurred_at) FILTER (WHERE c.sign = 1) AS new_last,
+      MAX(c.occurred_at) FILTER (WHERE c.sign = -1) AS old_last
+    FROM jsonb_to_recordset(p_changes)
+      AS c(user_id UUID, resource_id BIGINT, duration INTEGER, occurred_at TIMESTAMPTZ, sign INTEGER)
+    GROUP BY c.user_id, c.resource_id
+  )
+  UPDATE public.user_resources ur SET
+    total_duration_min = GREATEST(ur.total_duration_min + ch.delta, 0),
+    last_interaction_at = CASE
+      -- 移走的记录可能就是最后一次学习：按索引重新取（AFTER 触发器里已是本语句执行后的数据）
+      WHEN ch.old_last >= ur.last_interaction_at THEN (
+        SELECT MAX(r.occurred_at)
+        FROM public.records r
+        WHERE r.user_id = ch.user_id AND r.resource_id = ch.resource_id
+      )
+      ELSE GREATEST(ur.last_interaction_at, ch.new_last)
+    END
+  FROM ch
+  WHERE ur.user_id = ch.user_id
+    AND ur.resource_id = ch.resource_id
+    AND (
+      ch.delta <> 0
+      OR ch.old_last >= ur.last_interaction_at
+      OR ch.new_last > COALESCE(ur.last_interaction_at, '-infinity')
+    );
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_records_user_resource_totals()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_changes JSONB;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT jsonb_agg(jsonb_build_object(
+      'user_id', n.user_id, 'resource_id', n.resource_id,
+      'duration', COALESCE(n.duration_min, 0), 'occurred_at', n.occurred_at, 'sign', 1
+    ))
+    INTO v_changes
+    FROM new_rows n
+    WHERE n.resource_id IS NOT NULL;
+  ELSIF TG_OP = 'UPDATE' THEN
+    -- 只处理影响统计的列发生变化的记录（改标题/正文/分词列时不做任何写入）
+    SELECT jsonb_agg(c.change)
+    INTO v_changes
+    FROM old_rows o
+    JOIN new_rows n ON n.record_id = o.record_id
+    CROSS JOIN LATERAL (VALUES
+      (o.resource_id, jsonb_build_object(
+        'user_id', o.user_id, 'resource_id', o.resource_id,
+        'duration', COALESCE(o.duration_min, 0), 'occurred_at', o.occurred_at, 'sign', -1
+      )),
+      (n.resource_id, jsonb_build_object(
+        'user_id', n.user_id, 'resource_id', n.resource_id,
+        'duration', COALESCE(n.duration_min, 0), 'occurred_at', n.occurred_at, 'sign', 1
+      ))
+    ) AS c(resource_id, change)
+    WHERE c.resource_id IS NOT NULL
+      AND (o.user_id, o.resource_id, o.duration_min, o.occurred_at)
+          IS DISTINCT FROM (n.user_id, n.resource_id, n.duration_min, n.occurred_at);
+  ELSE
+    SELECT jsonb_agg(jsonb_build_object(
+      'user_id', o.user_id, 'resource_id', o.resource_id,
+      'duration', COALESCE(o.duration_min, 0), 'occurred_at', o.occurred_at, 'sign', -1
+    ))
+    INTO v_changes
+    FROM old_rows o
+    WHERE o.resource_id IS NOT NULL;
+  END IF;
+
+  PERFORM public.apply_user_resource_changes(v_changes);
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_records_user_resource_totals_ins ON public.records;
+CREATE TRIGGER trg_records_user_resource_totals_ins
+  AFTER INSERT ON public.records
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_records_user_resource_totals();
+
+DROP TRIGGER IF EXISTS trg_records_user_resource_totals_upd ON public.records;
+CREATE TRIGGER trg_records_user_resource_totals_upd
+  AFTER UPDATE ON public.records
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_records_user_resource_totals();
+
+DROP TRIGGER IF EXISTS trg_records_user_resource_totals_del ON public.records;
+CREATE TRIGGER trg_records_user_resource_totals_del
+  AFTER DELETE ON public.records
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_records_user_resource_totals();
+
+-- 对账：按 user_id 顺序取下一批用户，补齐缺失的关系行并按 records 重算两列，只写入有差异的行
+CREATE OR REPLACE FUNCTION public.reconcile_user_resource_totals(
+  p_after_user_id UUID DEFAULT NULL,
+  p_limit INTEGER DEFAULT 200
+)
+RETURNS TABLE(last_user_id UUID, users INTEGER, updated INTEGER)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  v_user_ids UUID[];
+  v_updated INTEGER;
+BEGIN
+  SELECT array_agg(u.id ORDER BY u.id)
+  INTO v_user_ids
+  FROM (
+    SELECT au.id
+    FROM auth.users au
+    WHERE p_after_user_id IS NULL OR au.id > p_after_user_id
+    ORDER BY au.id
+    LIMIT p_limit
+  ) u;
+
+  IF v_user_ids IS NULL THEN
+    RETURN QUERY SELECT NULL::UUID, 0, 0;
+    RETURN;
+  END IF;
+
+  INSERT INTO public.user_resources (user_id, resource_id)
+  SELECT DISTINCT r.user_id, r.resource_id
+  FROM public.records r
+  WHERE r.user_id = ANY(v_user_ids) AND r.resource_id IS NOT NULL
+  ORDER BY r.user_id, r.resource_id
+  ON CONFLICT (user_id, resource_id) DO NOTHING;
+
+  UPDATE public.user_resources ur SET
+    total_duration_min = t.total_duration_min,
+    last_interaction_at = t.last_interaction_at
+  FROM (
+    SELECT
+      ur2.user_resource_id,
+      COALESCE(SUM(r.duration_min), 0)::INTEGER AS total_duration_min,
+      MAX(r.occurred_at) AS last_interaction_at
+    FROM public.user_resources ur2
+    LEFT JOIN public.records r ON r.user_id = ur2.user_id AND r.resource_id = ur2.resource_id
+    WHERE ur2.user_id = ANY(v_user_ids)
+    GROUP BY ur2.user_resource_id
+  ) t
+  WHERE ur.user_resource_id = t.user_resource_id
+    AND (ur.total_duration_min, ur.last_interaction_at)
+        IS DISTINCT FROM (t.total_duration_min, t.last_interaction_at);
+
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+
+  RETURN QUERY SELECT v_user_ids[array_length(v_user_ids, 1)], array_length(v_user_ids, 1), v_updated;
+END;
+$$;
+
+COMMENT ON COLUMN public.user_resources.total_duration_min IS '累计学习时长（分钟，由 records 触发器增量维护）';
+COMMENT ON COLUMN public.user_resources.last_interaction_at IS '最后一条记录的发生时间（由 records 触发器增量维护）';
+
+REVOKE EXECUTE ON FUNCTION public.apply_user_resource_changes(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.reconcile_user_resource_totals(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.reconcile_user_resource_totals(UUID, INTEGER) TO service_role;
@@ -0,0 +1,332 @@
+-- Migration: Delta sync (sync_version + tombstones)
+-- Description: 前端 IndexedDB 缓存的增量同步（GET /api/v1/sync，见 backend/app/api/sync.py）。
+--              records / record_templates / user_form_types / resource_tags 每一行带 sync_version：
+--              插入或更新时由 BEFORE 触发器写入该用户下一个数据版本号（sql/015 的 user_data_versions）；
+--              只改了派生列（search_text 等）的更新不重新取号。
+--              删除写入 sync_tombstones（墓碑），同样带版本号。
+--              客户端保存上次同步到的版本号，下次只取 sync_version 大于它的行和墓碑。
+--
+--              取号时对用户的版本行加行锁（FOR UPDATE），锁持有到事务提交：
+--              同一用户的写事务按提交顺序拿到递增的版本号，读到已提交版本 V 时，版本号 ≤ V 的行一定都已提交，
+--              “sync_version ≤ V 的行” 就是一份一致的快照，不会漏掉并发事务晚提交的行。
+--
+--              墓碑只保留一段时间（prune_sync_tombstones）；清理过的版本记在 user_data_versions.tombstone_floor，
+--              更早的同步令牌会被要求全量重新同步。
+--              新增 sync_version 列（带常量默认值）只改元数据，不重写表；已有行的版本为 0，随全量同步下发。
+
+ALTER TABLE public.user_data_versions
+  ADD COLUMN IF NOT EXISTS tombstone_floor BIGINT NOT NULL DEFAULT 0;
+
+ALTER TABLE public.records ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE public.record_templates ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE public.user_form_types ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE public.resource_tags ADD COLUMN IF NOT EXISTS sync_version BIGINT NOT NULL DEFAULT 0;
+
+-- sync_version 是簿记列，不算用户可见内容的变化（row_payload 见 sql/014、016）
+CREATE OR REPLACE FUNCTION public.row_payload(p_row JSONB)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+  SELECT p_row - ARRAY['search_text', 'search_tsv', 'updated_at', 'excerpt', 'sync_version'];
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_records_user_sync
+  ON public.records (user_id, sync_version, record_id);
+CREATE INDEX IF NOT EXISTS idx_record_templates_user_sync
+  ON public.record_templates (user_id, sync_version);
+CREATE INDEX IF NOT EXISTS idx_user_form_types_user_sync
+  ON public.user_form_types (user_id, sync_version);
+CREATE INDEX IF NOT EXISTS idx_resource_tags_user_sync
+  ON public.resource_tags (user_id, sync_version);
+
+CREATE TABLE IF NOT EXISTS public.sync_tombstones (
+  tombstone_id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  entity TEXT NOT NULL,              -- records / templates / form_types / tags
+  entity_id BIGINT NOT NULL,         -- 被删除行的主键
+  sync_version BIGINT NOT NULL,
+  deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_user_sync
+  ON public.sync_tombstones (user_id, sync_version);
+CREATE INDEX IF NOT EXISTS idx_sync_tombstones_deleted_at
+  ON public.sync_tombstones (deleted_at);
+
+ALTER TABLE public.sync_tombstones ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "sync_tombstones_owner_read" ON public.sync_tombstones;
+CREATE POLICY "sync_tombstones_owner_read"
+  ON public.sync_tombstones
+  FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- 用户的下一个版本号：锁住版本行，返回 version + 1（本语句结束时版本触发器会把 version 推进到 ≥ 该值）
+CREATE OR REPLACE FUNCTION public.next_sync_version(p_user_id UUID)
+RETURNS BIGINT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_version BIGINT;
+BEGIN
+  SELECT version INTO v_version
+  FROM public.user_data_versions
+  WHERE user_id = p_user_id
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    INSERT INTO public.user_data_versions (user_id, version)
+    VALUES (p_user_id, 0)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    SELECT version INTO v_version
+    FROM public.user_data_versions
+    WHERE user_id = p_user_id
+    FOR UPDATE;
+  END IF;
+
+  RETURN v_version + 1;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_stamp_sync_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  -- 同步内容（row_payload，见上）没有变化的 UPDATE 保留原版本号：
+  -- 分词回填、无变化的更新不会让客户端重新下载这些行（与 sql/015 只在内容变化时推进版本号一致）
+  IF TG_OP = 'UPDATE' AND public.row_payload(to_jsonb(NEW)) IS NOT DISTINCT FROM public.row_payload(to_jsonb(OLD)) THEN
+    NEW.sync_version := OLD.sync_version;
+    RETURN NEW;
+  END IF;
+
+  NEW.sync_version := public.next_sync_version(NEW.user_id);
+  RETURN NEW;
+END;
+$$;
+
+-- TG_ARGV[0]：墓碑里的实体名；TG_ARGV[1]：主键列名
+CREATE OR REPLACE FUNCTION public.trg_record_sync_tombstones()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_user_ids UUID[];
+BEGIN
+  -- 删除用户时级联删除的数据不需要墓碑
+  SELECT array_agg(DISTINCT o.user_id ORDER BY o.user_id)
+  INTO v_user_ids
+  FROM old_rows o
+  WHERE EXISTS (SELECT 1 FROM auth.users au WHERE au.id = o.user_id);
+
+  IF v_user_ids IS NULL THEN
+    RETURN NULL;
+  END IF;
+
+  INSERT INTO public.sync_tombstones (user_id, entity, entity_id, sync_version)
+  SELECT o.user_id, TG_ARGV[0], (to_jsonb(o) ->> TG_ARGV[1])::BIGINT, v.sync_version
+  FROM old_rows o
+  JOIN (
+    SELECT u.user_id, public.next_sync_version(u.user_id) AS sync_version
+    FROM unnest(v_user_ids) AS u(user_id)
+  ) v ON v.user_id = o.user_id;
+
+  -- 不依赖触发器执行顺序：这里自己推进版本号，保证已提交版本 ≥ 墓碑版本
+  PERFORM public.bump_user_data_versions(v_user_ids);
+  RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+  v_table TEXT;
+  v_entity TEXT;
+  v_key TEXT;
+BEGIN
+  FOR v_table, v_entity, v_key IN
+    SELECT * FROM (VALUES
+      ('records', 'records', 'record_id'),
+      ('record_templates', 'templates', 'template_id'),
+      ('user_form_types', 'form_types', 'type_id'),
+      ('resource_tags', 'tags', 'resource_tag_id')
+    ) AS t(table_name, entity, key_column)
+  LOOP
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_sync_stamp ON public.%1$I', v_table);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%1$s_sync_stamp BEFORE INSERT OR UPDATE ON public.%1$I
+         FOR EACH ROW EXECUTE FUNCTION public.trg_stamp_sync_version()', v_table);
+
+    EXECUTE format('DROP TRIGGER IF EXISTS trg_%1$s_sync_del ON public.%1$I', v_table);
+    EXECUTE format(
+      'CREATE TRIGGER trg_%1$s_sync_del AFTER DELETE ON public.%1$I
+         REFERENCING OLD TABLE AS old_rows
+         FOR EACH STATEMENT EXECUTE FUNCTION public.trg_record_sync_tombstones(%2$L, %3$L)',
+      v_table, v_entity, v_key);
+  END LOOP;
+END;
+$$;
+
+-- 增量同步：p_since 为空时全量；records 按 (sync_version, record_id) 分页，其余实体与墓碑在第一页一次返回
+CREATE OR REPLACE FUNCTION public.sync_changes(
+  p_user_id UUID,
+  p_since BIGINT DEFAULT NULL,
+  p_until BIGINT DEFAULT NULL,
+  p_after_version BIGINT DEFAULT NULL,
+  p_after_id BIGINT DEFAULT NULL,
+  p_limit INTEGER DEFAULT 500
+)
+RETURNS TABLE(
+  version BIGINT,
+  full_sync BOOLEAN,
+  records JSONB,
+  templates JSONB,
+  form_types JSONB,
+  tags JSONB,
+  deleted JSONB,
+  has_more BOOLEAN
+)
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  v_until BIGINT := p_until;
+  v_since BIGINT := p_since;
+  v_floor BIGINT;
+  v_first_page BOOLEAN := p_after_version IS NULL;
+  v_records JSONB;
+  v_has_more BOOLEAN;
+BEGIN
+  -- 先读版本号再读数据：读数据期间提交的新行版本号更大，本次不返回，下次同步再取
+  SELECT udv.version, udv.tombstone_floor INTO v_until, v_floor
+  FROM public.user_data_versions udv
+  WHERE udv.user_id = p_user_id;
+  v_until := COALESCE(p_until, v_until, 0);
+  v_floor := COALESCE(v_floor, 0);
+
+  -- 令牌早于已清理的墓碑，或来自别的数据状态（比当前版本还新）：全量重新同步
+  IF v_since IS NOT NULL AND (v_since < v_floor OR v_since > v_until) THEN
+    v_since := NULL;
+  END IF;
+
+  SELECT
+    COALESCE(jsonb_agg(to_jsonb(r) - 'search_text' - 'search_tsv' - 'rn' ORDER BY r.sync_version, r.record_id)
+      FILTER (WHERE r.rn <= p_limit), '[]'::jsonb),
+    COUNT(*) > p_limit
+  INTO v_records, v_has_more
+  FROM (
+    SELECT rec.*, row_number() OVER (ORDER BY rec.sync_version, rec.record_id) AS rn
+    FROM public.records rec
+    WHERE rec.user_id = p_user_id
+      AND rec.sync_version <= v_until
+      AND (v_since IS NULL OR rec.sync_version > v_since)
+      AND (v_first_page OR (rec.sync_version, rec.record_id) > (p_after_version, p_after_id))
+    ORDER BY rec.sync_version, rec.record_id
+    LIMIT p_limit + 1
+  ) r;
+
+  IF NOT v_first_page THEN
+    RETURN QUERY SELECT v_until, v_since IS NULL, v_records, NULL::JSONB, NULL::JSONB, NULL::JSONB, NULL::JSONB, v_has_more;
+    RETURN;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    v_until,
+    v_since IS NULL,
+    v_records,
+    COALESCE((
+      SELECT jsonb_agg(to_jsonb(t) ORDER BY t.template_id)
+      FROM public.record_templates t
+      WHERE t.user_id = p_user_id
+        AND t.sync_version <= v_until
+        AND (v_since IS NULL OR t.sync_version > v_since)
+    ), '[]'::jsonb),
+    COALESCE((
+      SELECT jsonb_agg(to_jsonb(f) ORDER BY f.display_order, f.type_id)
+      FROM public.user_form_types f
+      WHERE f.user_id = p_user_id
+        AND f.sync_version <= v_until
+        AND (v_since IS NULL OR f.sync_version > v_since)
+    ), '[]'::jsonb),
+    COALESCE((
+      SELECT jsonb_agg(jsonb_build_object(
+        'resource_tag_id', rt.resource_tag_id,
+        'resource_id', rt.resource_id,
+        'tag_id', rt.tag_id,
+        'tag_name', tg.tag_name,
+        'sync_version', rt.sync_version
+      ) ORDER BY rt.resource_tag_id)
+      FROM public.resource_tags rt
+      JOIN public.tags tg ON tg.tag_id = rt.tag_id
+      WHERE rt.user_id = p_user_id
+        AND rt.sync_version <= v_until
+        AND (v_since IS NULL OR rt.sync_version > v_since)
+    ), '[]'::jsonb),
+    -- 全量同步时客户端整体替换缓存，不需要墓碑
+    CASE WHEN v_since IS NULL THEN '{}'::jsonb ELSE COALESCE((
+      SELECT jsonb_object_agg(d.entity, d.ids)
+      FROM (
+        SELECT st.entity, jsonb_agg(DISTINCT st.entity_id) AS ids
+        FROM public.sync_tombstones st
+        WHERE st.user_id = p_user_id
+          AND st.sync_version > v_since
+          AND st.sync_version <= v_until
+        GROUP BY st.entity
+      ) d
+    ), '{}'::jsonb) END,
+    v_has_more;
+END;
+$$;
+
+-- 清理早于 p_keep 的墓碑，并记下每个用户被清理到的版本号（持有更早令牌的客户端改为全量同步）
+CREATE OR REPLACE FUNCTION public.prune_sync_tombstones(p_keep INTERVAL DEFAULT INTERVAL '90 days')
+RETURNS TABLE(deleted INTEGER)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  v_deleted INTEGER;
+BEGIN
+  WITH pruned AS (
+    DELETE FROM public.sync_tombstones st
+    WHERE st.deleted_at < NOW() - p_keep
+    RETURNING st.user_id, st.sync_version
+  ), floors AS (
+    SELECT p.user_id, MAX(p.sync_version) AS floor, COUNT(*) AS n
+    FROM pruned p
+    GROUP BY p.user_id
+  ), updated AS (
+    UPDATE public.user_data_versions udv
+    SET tombstone_floor = GREATEST(udv.tombstone_floor, f.floor)
+    FROM floors f
+    WHERE udv.user_id = f.user_id
+    RETURNING f.n
+  )
+  SELECT COALESCE(SUM(f.n), 0)::INTEGER INTO v_deleted FROM floors f;
+
+  RETURN QUERY SELECT v_deleted;
+END;
+$$;
+
+COMMENT ON TABLE public.sync_tombstones IS '增量同步的删除记录（墓碑），按 prune_sync_tombstones 定期清理';
+COMMENT ON COLUMN public.user_data_versions.tombstone_floor IS '已清理墓碑的最大版本号，更早的同步令牌需全量同步';
+
+REVOKE EXECUTE ON FUNCTION public.next_sync_version(UUID) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.sync_changes(UUID, BIGINT, BIGINT, BIGINT, BIGINT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.sync_changes(UUID, BIGINT, BIGINT, BIGINT, BIGINT, INTEGER) TO service_role;
+REVOKE EXECUTE ON FUNCTION public.prune_sync_tombstones(INTERVAL) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.prune_sync_tombstones(INTERVAL) TO service_role;
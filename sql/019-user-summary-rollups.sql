@@ -0,0 +1,299 @@
+-- Migration: Incremental user_summaries rollups
+-- Description: user_summaries 的 daily / weekly / monthly 行由 records 上的触发器维护，
+--              首页仪表盘与 /stats 直接读取对应天数的 daily 行，不再聚合原始 records。
+--
+--              metrics 结构（三种周期相同）：
+--                {count, minutes, days, difficulty_sum, difficulty_count, focus_sum, focus_count,
+--                 form_types: {<form_type>: {count, minutes}}}
+--              days 为有记录的天数（daily 行恒为 1）；平均分 = *_sum / *_count（跳过未填写的记录）。
+--
+--              日期按本地时区（Asia/Shanghai，与 backend USER_TIMEZONE 一致）划分；
+--              触发器是语句级的，只重算受影响的 (用户, 日期)：当天的记录按 idx_records_user_time 范围扫描聚合，
+--              所在的周、月再由当天所在周期的 daily 行（最多 31 行）汇总。
+--              某个周期没有记录时删除该行（已有 summary_md 的行只清空 metrics）。
+--
+--              已有数据执行一次 scripts/backfill_user_summaries.py 按用户分批重建；之后也可以随时执行该脚本校对。
+
+-- 本地日期（时区必须与 backend 的 USER_TIMEZONE 一致）
+CREATE OR REPLACE FUNCTION public.summary_local_date(p_ts TIMESTAMPTZ)
+RETURNS DATE
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+  SELECT (p_ts AT TIME ZONE 'Asia/Shanghai')::DATE;
+$$;
+
+-- 一天的指标：按本地日期的 UTC 边界范围扫描 records；没有记录时返回 NULL
+CREATE OR REPLACE FUNCTION public.build_daily_summary_metrics(p_user_id UUID, p_day DATE)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  SELECT CASE WHEN COUNT(*) = 0 THEN NULL ELSE jsonb_build_object(
+    'count', SUM(t.count),
+    'minutes', SUM(t.minutes),
+    'days', 1,
+    'difficulty_sum', SUM(t.difficulty_sum),
+    'difficulty_count', SUM(t.difficulty_count),
+    'focus_sum', SUM(t.focus_sum),
+    'focus_count', SUM(t.focus_count),
+    'form_types', jsonb_object_agg(t.form_type, jsonb_build_object('count', t.count, 'minutes', t.minutes))
+  ) END
+  FROM (
+    SELECT
+      r.form_type,
+      COUNT(*) AS count,
+      COALESCE(SUM(r.duration_min), 0) AS minutes,
+      COALESCE(SUM(r.difficulty), 0) AS difficulty_sum,
+      COUNT(r.difficulty) AS difficulty_count,
+      COALESCE(SUM(r.focus), 0) AS focus_sum,
+      COUNT(r.focus) AS focus_count
+    FROM public.records r
+    WHERE r.user_id = p_user_id
+      AND r.occurred_at >= (p_day::TIMESTAMP AT TIME ZONE 'Asia/Shanghai')
+      AND r.occurred_at < ((p_day + 1)::TIMESTAMP AT TIME ZONE 'Asia/Shanghai')
+    GROUP BY r.form_type
+  ) t;
+$$;
+
+-- 一个周期（周/月）的指标：汇总周期内的 daily 行；没有 daily 行时返回 NULL
+CREATE OR REPLACE FUNCTION public.build_period_summary_metrics(p_user_id UUID, p_start DATE, p_end DATE)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+SET search_path = public
+AS $$
+  WITH d AS (
+    SELECT s.metrics
+    FROM public.user_summaries s
+    WHERE s.user_id = p_user_id
+      AND s.period = 'daily'
+      AND s.period_start BETWEEN p_start AND p_end
+      AND s.metrics IS NOT NULL
+  )
+  SELECT CASE WHEN COUNT(*) = 0 THEN NULL ELSE jsonb_build_object(
+    'count', SUM((d.metrics->>'count')::INTEGER),
+    'minutes', SUM((d.metrics->>'minutes')::INTEGER),
+    'days', COUNT(*),
+    'difficulty_sum', SUM((d.metrics->>'difficulty_sum')::INTEGER),
+    'difficulty_count', SUM((d.metrics->>'difficulty_count')::INTEGER),
+    'focus_sum', SUM((d.metrics->>'focus_sum')::INTEGER),
+    'focus_count', SUM((d.metrics->>'focus_count')::INTEGER),
+    'form_types', (
+      SELECT jsonb_object_agg(ft.form_type, jsonb_build_object('count', ft.count, 'minutes', ft.minutes))
+      FROM (
+        SELECT e.key AS form_type, SUM((e.value->>'count')::INTEGER) AS count, SUM((e.value->>'minutes')::INTEGER) AS minutes
+        FROM d, jsonb_each(d.metrics->'form_types') e
+        GROUP BY e.key
+      ) ft
+    )
+  ) END
+  FROM d;
+$$;
+
+-- 写入一个周期的指标；metrics 为 NULL 时删除该行（有 summary_md 的行保留，只清空 metrics）
+CREATE OR REPLACE FUNCTION public.store_user_summary(
+  p_user_id UUID,
+  p_period summary_period,
+  p_start DATE,
+  p_end DATE,
+  p_metrics JSONB
+)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF p_metrics IS NULL THEN
+    DELETE FROM public.user_summaries
+    WHERE user_id = p_user_id AND period = p_period AND period_start = p_start AND summary_md IS NULL;
+
+    UPDATE public.user_summaries SET metrics = NULL
+    WHERE user_id = p_user_id AND period = p_period AND period_start = p_start AND metrics IS NOT NULL;
+    RETURN;
+  END IF;
+
+  INSERT INTO public.user_summaries (user_id, period, period_start, period_end, metrics)
+  VALUES (p_user_id, p_period, p_start, p_end, p_metrics)
+  ON CONFLICT (user_id, period, period_start) DO UPDATE SET
+    period_end = EXCLUDED.period_end,
+    metrics = EXCLUDED.metrics
+  WHERE user_summaries.metrics IS DISTINCT FROM EXCLUDED.metrics;
+END;
+$$;
+
+-- 重算一批 (user_id, day)：先 daily，再所在的 weekly（周一开始）与 monthly
+CREATE OR REPLACE FUNCTION public.refresh_user_summaries(p_days JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v RECORD;
+  v_days INTEGER := 0;
+BEGIN
+  IF p_days IS NULL THEN
+    RETURN 0;
+  END IF;
+
+  -- 同一用户的刷新串行执行（按 user_id 顺序加锁避免死锁）：
+  -- 并发写入同一天时，后拿到锁的一方在下一条语句里能看到先提交的记录，不会用旧数据覆盖
+  PERFORM pg_advisory_xact_lock(hashtextextended('user_summaries:' || u.user_id::TEXT, 0))
+  FROM (
+    SELECT DISTINCT d.user_id
+    FROM jsonb_to_recordset(p_days) AS d(user_id UUID, day DATE)
+    ORDER BY d.user_id
+  ) u;
+
+  FOR v IN
+    SELECT DISTINCT d.user_id, d.day
+    FROM jsonb_to_recordset(p_days) AS d(user_id UUID, day DATE)
+  LOOP
+    PERFORM public.store_user_summary(v.user_id, 'daily', v.day, v.day, public.build_daily_summary_metrics(v.user_id, v.day));
+    v_days := v_days + 1;
+  END LOOP;
+
+  FOR v IN
+    SELECT DISTINCT d.user_id, date_trunc('week', d.day)::DATE AS period_start
+    FROM jsonb_to_recordset(p_days) AS d(user_id UUID, day DATE)
+  LOOP
+    PERFORM public.store_user_summary(
+      v.user_id, 'weekly', v.period_start, v.period_start + 6,
+      public.build_period_summary_metrics(v.user_id, v.period_start, v.period_start + 6)
+    );
+  END LOOP;
+
+  FOR v IN
+    SELECT DISTINCT d.user_id, date_trunc('month', d.day)::DATE AS period_start
+    FROM jsonb_to_recordset(p_days) AS d(user_id UUID, day DATE)
+  LOOP
+    PERFORM public.store_user_summary(
+      v.user_id, 'monthly', v.period_start, (v.period_start + INTERVAL '1 month - 1 day')::DATE,
+      public.build_period_summary_metrics(v.user_id, v.period_start, (v.period_start + INTERVAL '1 month - 1 day')::DATE)
+    );
+  END LOOP;
+
+  RETURN v_days;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.trg_records_user_summaries()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  v_days JSONB;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    SELECT jsonb_agg(DISTINCT jsonb_build_object('user_id', n.user_id, 'day', public.summary_local_date(n.occurred_at)))
+    INTO v_days
+    FROM new_rows n;
+  ELSIF TG_OP = 'UPDATE' THEN
+    -- 只处理影响统计的列发生变化的记录（改标题/正文/分词列时不做任何写入）
+    SELECT jsonb_agg(DISTINCT c.day)
+    INTO v_days
+    FROM old_rows o
+    JOIN new_rows n ON n.record_id = o.record_id
+    CROSS JOIN LATERAL (VALUES
+      (jsonb_build_object('user_id', o.user_id, 'day', public.summary_local_date(o.occurred_at))),
+      (jsonb_build_object('user_id', n.user_id, 'day', public.summary_local_date(n.occurred_at)))
+    ) AS c(day)
+    WHERE (o.user_id, o.occurred_at, o.duration_min, o.form_type, o.difficulty, o.focus)
+          IS DISTINCT FROM (n.user_id, n.occurred_at, n.duration_min, n.form_type, n.difficulty, n.focus);
+  ELSE
+    -- 删除用户时 records 随之级联删除，跳过已不存在的用户
+    SELECT jsonb_agg(DISTINCT jsonb_build_object('user_id', o.user_id, 'day', public.summary_local_date(o.occurred_at)))
+    INTO v_days
+    FROM old_rows o
+    WHERE EXISTS (SELECT 1 FROM auth.users au WHERE au.id = o.user_id);
+  END IF;
+
+  PERFORM public.refresh_user_summaries(v_days);
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_records_user_summaries_ins ON public.records;
+CREATE TRIGGER trg_records_user_summaries_ins
+  AFTER INSERT ON public.records
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_records_user_summaries();
+
+DROP TRIGGER IF EXISTS trg_records_user_summaries_upd ON public.records;
+CREATE TRIGGER trg_records_user_summaries_upd
+  AFTER UPDATE ON public.records
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_records_user_summaries();
+
+DROP TRIGGER IF EXISTS trg_records_user_summaries_del ON public.records;
+CREATE TRIGGER trg_records_user_summaries_del
+  AFTER DELETE ON public.records
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION public.trg_records_user_summaries();
+
+-- 回填 / 对账：按 user_id 顺序取下一批用户，重算其所有有记录的日期以及已有汇总行覆盖的日期
+-- （后者让已经没有记录的旧汇总行被删除），周、月随之重建
+CREATE OR REPLACE FUNCTION public.rebuild_user_summaries(
+  p_after_user_id UUID DEFAULT NULL,
+  p_limit INTEGER DEFAULT 100
+)
+RETURNS TABLE(last_user_id UUID, users INTEGER, days INTEGER)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  v_user_ids UUID[];
+  v_days JSONB;
+BEGIN
+  SELECT array_agg(u.id ORDER BY u.id)
+  INTO v_user_ids
+  FROM (
+    SELECT au.id
+    FROM auth.users au
+    WHERE p_after_user_id IS NULL OR au.id > p_after_user_id
+    ORDER BY au.id
+    LIMIT p_limit
+  ) u;
+
+  IF v_user_ids IS NULL THEN
+    RETURN QUERY SELECT NULL::UUID, 0, 0;
+    RETURN;
+  END IF;
+
+  SELECT jsonb_agg(jsonb_build_object('user_id', d.user_id, 'day', d.day))
+  INTO v_days
+  FROM (
+    SELECT r.user_id, public.summary_local_date(r.occurred_at) AS day
+    FROM public.records r
+    WHERE r.user_id = ANY(v_user_ids)
+    UNION
+    SELECT s.user_id, s.period_start
+    FROM public.user_summaries s
+    WHERE s.user_id = ANY(v_user_ids)
+      AND s.period IN ('daily', 'weekly', 'monthly')
+      AND s.metrics IS NOT NULL
+  ) d;
+
+  RETURN QUERY SELECT
+    v_user_ids[array_length(v_user_ids, 1)],
+    array_length(v_user_ids, 1),
+    public.refresh_user_summaries(v_days);
+END;
+$$;
+
+COMMENT ON COLUMN public.user_summaries.metrics IS '结构化指标（daily/weekly/monthly 由 records 触发器维护，见 sql/019）';
+
+REVOKE EXECUTE ON FUNCTION public.build_daily_summary_metrics(UUID, DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.build_period_summary_metrics(UUID, DATE, DATE) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.store_user_summary(UUID, summary_period, DATE, DATE, JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.refresh_user_summaries(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.rebuild_user_summaries(UUID, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.rebuild_user_summaries(UUID, INTEGER) TO service_role;